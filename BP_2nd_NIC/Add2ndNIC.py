@@ -34,6 +34,14 @@ def update_vm(pc_user,pc_passwd,vm_uuid,data_list):
         exit(1)
     
 
+def vm_payload (offset,length):
+    # Only VMs that match vm_filter come back from the list call
+    # An empty filter falls back to checking every VM in the loop below
+    payload={"kind":"vm","offset":offset,"length":length}
+    if vm_filter:
+        payload["filter"]=vm_filter
+    return payload
+
 ##########################################################################
 #   MAIN  #
 pc_user = '@@{PC_Creds.username}@@'
@@ -41,29 +49,34 @@ pc_pass = '@@{PC_Creds.secret}@@'
 
 VM_Name = "@@{VM_Name}@@"
 VLAN_Name = "@@{Network_Name}@@"
-Cluster_Name = "CHRISPITA-3"
-
-payload = {"kind":"subnet"}
-subnet_list = get_list(pc_user,pc_pass,"subnets",payload)
 
-for vlan in json.loads(subnet_list.content)['entities']:
-    if vlan['spec']['cluster_reference']['name'].lower() == Cluster_Name.lower():
-        if vlan['status']['name'] == VLAN_Name:
-            vlan_uuid = vlan['metadata']['uuid']
-            print ("VLAN UUID: {}".format(vlan_uuid))
+# Read every page of subnets and index them by (cluster, name)
+# An empty payload only returns the first page, on a large Prism Central the VLAN could be on a later page
+# The network name is sent as the filter when it can be, so most of the time this is one small call
+subnet_payload = {"kind":"subnet","offset":0,"length":500}
+if re.match(r'^[A-Za-z0-9_.\- ]+$', VLAN_Name):
+    subnet_payload["filter"] = "name=={}".format(VLAN_Name)
+subnet_index = {}
+while True:
+    subnet_list = json.loads(get_list(pc_user,pc_pass,"subnets",subnet_payload).content)
+    for vlan in subnet_list['entities']:
+        vlan_cluster = vlan['spec']['cluster_reference']['name'].lower()
+        subnet_index.setdefault((vlan_cluster, vlan['status']['name']), vlan)
+    subnet_payload["offset"] += len(subnet_list['entities'])
+    if not subnet_list['entities'] or subnet_payload["offset"] >= subnet_list['metadata']['total_matches']:
+        break
 
-new_NIC={}
-new_NIC['nic_type']="NORMAL_NIC"
-new_NIC['vlan_mode']="ACCESS"
-new_NIC['subnet_reference']={}
-new_NIC['subnet_reference']['kind']="subnet"
-new_NIC['subnet_reference']['name']=VLAN_Name
-new_NIC['subnet_reference']['uuid']=vlan_uuid
 
+# Send the name as a list filter so only the matching VM comes back instead of every VM in Prism Central
+# The filter value is a regular expression and ; , separate filter terms, names using other characters are not sent
+if re.match(r'^[A-Za-z0-9_.\- ]+$', VM_Name):
+    vm_filter = "vm_name=={}".format(VM_Name)
+else:
+    vm_filter = ""
 
 payload_length=500
 payload_offset=0
-payload={"kind":"vm","offset":payload_offset,"length":payload_length}
+payload=vm_payload(payload_offset,payload_length)
 resp = get_list(pc_user,pc_pass,"vms",payload)
 #print json.dumps(json.loads(resp.content), indent=4)
 
@@ -79,6 +92,22 @@ while remaining_vms > 0:
             # Get UUID for the VM to be cloned
             vm_uuid = vm['metadata']['uuid']
             print ("VM UUID: {}".format(vm_uuid))
+            # The network is looked up on the cluster the VM runs on
+            vm_cluster = vm['spec']['cluster_reference']['name']
+            vlan = subnet_index.get((vm_cluster.lower(), VLAN_Name))
+            if vlan is None:
+                print ("Network {} was not found on cluster {}".format(VLAN_Name, vm_cluster))
+                exit(1)
+            vlan_uuid = vlan['metadata']['uuid']
+            print ("VLAN UUID: {}".format(vlan_uuid))
+
+            new_NIC={}
+            new_NIC['nic_type']="NORMAL_NIC"
+            new_NIC['vlan_mode']="ACCESS"
+            new_NIC['subnet_reference']={}
+            new_NIC['subnet_reference']['kind']="subnet"
+            new_NIC['subnet_reference']['name']=VLAN_Name
+            new_NIC['subnet_reference']['uuid']=vlan_uuid
             del vm['status']
             vm['spec']['resources']['nic_list'].append(new_NIC)
             update_vm(pc_user, pc_pass,vm_uuid,vm)
@@ -88,8 +117,8 @@ while remaining_vms > 0:
         payload_offset+=payload_length
         if remaining_vms > payload_length:
             remaining_vms-=payload_length
-            payload={"kind":"vm","offset":payload_offset,"length":payload_length}
+            payload=vm_payload(payload_offset,payload_length)
             resp = get_list(pc_user,pc_pass,"vms",payload)
         else:
-            payload={"kind":"vm","offset":payload_offset,"length":remaining_vms}
+            payload=vm_payload(payload_offset,remaining_vms)
             resp = get_list(pc_user,pc_pass,"vms",payload)
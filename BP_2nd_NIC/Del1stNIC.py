@@ -34,6 +34,14 @@ def update_vm(pc_user,pc_passwd,vm_uuid,data_list):
         exit(1)
     
 
+def vm_payload (offset,length):
+    # Only VMs that match vm_filter come back from the list call
+    # An empty filter falls back to checking every VM in the loop below
+    payload={"kind":"vm","offset":offset,"length":length}
+    if vm_filter:
+        payload["filter"]=vm_filter
+    return payload
+
 ##########################################################################
 #   MAIN  #
 pc_user = '@@{PC_Creds.username}@@'
@@ -41,9 +49,16 @@ pc_pass = '@@{PC_Creds.secret}@@'
 
 VM_Name = "@@{VM_Name}@@"
 
+# Send the name as a list filter so only the matching VM comes back instead of every VM in Prism Central
+# The filter value is a regular expression and ; , separate filter terms, names using other characters are not sent
+if re.match(r'^[A-Za-z0-9_.\- ]+$', VM_Name):
+    vm_filter = "vm_name=={}".format(VM_Name)
+else:
+    vm_filter = ""
+
 payload_length=500
 payload_offset=0
-payload={"kind":"vm","offset":payload_offset,"length":payload_length}
+payload=vm_payload(payload_offset,payload_length)
 resp = get_list(pc_user,pc_pass,"vms",payload)
 #print json.dumps(json.loads(resp.content), indent=4)
 
@@ -68,8 +83,8 @@ while remaining_vms > 0:
         payload_offset+=payload_length
         if remaining_vms > payload_length:
             remaining_vms-=payload_length
-            payload={"kind":"vm","offset":payload_offset,"length":payload_length}
+            payload=vm_payload(payload_offset,payload_length)
             resp = get_list(pc_user,pc_pass,"vms",payload)
         else:
-            payload={"kind":"vm","offset":payload_offset,"length":remaining_vms}
+            payload=vm_payload(payload_offset,remaining_vms)
             resp = get_list(pc_user,pc_pass,"vms",payload)
@@ -0,0 +1,191 @@
+#This script is used to delete the 1st NIC from a batch of VMs in one run, after the build NIC is no longer required
+#The VMs are found with one filtered list call instead of reading every VM for each name
+#All the updates are sent first, then the tasks are checked together until they finish
+#VMs with only one NIC are skipped so a VM is never left without a NIC
+#
+#Required variables
+#Credentials
+#PC_Creds - username and password
+#
+#Variables
+#PC_Address - IP or DNS name for Prism Central
+#VM_Names - comma separated list of VM names, such as WEB01,WEB02,WEB03
+#VM_Name_Pattern - used when VM_Names is empty, the start of the VM names, such as WEB-PROD-
+
+def get_list (pc_user,pc_pass,type,payload):
+    # Set the headers, url, and payload
+    headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+    url     = ("https://@@{PC_Address}@@:9440/api/nutanix/v3/{}/list".format(type))
+
+    # Make the request
+    resp = urlreq(url, verb='POST', auth='BASIC', user=pc_user, passwd=pc_pass, params=json.dumps(payload), headers=headers)
+
+    # If the request went through correctly, return the json body.  Otherwise error out, and print the response.
+    if resp.ok:
+        return(resp)
+        exit(0)
+    else:
+        print ("Post request failed getting list of {}: {}".format(type,resp.content))
+        exit(1)
+
+def list_all (pc_user,pc_pass,type,kind,list_filter):
+    # Read every page of a list call, only the entities that match the filter come back
+    entities = []
+    payload = {"kind":kind,"offset":0,"length":500}
+    if list_filter:
+        payload["filter"] = list_filter
+    while True:
+        page = json.loads(get_list(pc_user,pc_pass,type,payload).content)
+        entities.extend(page['entities'])
+        payload["offset"] += len(page['entities'])
+        if not page['entities'] or payload["offset"] >= page['metadata']['total_matches']:
+            return entities
+
+def name_filters (attribute,names):
+    # Filter terms separated by a comma are OR'ed together, send the names in groups to keep each filter short
+    # The filter value is a regular expression, names using other characters can not be sent and every entity is read
+    for name in names:
+        if not re.match(r'^[A-Za-z0-9_.\- ]+$', name):
+            return [""]
+    return [",".join("{}=={}".format(attribute, name) for name in names[i:i+40]) for i in range(0, len(names), 40)]
+
+def update_vm(pc_user,pc_pass,vm_uuid,data_list):
+    '''
+    Function that sends the VM update and returns the task UUID, None when the update was not accepted
+    '''
+    headers = {"content-type": "application/json"}
+    url     = ("https://@@{PC_Address}@@:9440/api/nutanix/v3/vms/{0}".format(vm_uuid))
+
+    resp = urlreq(url, verb='PUT', auth='BASIC', user=pc_user, passwd=pc_pass, params=json.dumps(data_list), headers=headers)
+    if resp.ok:
+        return json.loads(resp.content)['status']['execution_context']['task_uuid']
+    else:
+        print ("Put request failed updating VM: {}".format(resp.content))
+        return None
+
+def get_task(pc_user,pc_pass,task_uuid):
+    '''
+    Function that returns the task JSON
+    '''
+    headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+    url     = ("https://@@{PC_Address}@@:9440/api/nutanix/v3/tasks/{0}".format(task_uuid))
+    resp = urlreq(url, verb='GET', auth='BASIC', user=pc_user, passwd=pc_pass, headers=headers)
+    if resp.ok:
+        return json.loads(resp.content)
+    return {}
+
+def add_task(tasks,task_uuid,vm_name,timeout=1800):
+    '''
+    Function that starts checking a task, a task not finished within timeout seconds counts as failed
+    '''
+    tasks['pending'][task_uuid] = vm_name
+    tasks['deadlines'][task_uuid] = tasks['elapsed'] + timeout
+
+def check_tasks(pc_user,pc_pass,tasks):
+    '''
+    Function that reads the pending tasks once and reports the ones that finished or timed out
+    Returns the number of tasks that are no longer pending
+    '''
+    pending = tasks['pending']
+    task_uuids = list(pending.keys())
+    found = {}
+    for i in range(0, len(task_uuids), 100):
+        chunk = task_uuids[i:i+100]
+        payload = {"kind":"task","length":len(chunk),"filter":",".join("uuid=={}".format(task_uuid) for task_uuid in chunk)}
+        for task in json.loads(get_list(pc_user,pc_pass,"tasks",payload).content).get('entities', []):
+            if task.get('uuid') in pending:
+                found[task['uuid']] = task
+    #Some versions do not filter tasks by UUID and only return the latest tasks, read the ones not found on their own
+    for task_uuid in task_uuids:
+        if task_uuid not in found:
+            found[task_uuid] = get_task(pc_user,pc_pass,task_uuid)
+    done = 0
+    for task_uuid, task in found.items():
+        if task.get('status') in ('SUCCEEDED', 'FAILED', 'ABORTED'):
+            print ("VM: {}  Task Status: {}".format(pending.pop(task_uuid), task['status']))
+            done += 1
+            if task['status'] != 'SUCCEEDED':
+                tasks['failed'] += 1
+                print (task.get('error_detail', ''))
+    for task_uuid in list(pending.keys()):
+        if tasks['elapsed'] >= tasks['deadlines'][task_uuid]:
+            # Such as a task that can no longer be read
+            print ("VM: {}  Task Status: TIMED_OUT  Task: {}".format(pending.pop(task_uuid), task_uuid))
+            done += 1
+            tasks['failed'] += 1
+    return done
+
+def wait_tasks(pc_user,pc_pass,tasks,limit=0):
+    '''
+    Function that checks the tasks together until no more than limit are pending, 0 waits for all of them
+    '''
+    wait = 2
+    while len(tasks['pending']) > limit:
+        sleep(wait)
+        # Only the sleeps are counted toward the deadlines
+        tasks['elapsed'] += wait
+        if check_tasks(pc_user,pc_pass,tasks):
+            wait = 2
+        else:
+            wait = min(wait * 2, 10)
+
+##########################################################################
+#   MAIN  #
+pc_user = '@@{PC_Creds.username}@@'
+pc_pass = '@@{PC_Creds.secret}@@'
+
+VM_Names = "@@{VM_Names}@@"
+VM_Name_Pattern = "@@{VM_Name_Pattern}@@"
+
+names = [name.strip() for name in VM_Names.split(",") if name.strip()]
+if not names and not VM_Name_Pattern.strip():
+    print ("Set VM_Names or VM_Name_Pattern")
+    exit(1)
+
+# Find all the VMs with filtered list calls
+vms = {}
+if names:
+    vm_filters = name_filters("vm_name", names)
+else:
+    vm_filters = name_filters("vm_name", [VM_Name_Pattern.strip()])
+    if vm_filters[0]:
+        vm_filters = [vm_filters[0] + ".*"]
+for vm_filter in vm_filters:
+    for vm in list_all(pc_user,pc_pass,"vms","vm",vm_filter):
+        vm_name = vm['status']['name']
+        if (names and vm_name in names) or (not names and vm_name.startswith(VM_Name_Pattern.strip())):
+            vms[vm['metadata']['uuid']] = vm
+print ("Number of VMs: {}".format(len(vms)))
+found_names = set(vm['status']['name'] for vm in vms.values())
+for name in names:
+    if name not in found_names:
+        print ("VM not found: {}".format(name))
+
+# Send the updates with at most max_in_flight tasks running, the tasks are checked together while the updates go out
+# Number of NIC changes allowed to run on Prism at the same time
+max_in_flight = 10
+# pending is task UUID -> VM name, deadlines and elapsed are in seconds waited
+tasks = {"pending":{}, "deadlines":{}, "elapsed":0, "failed":0}
+failed = 0
+for vm_uuid, vm in vms.items():
+    vm_name = vm['status']['name']
+    if len(vm['spec']['resources']['nic_list']) < 2:
+        print ("VM {} has only one NIC, skipping".format(vm_name))
+        failed += 1
+        continue
+
+    del vm['status']
+    vm['spec']['resources']['nic_list'].pop(0)
+    wait_tasks(pc_user,pc_pass,tasks,max_in_flight - 1)
+    task_uuid = update_vm(pc_user,pc_pass,vm_uuid,vm)
+    if task_uuid:
+        print ("VM: {}  NIC delete submitted".format(vm_name))
+        add_task(tasks,task_uuid,vm_name)
+    else:
+        failed += 1
+
+wait_tasks(pc_user,pc_pass,tasks)
+failed += tasks['failed']
+print ("VMs updated: {}  Failed: {}".format(len(vms) - failed, failed))
+if failed:
+    exit(1)
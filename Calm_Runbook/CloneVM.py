@@ -42,13 +42,28 @@ def clone_image (pc_user,pc_pass,uuid):
         print "Post request failed cloning image: ", resp.content
         exit(1)
 
+def vm_payload (offset,length):
+    # Only VMs that match vm_filter come back from the list call
+    # An empty filter falls back to checking every VM in the loop below
+    payload={"kind":"vm","offset":offset,"length":length}
+    if vm_filter:
+        payload["filter"]=vm_filter
+    return payload
+
 ############## MAIN ##################################
 pc_user = '@@{PC_Creds.username}@@'
 pc_pass = '@@{PC_Creds.secret}@@'
 
+# Send the name as a list filter so only the matching VM comes back instead of every VM in Prism Central
+# The filter value is a regular expression and ; , separate filter terms, names using other characters are not sent
+if re.match(r'^[A-Za-z0-9_.\- ]+$', '@@{VM_Name}@@'):
+    vm_filter = "vm_name==@@{VM_Name}@@"
+else:
+    vm_filter = ""
+
 payload_length=500
 payload_offset=0
-payload={"kind":"vm","offset":payload_offset,"length":payload_length}
+payload=vm_payload(payload_offset,payload_length)
 resp = get_image_list(pc_user,pc_pass,payload)
 #print json.dumps(json.loads(resp.content), indent=4)
 
@@ -72,9 +87,9 @@ while remaining_vms > 0:
         payload_offset+=payload_length
         if remaining_vms > payload_length:
             remaining_vms-=payload_length
-            payload={"kind":"vm","offset":payload_offset,"length":payload_length}
+            payload=vm_payload(payload_offset,payload_length)
             resp = get_image_list(pc_user,pc_pass,payload)
         else:
-            payload={"kind":"vm","offset":payload_offset,"length":remaining_vms}
+            payload=vm_payload(payload_offset,remaining_vms)
             resp = get_image_list(pc_user,pc_pass,payload)
 
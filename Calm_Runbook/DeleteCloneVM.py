@@ -10,10 +10,15 @@
 def get_vm_list (pe_user,pe_pass,payload):
     # Set the headers, url, and payload
     headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
-    url     = "https://@@{PE_Address}@@:9440/PrismGateway/services/rest/v2.0/vms/"
+    # The v2 API takes the page and the filter on the URL, only the matching VMs come back
+    # The filter is URL encoded, a VM name can have spaces
+    query = "offset={}&length={}".format(payload["offset"], payload["length"])
+    if payload.get("filter"):
+        query += "&filter=" + urllib.quote(payload["filter"], safe='')
+    url     = "https://@@{PE_Address}@@:9440/PrismGateway/services/rest/v2.0/vms/?" + query
 
     # Make the request
-    resp = urlreq(url, verb='GET', auth='BASIC', user=pe_user, passwd=pe_pass, params=json.dumps(payload), headers=headers)
+    resp = urlreq(url, verb='GET', auth='BASIC', user=pe_user, passwd=pe_pass, headers=headers)
 
     # If the request went through correctly, return the json body.  Otherwise error out, and print the response.
     if resp.ok:
@@ -39,6 +44,14 @@ def DELETE_VM (pe_user,pe_pass,uuid):
         print ("DELETE OF VM FAILED: ".format(resp.content))
         exit(1)
 
+def vm_payload (offset,length):
+    # Only VMs that match vm_filter come back from the list call
+    # An empty filter falls back to checking every VM in the loop below
+    payload={"kind":"vm","offset":offset,"length":length}
+    if vm_filter:
+        payload["filter"]=vm_filter
+    return payload
+
 ############# MAIN ############################
 # Set the credentials
 pe_user = '@@{PE_Creds.username}@@'
@@ -48,9 +61,16 @@ time = "@@{calm_time("%Y%m%d")}@@"
 clone_name = "@@{VM_Name}@@_"+time
 print ("Clone Name variable is: {}".format(clone_name))
 
+# Send the clone name as a prefix filter so only the clones come back instead of every VM on the cluster
+# The filter value is a regular expression and ; , separate filter terms, names using other characters are not sent
+if re.match(r'^[A-Za-z0-9_.\- ]+$', clone_name):
+    vm_filter = "vm_name=={}.*".format(clone_name)
+else:
+    vm_filter = ""
+
 payload_length=500
 payload_offset=0
-payload={"kind":"vm","offset":payload_offset,"length":payload_length}
+payload=vm_payload(payload_offset,payload_length)
 resp = get_vm_list(pe_user,pe_pass,payload)
 #print json.dumps(json.loads(resp.content), indent=4)
 
@@ -74,8 +94,8 @@ while remaining_vms > 0:
         payload_offset+=payload_length
         if remaining_vms > payload_length:
             remaining_vms-=payload_length
-            payload={"kind":"vm","offset":payload_offset,"length":payload_length}
+            payload=vm_payload(payload_offset,payload_length)
             resp = get_vm_list(pe_user,pe_pass,payload)
         else:
-            payload={"kind":"vm","offset":payload_offset,"length":remaining_vms}
+            payload=vm_payload(payload_offset,remaining_vms)
             resp = get_vm_list(pe_user,pe_pass,payload)
\ No newline at end of file
@@ -1,239 +1,347 @@
 #!/user/bin/env python
 
 """
-This script is used to move NICs from one VLAN to another.  
+This script is used to move NICs from one VLAN to another.
 It calls the Prism Central API and parses the JSON to find VMs on the old VLAN.
-The script will prompt before making any updates.
-Updates add a new NIC for each one it finds in the old VLAN, 
+Updates add a new NIC for each one it finds in the old VLAN,
 then deletes the NIC in the old VLAN. After submitting the changes a task UUID is returned.
-The task UUID is checked every 5 seconds until the task completes.
-The VM OS will request a new DHCP IP for the new NIC. 
+The tasks are checked together in the background until they complete.
+The VM OS will request a new DHCP IP for the new NIC.
+
+The script runs in one of three modes:
+    interactive - prompts before updating each VM, this is the default
+    plan        - scans the VMs once and writes the changes to a plan file for review, nothing is updated
+    apply       - runs the changes in the plan file without prompts
+    python UpdateVLAN.py plan --cluster cable --old-vlan 568 --new-vlan 567 --exclude "SQL*"
+    python UpdateVLAN.py apply --power-state OFF
+Several VLANs can be moved in one pass with a mapping file, a CSV of Cluster,Old VLAN,New VLAN.
+A VM with NICs on more than one of the old VLANs gets all of its NICs moved in one update.
+    python UpdateVLAN.py plan --mapping-file VLANMap.csv
+The updates for each cluster run in their own lane with their own limit, so the clusters are updated
+at the same time and a busy cluster does not hold up the others.
+    python UpdateVLAN.py apply --max-in-flight 10 --cluster-in-flight cable=4
+Apply updates the powered off VMs first.  Running VMs are then updated in waves with at most
+--host-in-flight VMs on each AHV host at a time, so hot-adds are not piled onto one host.
+If more than --max-failure-rate of the updates fail the remaining waves are not sent.
+
 Author: Corey Anson
 Date: 12/30/2020
 """
-from dataclasses import dataclass
-import requests
-import urllib3
 import argparse
+import csv
+import fnmatch
 import getpass
 import json
 import os
 import sys
-import math
 import time
 import copy
-from requests.auth import HTTPBasicAuth
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+#The shared Prism API client is in the PrismClient folder at the top of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PrismClient'))
+from PrismClient import PrismClient, PrismError
+from TaskTracker import TaskTracker
+from BulkUpdate import LanedUpdate
+from WaveScheduler import WaveScheduler
+from SubnetResolver import SubnetResolver
 
 
-def make_request(ip_address,user,passwd,call_type,data_list):
+def update_done(result):
     '''
-    Function that return the response of the REST API call in a JSON object
+    Function called by the bulk updater when a VM update finishes
     '''
-    header = {"content-type": "application/json"}
-    auth = HTTPBasicAuth(user, passwd)
-    url_list = "https://{0}:9440/api/nutanix/v3/{1}/list".format(ip_address,call_type)
-    try:
-        res_list = requests.post(url=url_list, data=json.dumps(data_list), auth=auth, headers=header, verify=False)
-        return res_list
-    except Exception as ex:
-        print ("There was an issue requesting the VM list.")
-        print (ex.args)
+    print ("VM: {0}  Task Status: {1}  Seconds: {2:.1f}".format(result.name,result.status,result.total_seconds))
+    if result.status != 'SUCCEEDED':
+        print (result.message)
 
-def update_vm(ip_address,user,passwd,vm_uuid,data_list):
+def nic_changes(vm, mappings):
     '''
-    Function that update the NIC VLAN of an existing VM
+    Function that returns the NICs of a VM on an old VLAN, each with the subnet it moves to
+    mappings is old subnet UUID -> new subnet reference
     '''
-    header = {"content-type": "application/json"}
-    auth = HTTPBasicAuth(user, passwd)
-    url_list = "https://{0}:9440/api/nutanix/v3/vms/{1}".format(ip_address,vm_uuid)
-    try:
-        status = requests.put(url=url_list, data=json.dumps(data_list), auth=auth, headers=header, verify=False)
-        if status.ok:
-            print ("NIC has been added to the VM, waiting on task to complete.")
-            task_uuid = json.loads(status.text)['status']['execution_context']['task_uuid']
-            #wait for task to complete and print out status
-            get_task_status(ip_address,user,passwd,task_uuid)
+    changes = []
+    for index, nic in enumerate(vm['spec']['resources']['nic_list']):
+        old_uuid = nic.get('subnet_reference', {}).get('uuid')
+        if old_uuid in mappings:
+            changes.append({'index': index, 'mac_address': nic.get('mac_address', ''), 'old_subnet': old_uuid, 'new_subnet': mappings[old_uuid]})
+    return changes
 
-        else:
-            print ("Status not OK")
-            print (status.text)
-    except Exception as ex:
-        print ("There was an issue performing the update.")
-        print (ex.args)
+def move_nics(vm, changes):
+    '''
+    Function that replaces the NICs in the changes with new NICs on the new VLAN
+    Returns False without changing the VM when the NICs are no longer the ones that were planned
+    '''
+    nic_list = vm['spec']['resources']['nic_list']
+    for change in changes:
+        if change['index'] >= len(nic_list):
+            return False
+        nic = nic_list[change['index']]
+        if nic['subnet_reference']['uuid'] != change['old_subnet'] or nic.get('mac_address', '') != change['mac_address']:
+            return False
+
+    new_nics = []
+    for change in changes:
+        #Had to use a deep copy here to get the lower keys copied instead of
+        # being references that would get updated in both new and old versions
+        new_nic = copy.deepcopy(nic_list[change['index']])
+        #Update the new NIC to remove fields it does not need and update the VLAN
+        for field in ('uuid', 'mac_address', 'ip_endpoint_list'):
+            new_nic.pop(field, None)
+        new_nic['subnet_reference'] = dict(change['new_subnet'])
+        new_nics.append(new_nic)
+
+    #Remove the NICs in the old VLAN from the end so the other indices do not move, then add the new NICs
+    for index in sorted((change['index'] for change in changes), reverse=True):
+        del nic_list[index]
+    nic_list.extend(new_nics)
+    return True
 
-def get_task_status(ip_address,user,passwd,task_uuid):
+def vm_selected(vm_name, power_state, args):
     '''
-    Function that waits for the task to complete
+    Function that checks a VM against the include, exclude and power state filters
+    Name patterns use * and ? and are not case sensitive.
     '''
-    header = {"content-type": "application/json"}
-    data_list = {}
-    auth = HTTPBasicAuth(user, passwd)
-    url_list = "https://{0}:9440/api/nutanix/v3/tasks/{1}".format(ip_address,task_uuid)
-    state = "RUNNING"
-    try:
-        #Loop until task changes status from running
-        while state == "RUNNING":
-            time.sleep(5)
-            task_status = requests.get(url=url_list, data=json.dumps(data_list), auth=auth, headers=header, verify=False)
-            if task_status.ok:
-                state = json.loads(task_status.content)['status']
-                p_complete = json.loads(task_status.content)['percentage_complete']
-                print ("Task Status: {0},  Percent Complete: {1}".format(state,p_complete))
-                
-            else:
-                print ("There was an issue requesting the task status. ")
-                print (task_status.text)
-
-    except Exception as ex:
-        print ("There was an issue requesting the task status.")
-        print (ex.args)
-
-    
+    name = vm_name.lower()
+    if args.include and not any(fnmatch.fnmatchcase(name, pattern.lower()) for pattern in args.include):
+        return False
+    if args.exclude and any(fnmatch.fnmatchcase(name, pattern.lower()) for pattern in args.exclude):
+        return False
+    if args.power_state and power_state != args.power_state:
+        return False
+    return True
+
+def wave_started(wave, count):
+    '''
+    Function called by the scheduler as each phase or wave of updates starts
+    '''
+    print ("\n{0}: {1} VMs".format(wave, count))
+
+def lane_limits(values):
+    '''
+    Function that turns the NAME=N cluster limits into a dictionary, cluster names are not case sensitive
+    '''
+    limits = {}
+    for value in values or []:
+        cluster, _, limit = value.partition('=')
+        if not limit.isdigit() or int(limit) < 1:
+            print ("Cluster limit must be NAME=N, got: {}".format(value))
+            exit(1)
+        limits[cluster.strip().lower()] = int(limit)
+    return limits
+
+def read_mapping_file(file_name):
+    '''
+    Function that reads the Cluster,Old VLAN,New VLAN rows from a CSV file, a header row is optional
+    '''
+    rows = []
+    with open(file_name, newline='') as mapfile:
+        for row in csv.reader(mapfile):
+            if len(row) < 3 or not row[1].strip().isdigit():
+                #Header or blank line
+                continue
+            rows.append({'cluster': row[0].strip(), 'old_vlan': int(row[1]), 'new_vlan': int(row[2])})
+    return rows
+
+def resolve_mappings(subnets, rows):
+    '''
+    Function that finds the old and new subnets for every mapping, returns old subnet UUID -> new subnet reference
+    All the mappings are checked before stopping so every missing VLAN is reported at once.
+    '''
+    mappings = {}
+    problems = False
+    for row in rows:
+        old_subnet = subnets.by_vlan(row['cluster'], row['old_vlan'])
+        new_subnet = subnets.by_vlan(row['cluster'], row['new_vlan'])
+        if old_subnet is None:
+            print ("old VLAN {0} was not found on cluster {1}.".format(row['old_vlan'], row['cluster']))
+            problems = True
+        if new_subnet is None:
+            print ("new VLAN {0} was not found on cluster {1}.".format(row['new_vlan'], row['cluster']))
+            problems = True
+        if old_subnet is None or new_subnet is None:
+            continue
+        if old_subnet['uuid'] in mappings and mappings[old_subnet['uuid']]['uuid'] != new_subnet['uuid']:
+            print ("VLAN {0} on cluster {1} is mapped to more than one new VLAN.".format(row['old_vlan'], row['cluster']))
+            problems = True
+            continue
+        #Print the UUIDs to show they were found.
+        print ("Cluster: {0}  VLAN {1} UUID: {2}  ->  New VLAN {3} UUID: {4}".format(row['cluster'], row['old_vlan'], old_subnet['uuid'], row['new_vlan'], new_subnet['uuid']))
+        mappings[old_subnet['uuid']] = subnets.reference(new_subnet)
+    if problems:
+        print ("Clusters with subnets: {}".format(", ".join(subnets.clusters())))
+        exit(1)
+    return mappings
+
+
+parser = argparse.ArgumentParser(description="Move VM NICs from one VLAN to another.")
+parser.add_argument('mode', nargs='?', choices=['interactive', 'plan', 'apply'], default='interactive',
+                    help="interactive prompts for each VM, plan writes the plan file, apply runs the plan file")
+parser.add_argument('--prism', help="Prism IP or DNS name")
+parser.add_argument('--user', help="User ID for Prism, the password is read from PRISM_PASSWORD or prompted")
+parser.add_argument('--cluster', help="Cluster name (not case sensitive)")
+parser.add_argument('--old-vlan', type=int, help="Old VLAN tag number")
+parser.add_argument('--new-vlan', type=int, help="New VLAN tag number")
+parser.add_argument('--mapping-file', help="CSV file of Cluster,Old VLAN,New VLAN to move several VLANs in one pass")
+parser.add_argument('--plan-file', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'VLANPlan.json'),
+                    help="Plan file written by plan and read by apply")
+parser.add_argument('--include', action='append', help="Only VMs with names that match, such as CMA-* (can be repeated)")
+parser.add_argument('--exclude', action='append', help="Skip VMs with names that match (can be repeated)")
+parser.add_argument('--power-state', choices=['ON', 'OFF'], help="Only VMs in this power state")
+parser.add_argument('--max-in-flight', type=int, default=10, help="Number of VM updates allowed to run at the same time on each cluster")
+parser.add_argument('--cluster-in-flight', action='append', help="Limit for one cluster as NAME=N, such as cable=4 (can be repeated)")
+parser.add_argument('--host-in-flight', type=int, default=2, help="Apply only, running VMs updated at the same time on one AHV host")
+parser.add_argument('--max-failure-rate', type=float, default=0.2, help="Apply only, stop sending waves when more than this part of the updates failed")
+args = parser.parse_args()
+
 #Set the credentials
 # You can hard code the values to make running again easy, suggest password remain a prompt for security
 #PC_user = 'admin'
 #This has been tested against both Prism Central and Prism Element with success
-PC_address = input ("Prism IP or DNS name: ")
-PC_user = input ("User ID for Prism: ")
-PC_pass = getpass.getpass('Password for Prism: ')
-
-VLAN_tag = int(input ("Old VLAN tag number: "))
-new_VLAN = int(input ("New VLAN tag number: "))
-#This script was designed to handle one cluster because the UUID of the VLAN is different between clusters
-#If you want to handle multiple clusters then you will need to change the UUID from a single entry to mulitple item list
-Cluster_Name = input ("Cluster Name: ")
-
-# # # # # # Get the UUID of the VLAN and cluster for this check # # # # #
-
-#Get the UUID for the old VLAN
-payload = {}
-call_type = 'subnets'
-# Make the request
-resp = make_request(PC_address, PC_user, PC_pass, call_type, payload)
-
-# If the request went through correctly
-if resp.ok:
-    # Cycle through the subnet "entities", and check if its id matches the old VLAN
-    for subnet in json.loads(resp.content)['entities']:
-        #The lower function remove the case so the compare is not case sensitive
-        #If you want the compare to be case sensitive then remove the 2 ".lower()" entries
-        if subnet['spec']['cluster_reference']['name'].lower() == Cluster_Name.lower():
-            # Get UUID for both old and new VLANs
-            if subnet['spec']['resources']['vlan_id'] == VLAN_tag:
-                if 'uuid' in subnet['metadata']:
-                    UUID = subnet['metadata']['uuid']
-                    #Print the UUID to show it was found.
-                    print ("VLAN UUID: {}".format(UUID))
-
-            elif subnet['spec']['resources']['vlan_id'] == new_VLAN:
-                if 'uuid' in subnet['metadata']:
-                    new_VLAN_UUID = subnet['metadata']['uuid']
-                    new_VLAN_name = subnet['status']['name']
-                    #Print the UUID to show it was found.
-                    print ("New VLAN UUID: {}".format(new_VLAN_UUID))
-             
-# In case the request returns an error
-else:
-    print ("Post subnets/list request failed", resp.content)
-    exit(1)
-
-#Test variables to verify they were set
-try:
-    UUID
-except NameError:
-    # UUID did not get set
-    print ("old VLAN was not found.")
-    print (json.dumps(json.loads(resp.content), indent=4))
-    exit(1)
-
-try:
-    new_VLAN_UUID
-except NameError:
-    # new VLAN UUID did not get set
-    print ("new VLAN was not found.")
-    print (json.dumps(json.loads(resp.content), indent=4))
-    exit(1)
-
+PC_address = args.prism or input ("Prism IP or DNS name: ")
+PC_user = args.user or input ("User ID for Prism: ")
+PC_pass = os.environ.get('PRISM_PASSWORD') or getpass.getpass('Password for Prism: ')
+#One pooled connection is used for every call this script makes
+#The cluster lanes run at the same time, keep enough connections open for all of them
+client = PrismClient(PC_address, PC_user, PC_pass, pool_size=50)
 
 # # # # # # # Pull a list of VMs and check if any are on the VLAN listed via UUID compare # # # # # #
 #default is 20 VMs without a payload to increase the response number
 max_vms_in_response = 500
-#starting the loop at zero. This is to handle more than 500 VM systems.
-offset = 0
+#Pages after the first are fetched in parallel, this is the number of pages requested at the same time
+page_workers = 4
 call_type = 'vms'
 
-payload = {'kind':'vm','length': max_vms_in_response,'offset': offset}
-resp = make_request(PC_address, PC_user, PC_pass, call_type, payload)
-
-# If the request went through correctly, print it out.  Otherwise error out, and print the response.
-if resp.ok:
-    #Get the count of how many VMs are hosted in this system
-    vm_count = json.loads(resp.content)['metadata']['total_matches']
-    vms_in_request = json.loads(resp.content)['metadata']['length']
-
-    #Set how many loops are needed to work through all the VMs 
-    iterations = math.ceil((vm_count - vms_in_request) / max_vms_in_response)
-    iterator = 0
-    nic_list = [0]
-
-    while iterator <= iterations:
-        #Loop through the JSON content checking each VM
-        for vm in json.loads(resp.content)['entities']:
-            vm_name = vm['spec']['name']
-            vm_uuid = vm['metadata']['uuid']
-            power_state = vm['spec']['resources']['power_state']
-            #remove the current VM status section, only configuration items are needed
-            del vm['status']
-            #VMs can have multiple NICs
-            nic_list = ['none']
-            nic_cnt = 0
-            num_nics = len(vm['spec']['resources']['nic_list'])
-            #Chech each NIC for a match
-            for nic in vm['spec']['resources']['nic_list']:
-                #Check if this NIC is in the old VLAN
-                if nic['subnet_reference']['uuid'] == UUID:
-                    #Loop through the NICs and build a list
-                    nic_list.append(nic_cnt)
-                nic_cnt +=1
-
-            #if there was a match then ask if user wants to update VM
-            if len(nic_list) > 1:
-                #throw out the first value which is none
-                nic_list.pop(0)
-                print ("\nPower: {:3s}  VM Name: {:70s}  Num of NICs: {}".format(power_state,vm_name,len(nic_list)))
-                update = input ("Update to new VLAN? [y/N]: ")
-                #only make changes if the user said "y", ignore all other responses
-                if update == "y":
-                    #Had to use a deep copy here to get the lower keys copied instead of 
-                    # being references that would get updated in both new and old versions
-                    new_nic = copy.deepcopy(vm['spec']['resources']['nic_list'][0])
-                        
-                    #Update the new NIC to remove fields it does not need and update the VLAN
-                    del new_nic['uuid']
-                    del new_nic['mac_address']
-                    del new_nic['ip_endpoint_list']
-                    new_nic['subnet_reference']['name']=new_VLAN_name
-                    new_nic['subnet_reference']['uuid']=new_VLAN_UUID
-
-                    #Add the number of NICs in the old VLAN to the JSON content
-                    #Also removes the NICs in the old VLAN from the JSON content
-                    for x in range(len(nic_list)):
-                        vm['spec']['resources']['nic_list'].append(new_nic)
-                        del vm['spec']['resources']['nic_list'][nic_list.pop()]
-                        
-                    #Update the VM in Prism Central
-                    update_vm(PC_address, PC_user, PC_pass,vm_uuid,vm)    
-   
-        iterator += 1
-        offset += vms_in_request
-        #Loop through the remaining VMs up to 500 at a time, system will not return more than 500
-        payload = {'kind':'vm','length': max_vms_in_response,'offset': offset}
-        resp = make_request(PC_address, PC_user, PC_pass, call_type, payload)
-   
+if args.mode == 'apply':
+    # # # # # # Run the changes in the plan file # # # # # #
+    with open(args.plan_file) as plan_json:
+        plan = json.load(plan_json)
+    if plan['prism'] != PC_address:
+        print ("The plan was made against {0}, not {1}.".format(plan['prism'], PC_address))
+        exit(1)
+    planned = {vm['uuid']: vm for vm in plan['vms'] if vm_selected(vm['name'], vm['power_state'], args)}
+    print ("VMs in the plan: {0}  Selected by the filters: {1}".format(len(plan['vms']), len(planned)))
 else:
-    print("Something went wrong."), resp.content
+    #The UUID of a VLAN is different on each cluster, so each mapping is for one cluster
+    if args.mapping_file:
+        mapping_rows = read_mapping_file(args.mapping_file)
+        if not mapping_rows:
+            print ("No mappings found in {}".format(args.mapping_file))
+            exit(1)
+    else:
+        VLAN_tag = args.old_vlan if args.old_vlan is not None else int(input ("Old VLAN tag number: "))
+        new_VLAN = args.new_vlan if args.new_vlan is not None else int(input ("New VLAN tag number: "))
+        Cluster_Name = args.cluster or input ("Cluster Name: ")
+        mapping_rows = [{'cluster': Cluster_Name, 'old_vlan': VLAN_tag, 'new_vlan': new_VLAN}]
+
+    # # # # # # Get the UUID of the VLAN and cluster for this check # # # # #
+    #Every page of subnets is read and indexed by cluster and VLAN, the index is saved next to the script for an hour
+    file_path = os.path.dirname(os.path.abspath(__file__))
+    try:
+        subnets = SubnetResolver(client, os.path.join(file_path, 'Subnets.json'))
+    except PrismError as ex:
+        print ("Post subnets/list request failed", ex.response.content)
+        exit(1)
+    #All the subnet UUIDs are found before the VMs are read, each VM is then checked against every mapping
+    mappings = resolve_mappings(subnets, mapping_rows)
+
+if args.mode != 'plan':
+    #Update tasks are checked together in the background instead of waiting on each one
+    tracker = TaskTracker(client)
+    #Each cluster gets its own lane and limit of VM updates running at the same time, raise with care on busy clusters
+    if args.mode == 'apply':
+        #Apply schedules all the updates first, powered off VMs then waves of running VMs spread over the hosts
+        updater = WaveScheduler(client, tracker, args.max_in_flight, args.host_in_flight, lane_limits(args.cluster_in_flight),
+                                args.max_failure_rate, on_result=update_done, on_wave=wave_started)
+    else:
+        updater = LanedUpdate(client, tracker, args.max_in_flight, on_result=update_done, lane_limits=lane_limits(args.cluster_in_flight))
+
+plan_vms = []
+skipped = []
+# If a page request fails, error out, and print the response.
+try:
+    #Loop through the VMs one at a time, each page is read once and dropped when done
+    for vm in client.list_entities(call_type, 'vm', length=max_vms_in_response, workers=page_workers):
+        vm_name = vm['spec']['name']
+        vm_uuid = vm['metadata']['uuid']
+        power_state = vm['spec']['resources']['power_state']
+        cluster_name = vm['spec'].get('cluster_reference', {}).get('name', '')
+        host_uuid = vm.get('status', {}).get('resources', {}).get('host_reference', {}).get('uuid', '')
+
+        if args.mode == 'apply':
+            if vm_uuid not in planned:
+                continue
+            changes = planned.pop(vm_uuid)['nics']
+        else:
+            #VMs can have multiple NICs, check each one for a match
+            changes = nic_changes(vm, mappings)
+            if not changes or not vm_selected(vm_name, power_state, args):
+                continue
+
+        if args.mode == 'plan':
+            plan_vms.append({'name': vm_name, 'uuid': vm_uuid, 'cluster': cluster_name, 'host': host_uuid, 'power_state': power_state, 'nics': changes})
+            continue
+
+        if args.mode == 'interactive':
+            print ("\nPower: {:3s}  VM Name: {:70s}  Num of NICs: {}".format(power_state,vm_name,len(changes)))
+            update = input ("Update to new VLAN? [y/N]: ")
+            #only make changes if the user said "y", ignore all other responses
+            if update != "y":
+                continue
+
+        #remove the current VM status section, only configuration items are needed
+        del vm['status']
+        if not move_nics(vm, changes):
+            print ("NICs on VM {0} changed since the plan was made, skipping.".format(vm_name))
+            skipped.append(vm_name)
+            continue
+        if args.mode == 'apply':
+            #Sent by updater.run() once every VM in the plan has been read
+            updater.add(cluster_name.lower(), "vms/{0}".format(vm_uuid), vm, name=vm_name, host=host_uuid, power_state=power_state)
+            continue
+        #Update the VM in Prism Central, queued in the lane for its cluster so the scan keeps going
+        updater.submit(cluster_name.lower(), "vms/{0}".format(vm_uuid), vm, name=vm_name)
+        if args.mode == 'interactive':
+            print ("NIC change submitted, task will be checked in the background.")
+
+except PrismError as ex:
+    print ("Something went wrong.", ex)
+    print (ex.response.content)
     exit(1)
 
+if args.mode == 'plan':
+    plan = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'prism': PC_address,
+        'mappings': mapping_rows,
+        'vms': plan_vms,
+    }
+    with open(args.plan_file, 'w') as plan_json:
+        json.dump(plan, plan_json, indent=4)
+    print ("VMs to update: {0}  NICs to move: {1}".format(len(plan_vms), sum(len(vm['nics']) for vm in plan_vms)))
+    print ("Plan written to {0}, review it and run apply to make the changes.".format(args.plan_file))
+    exit(0)
+
+if args.mode == 'apply':
+    updater.run()
+    if updater.tripped:
+        print ("\nToo many updates failed, the remaining waves were not sent.")
+
+#Wait for the updates that are still running
+print ("\nWaiting on the remaining update tasks.")
+updater.close()
+print ("Update results: {}".format(updater.summary()))
+for cluster_name, counts in sorted(updater.lane_summary().items()):
+    print ("Cluster: {:30s} {}".format(cluster_name, counts))
+for result in updater.failures():
+    print ("Failed: {:70s} {:12s} {}".format(result.name,result.status,result.message))
+for vm_name in skipped:
+    print ("Skipped: {}".format(vm_name))
+if args.mode == 'apply':
+    for vm_name in updater.not_run_names():
+        print ("Not run: {}".format(vm_name))
+    for vm in planned.values():
+        print ("Not found: {}".format(vm['name']))
+    results_name = os.path.splitext(args.plan_file)[0] + '.results.csv'
+    updater.write_csv(results_name)
+    print ("Results file: {}".format(results_name))
+
 exit(0)
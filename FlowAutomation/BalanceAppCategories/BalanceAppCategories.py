@@ -0,0 +1,332 @@
+#!/user/bin/env python
+
+"""
+Plans and applies a balanced split of the application categories.
+
+To keep the AppType category from being overloaded the applications were split by hand by name into
+    Apps_A-C
+    Apps_D-K
+    Apps-L-R
+    Apps-S-Z
+Over time some of these groups have far more applications and VMs than others.
+This script reads the values of each group and the VMs assigned to them, then proposes a new split
+into --groups ranges of first letters, balanced on both the number of values and the number of VMs.
+A group whose letters do not change keeps its name, so only the applications that change group move.
+Of the splits within --tolerance of the best balance the one that moves the fewest VMs is picked.
+
+The script runs in one of two modes:
+    plan  - reads the categories and VMs, prints the current and proposed balance and writes the moves to a plan file
+    apply - creates the new categories and values, then moves every VM in the plan with v3 batch updates
+    python BalanceAppCategories.py plan --groups 5
+    python BalanceAppCategories.py apply
+A moved VM has the old group removed, the new group added with the same application value,
+and AppType set to the new group.  The old categories are not deleted, update the Flow policies first.
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+import argparse
+import getpass
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+#The shared Prism API client is in the PrismClient folder at the top of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'PrismClient'))
+from PrismClient import PrismClient, PrismError
+from TaskTracker import TaskTracker
+from BatchUpdate import BatchUpdate
+from CategoryQuery import CategoryQuery
+
+
+#Applications are split on the first letter, names starting with a digit or other character go with A
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+#Names such as Apps_A-C or Apps-L-R, the letters of an existing group
+GROUP_NAME = re.compile(r'^Apps[_-]([A-Z])-([A-Z])$')
+
+
+def update_done(result):
+    '''
+    Function called by the batch updater when a VM update finishes
+    '''
+    print ("VM: {0:40s}  Task Status: {1},  Seconds: {2:.1f}".format(result.name,result.status,result.total_seconds))
+    if result.message and result.status != 'SUCCEEDED':
+        print (result.message)
+
+
+def first_letter(value):
+    '''
+    Function that returns the letter an application value is split on
+    '''
+    letter = value[:1].upper()
+    return letter if letter in LETTERS else LETTERS[0]
+
+
+def split_letters(weights, groups, move_cost, tolerance=0.05):
+    '''
+    Function that splits the letters into groups of letters next to each other
+    The largest group is made as small as it can be, then of the splits within tolerance of that
+    the one with the smallest move_cost(first index, last index) summed over the groups is used.
+    weights is the share of each letter in LETTERS, returns a list of (first index, last index)
+    '''
+    count = len(weights)
+    totals = [0.0]
+    for weight in weights:
+        totals.append(totals[-1] + weight)
+    #largest[k][i] is the smallest largest group when the first i letters are split into k groups
+    largest = [[float('inf')] * (count + 1) for k in range(groups + 1)]
+    largest[0][0] = 0.0
+    for k in range(1, groups + 1):
+        for i in range(k, count + 1):
+            for j in range(k - 1, i):
+                largest[k][i] = min(largest[k][i], max(largest[k - 1][j], totals[i] - totals[j]))
+    limit = largest[groups][count] * (1 + tolerance) + 1e-9
+
+    #moves[k][i] is the smallest move cost for the first i letters in k groups, each no larger than limit
+    moves = [[float('inf')] * (count + 1) for k in range(groups + 1)]
+    cut = [[0] * (count + 1) for k in range(groups + 1)]
+    moves[0][0] = 0
+    for k in range(1, groups + 1):
+        for i in range(k, count + 1):
+            for j in range(k - 1, i):
+                if totals[i] - totals[j] > limit or moves[k - 1][j] == float('inf'):
+                    continue
+                cost = moves[k - 1][j] + move_cost(j, i - 1)
+                if cost < moves[k][i]:
+                    moves[k][i] = cost
+                    cut[k][i] = j
+    ranges = []
+    end = count
+    for k in range(groups, 0, -1):
+        start = cut[k][end]
+        ranges.append((start, end - 1))
+        end = start
+    return list(reversed(ranges))
+
+
+def group_letters(name):
+    '''
+    Function that returns the first and last letter of an existing group name, None for other names
+    '''
+    match = GROUP_NAME.match(name)
+    return (match.group(1), match.group(2)) if match else None
+
+
+def print_balance(title, groups):
+    '''
+    Function that prints the values and VMs of each group with their share
+    '''
+    total_values = sum(group['values'] for group in groups) or 1
+    total_vms = sum(group['vms'] for group in groups) or 1
+    print ("\n{0}".format(title))
+    for group in groups:
+        print ("Group: {:15s} Letters: {:5s} Values: {:6d} ({:5.1f}%)  VMs: {:7d} ({:5.1f}%)".format(
+            group['name'], group.get('letters', ''), group['values'], 100.0 * group['values'] / total_values,
+            group['vms'], 100.0 * group['vms'] / total_vms))
+
+
+def put_category(client, path, payload):
+    '''
+    Function that creates a category key or value, an existing one is left as it is
+    '''
+    resp = client.get(path)
+    if resp.ok:
+        return False
+    resp = client.put(path, payload)
+    if not resp.ok:
+        raise PrismError("Could not create category {0}".format(path), resp)
+    return True
+
+
+def move_categories(vm, moves, type_key):
+    '''
+    Function that moves the application value of a VM to its new group
+    Returns False when the VM no longer has the value in the old group.
+    '''
+    categories = vm['metadata'].setdefault('categories', {})
+    mapping = vm['metadata'].setdefault('categories_mapping', {})
+    for move in moves:
+        if categories.get(move['from']) != move['value']:
+            return False
+    for move in moves:
+        del categories[move['from']]
+        mapping.pop(move['from'], None)
+        categories[move['to']] = move['value']
+        mapping[move['to']] = [move['value']]
+        if categories.get(type_key) == move['from']:
+            categories[type_key] = move['to']
+            mapping[type_key] = [move['to']]
+    return True
+
+
+parser = argparse.ArgumentParser(description="Plan and apply a balanced split of the application categories.")
+parser.add_argument('mode', choices=['plan', 'apply'])
+parser.add_argument('--prism', help="Prism IP or DNS name")
+parser.add_argument('--user', help="User ID for Prism, the password is read from PRISM_PASSWORD or prompted")
+parser.add_argument('--keys', nargs='+', default=['Apps_A-C','Apps_D-K','Apps-L-R','Apps-S-Z'], help="The application group categories today")
+parser.add_argument('--groups', type=int, help="Number of groups to split into, the number of --keys by default")
+parser.add_argument('--type-key', default='AppType', help="Category that holds the group name on each VM")
+parser.add_argument('--name-format', default='Apps_{0}-{1}', help="Name of a new group from its first and last letter")
+parser.add_argument('--tolerance', type=float, default=0.05, help="How much larger than the best split the largest group can be to move fewer VMs")
+parser.add_argument('--value-weight', type=float, default=0.5, help="Weight of the value count against the VM count, from 0 to 1")
+parser.add_argument('--plan-file', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'AppSplitPlan.json'),
+                    help="Plan file written by plan and read by apply")
+parser.add_argument('--batch-size', type=int, default=20, help="Apply only, VM updates in each v3 batch call")
+args = parser.parse_args()
+
+PC_address = args.prism or input ("Prism IP or DNS name: ")
+PC_user = args.user or input ("User ID for Prism: ")
+PC_pass = os.environ.get('PRISM_PASSWORD') or getpass.getpass('Password for Prism: ')
+#One pooled connection is used for every call this script makes
+client = PrismClient(PC_address, PC_user, PC_pass)
+
+if args.mode == 'plan':
+    groups = args.groups or len(args.keys)
+    if not 1 <= groups <= len(LETTERS):
+        print ("--groups must be between 1 and {0}".format(len(LETTERS)))
+        exit(1)
+    # # # # # # Read the values of each group and the VMs that have them # # # # # #
+    query = CategoryQuery(client)
+    try:
+        #(group, value) -> VMs with that value
+        assigned = {}
+        for key in args.keys:
+            for value in query.values(key):
+                assigned[(key, value)] = []
+        for vm in query.vms(args.keys):
+            for key in args.keys:
+                value = vm['metadata']['categories'].get(key)
+                if value is not None:
+                    assigned.setdefault((key, value), []).append({'uuid': vm['metadata']['uuid'], 'name': vm['spec']['name']})
+    except PrismError as ex:
+        print ("Something went wrong.", ex)
+        print (ex.response.content)
+        exit(1)
+
+    current = [{'name': key, 'letters': '-'.join(group_letters(key) or ()), 'values': sum(1 for group, value in assigned if group == key),
+                'vms': sum(len(found) for (group, value), found in assigned.items() if group == key)} for key in args.keys]
+    print_balance("Current groups", current)
+
+    # # # # # # Split the letters so each group has about the same share of values and VMs # # # # # #
+    letter_values = [0] * len(LETTERS)
+    letter_vms = [0] * len(LETTERS)
+    for (key, value), found in assigned.items():
+        index = LETTERS.index(first_letter(value))
+        letter_values[index] += 1
+        letter_vms[index] += len(found)
+    total_values = sum(letter_values) or 1
+    total_vms = sum(letter_vms) or 1
+    weights = [args.value_weight * values / total_values + (1 - args.value_weight) * vms / total_vms
+               for values, vms in zip(letter_values, letter_vms)]
+
+    #A group with the same letters as an existing one keeps its name so its VMs do not move
+    existing = {group_letters(key): key for key in args.keys if group_letters(key)}
+
+    def move_cost(start, end):
+        '''
+        Function that returns the number of VMs that move when the letters start to end become a group
+        '''
+        name = existing.get((LETTERS[start], LETTERS[end]))
+        return sum(len(found) for (key, value), found in assigned.items()
+                   if start <= LETTERS.index(first_letter(value)) <= end and key != name)
+
+    proposed = []
+    group_of = {}
+    for start, end in split_letters(weights, groups, move_cost, args.tolerance):
+        letters = (LETTERS[start], LETTERS[end])
+        name = existing.get(letters, args.name_format.format(*letters))
+        proposed.append({'name': name, 'letters': '{0}-{1}'.format(*letters), 'values': sum(letter_values[start:end + 1]),
+                         'vms': sum(letter_vms[start:end + 1])})
+        for index in range(start, end + 1):
+            group_of[LETTERS[index]] = name
+    print_balance("Proposed groups", proposed)
+
+    moves = []
+    for (key, value), found in sorted(assigned.items()):
+        new_key = group_of[first_letter(value)]
+        if new_key != key:
+            moves.append({'value': value, 'from': key, 'to': new_key, 'vms': found})
+    plan = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'prism': PC_address,
+        'type_key': args.type_key,
+        'keys': args.keys,
+        'groups': proposed,
+        'moves': moves,
+    }
+    with open(args.plan_file, 'w') as plan_json:
+        json.dump(plan, plan_json, indent=4)
+    print ("\nValues to move: {0}  VMs to update: {1}".format(len(moves), sum(len(move['vms']) for move in moves)))
+    print ("Plan written to {0}, review it and run apply to make the changes.".format(args.plan_file))
+    print ("Flow policies that use the old groups or AppType values need to be updated for the new groups.")
+    exit(0)
+
+# # # # # # Run the moves in the plan file # # # # # #
+with open(args.plan_file) as plan_json:
+    plan = json.load(plan_json)
+if plan['prism'] != PC_address:
+    print ("The plan was made against {0}, not {1}.".format(plan['prism'], PC_address))
+    exit(1)
+type_key = plan['type_key']
+
+#Every VM gets one update with all of its moves
+vm_moves = {}
+vm_names = {}
+for move in plan['moves']:
+    for vm in move['vms']:
+        vm_moves.setdefault(vm['uuid'], []).append(move)
+        vm_names[vm['uuid']] = vm['name']
+
+try:
+    #The new groups, their values and the new AppType values have to exist before a VM can use them
+    created = 0
+    for group in plan['groups']:
+        created += put_category(client, 'categories/{0}'.format(group['name']), {'name': group['name'], 'description': 'Applications {0}'.format(group['letters'])})
+        created += put_category(client, 'categories/{0}/{1}'.format(type_key, group['name']), {'value': group['name']})
+    for move in plan['moves']:
+        created += put_category(client, 'categories/{0}/{1}'.format(move['to'], move['value']), {'value': move['value']})
+    print ("Categories created: {0}".format(created))
+except PrismError as ex:
+    print ("Something went wrong.", ex)
+    print (ex.response.content)
+    exit(1)
+
+#Update tasks are checked together in the background, the VM updates are sent as v3 batch calls
+tracker = TaskTracker(client)
+updater = BatchUpdate(client, tracker, args.batch_size, on_result=update_done)
+skipped = []
+vm_uuids = list(vm_moves)
+#The full VMs are read a batch at a time, in parallel, and only the VMs in the plan are read
+with ThreadPoolExecutor(max_workers=8) as pool:
+    for start in range(0, len(vm_uuids), args.batch_size):
+        chunk = vm_uuids[start:start + args.batch_size]
+        for vm_uuid, resp in zip(chunk, pool.map(lambda vm_uuid: client.get('vms/' + vm_uuid), chunk)):
+            if not resp.ok:
+                print ("Could not read VM: {0:40s}  {1}".format(vm_names[vm_uuid], resp.text))
+                skipped.append(vm_names[vm_uuid])
+                continue
+            vm = json.loads(resp.content)
+            #remove the current VM status section, only configuration items are needed
+            del vm['status']
+            if not move_categories(vm, vm_moves[vm_uuid], type_key):
+                print ("Categories on VM {0} changed since the plan was made, skipping.".format(vm_names[vm_uuid]))
+                skipped.append(vm_names[vm_uuid])
+                continue
+            updater.submit("vms/{0}".format(vm_uuid), vm, name=vm_names[vm_uuid])
+
+#Wait for the updates that are still running
+print ("\nWaiting on the remaining update tasks.")
+updater.close()
+print ("Update results: {}".format(updater.summary()))
+for result in updater.failures():
+    print ("Failed: {:70s} {:12s} {}".format(result.name,result.status,result.message))
+for vm_name in skipped:
+    print ("Skipped: {}".format(vm_name))
+results_name = os.path.splitext(args.plan_file)[0] + '.results.csv'
+updater.write_csv(results_name)
+print ("Results file: {}".format(results_name))
+print ("The old groups and values were not deleted, remove them once the Flow policies use the new groups.")
+
+exit(0)
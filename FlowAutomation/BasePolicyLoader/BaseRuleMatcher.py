@@ -0,0 +1,273 @@
+#!/user/bin/env python
+
+"""
+Matches the base rules from BaseRules.json against Flow Security policies.
+
+The base rules are compiled once into indexes keyed by address group UUID and by
+category and value.  Each inbound or outbound entry of a policy is then resolved with
+dictionary lookups instead of looping over every rule, address and service in the base rules,
+so the work per policy grows with the size of the policy and not with the size of the base rules.
+Only the base rules a policy touches get per policy state, the base rules are never deep copied.
+The merge works on the SecurityRule model from FlowModel.py in the PrismClient folder, the merged rule
+shares every entry of the policy it was made from and only the base rule entries are new.
+
+Usage:
+    matcher = BaseRuleMatcher(base_data)
+    new_rule = matcher.merge_rule(SecurityRule.from_v3(policy), log)
+    new_policy = matcher.merge(policy, log)
+
+merge_rule returns a new SecurityRule with the missing base rules added, merge does the same for the v3 JSON
+and returns it without the status section.  The policy passed in is not changed.  rule_changed and
+policy_changed compare the app_rule of the two with AppRule.key(), entry order, reference order and names
+do not count, so a policy that already has every base rule is left alone.
+    if rule_changed(rule, new_rule):
+
+start_worker and merge_policy run the merge in the worker processes of PolicyPipeline, each process
+compiles the base rules once and gets the log lines back with the result.  With compact the allow lists are
+joined by AppRule.compacted() after the merge, and with merge_rules off the policy is only compacted and
+counts as changed when it has fewer entries.
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+
+from FlowModel import SecurityRule, AppRule, Peer, CategoryFilter, reference
+
+DIRECTIONS = ('inbound', 'outbound')
+
+
+def rule_changed(rule, new_rule):
+    '''
+    Function that returns True when the merged SecurityRule has a different app_rule than the one read from Prism
+    '''
+    return rule.app_rule.key() != new_rule.app_rule.key()
+
+
+def policy_changed(policy, new_policy):
+    '''
+    Function that returns True when the merged policy has a different app_rule than the policy read from Prism
+    '''
+    return AppRule.from_v3(policy['spec']['resources']['app_rule']).key() != AppRule.from_v3(new_policy['spec']['resources']['app_rule']).key()
+
+
+#Matcher of a worker process and what merge_policy does, set by start_worker
+worker_matcher = None
+worker_merge_rules = True
+worker_compact = False
+
+
+def start_worker(base_data, merge_rules=True, compact=False):
+    '''
+    Function run once in each worker process, compiles the base rules for merge_policy
+    '''
+    global worker_matcher, worker_merge_rules, worker_compact
+    worker_matcher = BaseRuleMatcher(base_data)
+    worker_merge_rules = merge_rules
+    worker_compact = compact
+
+
+def merge_policy(rule):
+    '''
+    Function run in a worker process, returns the merged SecurityRule (None when nothing changed) and the log lines
+    Only a changed rule is sent back so unchanged ones cost nothing to return.
+    '''
+    logs = []
+    log = lambda level, info: logs.append((level, info))
+    new_rule = worker_matcher.merge_rule(rule, log) if worker_merge_rules else rule
+    if worker_compact:
+        new_rule = compact_rule(new_rule, log)
+    if worker_merge_rules:
+        changed = rule_changed(rule, new_rule)
+    else:
+        #Compacting alone only sends the policies that got shorter
+        changed = new_rule.app_rule is not None and new_rule.app_rule.entry_count() < rule.app_rule.entry_count()
+    if not changed:
+        new_rule = None
+    return new_rule, logs
+
+
+def compact_rule(rule, log):
+    '''
+    Function that returns the SecurityRule with the entries of its allow lists joined, see compact_peers in FlowModel.py
+    '''
+    if rule.app_rule is None:
+        return rule
+    app_rule = rule.app_rule.compacted()
+    if app_rule.entry_count() < rule.app_rule.entry_count():
+        log("INFO", f"\tCompacted {rule.app_rule.entry_count()} entries into {app_rule.entry_count()}.")
+        return rule.with_app_rule(app_rule)
+    return rule
+
+
+class BaseEntry:
+    '''
+    One inbound or outbound rule from BaseRules.json
+    '''
+    __slots__ = ('rule_name', 'type', 'category', 'addresses', 'services')
+
+    def __init__(self, rule_name, base_rule):
+        self.rule_name = rule_name
+        self.type = base_rule['type']
+        self.category = None
+        self.addresses = {}
+        if self.type == 'category':
+            self.category = (base_rule['lookup_category'], base_rule['lookup_value'])
+        elif self.type == 'address':
+            for address in base_rule['address_list']:
+                self.addresses[address['uuid']] = reference(address.get('kind'), address['uuid'])
+        #Keyed by UUID, keeps the order from the file, the name is only in the file for the humans
+        self.services = {service['uuid']: reference(service.get('kind'), service['uuid']) for service in base_rule['service_list']}
+
+
+class EntryState:
+    '''
+    What is left of one base rule for the policy being merged
+    '''
+    __slots__ = ('services', 'addresses', 'removed')
+
+    def __init__(self, entry):
+        self.services = dict(entry.services)
+        self.addresses = dict(entry.addresses)
+        self.removed = False
+
+
+class BaseRuleMatcher:
+    '''
+    Base rules compiled into lookup tables, merges them into one policy at a time
+    '''
+    def __init__(self, base_data):
+        self.entries = {direction: [] for direction in DIRECTIONS}
+        #address group UUID -> index of the address rules that list it
+        self.by_address = {direction: {} for direction in DIRECTIONS}
+        #(category, value) -> index of the category rules for it
+        self.by_category = {direction: {} for direction in DIRECTIONS}
+
+        for rules in base_data['rules']:
+            for direction in DIRECTIONS:
+                for base_rule in rules.get(direction + '_rules', []):
+                    if base_rule['type'] not in ('category', 'address'):
+                        raise ValueError(f"Unknown type in config file in {direction.upper()} section.")
+                    entry = BaseEntry(rules['name'], base_rule)
+                    index = len(self.entries[direction])
+                    self.entries[direction].append(entry)
+                    if entry.type == 'category':
+                        self.by_category[direction].setdefault(entry.category, []).append(index)
+                    else:
+                        for address_uuid in entry.addresses:
+                            self.by_address[direction].setdefault(address_uuid, []).append(index)
+
+    def merge(self, policy, log=None):
+        '''
+        Function that returns the v3 JSON of the policy with the missing base rules added
+        '''
+        return self.merge_rule(SecurityRule.from_v3(policy), log).to_v3()
+
+    def merge_rule(self, rule, log=None):
+        '''
+        Function that returns a new SecurityRule with the missing base rules added
+        Raises ValueError when the policy has a peer type this script does not handle.
+        '''
+        if log is None:
+            log = lambda level, info: None
+        app_rule = rule.app_rule
+        if app_rule is None:
+            log("INFO", "\tPolicy has no app rule, skipping.")
+            return rule
+        target_params = app_rule.target_params()
+        allow_lists = {}
+
+        for direction in DIRECTIONS:
+            name = direction.capitalize()
+            #The entries of the policy are shared with the new rule, only the base rule entries are new
+            allowed = list(app_rule.allow_list(direction))
+            #Per policy state, only for the base rules this policy touches
+            state = {}
+
+            for peer in app_rule.allow_list(direction):
+                if peer.type == 'ALL':
+                    #Allow all traffic, solo rule, delete and replace
+                    log("INFO", f"\tAllow all {direction} traffic.")
+                    allowed = []
+
+                elif peer.type == 'IP_SUBNET':
+                    #Rule that filters by IP or by Address entry
+                    log("INFO", f"\t{name} Filter by IP or Address.")
+                    if peer.addresses is None:
+                        log("INFO", "\tRule is IP based, skipping.")
+                        continue
+                    api_services = [service.uuid for service in peer.services or ()]
+                    for address in peer.addresses:
+                        for index in self.by_address[direction].get(address.uuid, ()):
+                            entry_state = self._state(state, direction, index)
+                            log("INFO", f"{name} rule type IP match for base rule: {self.entries[direction][index].rule_name}")
+                            #Address found, take out the services the policy already allows for it
+                            for service_uuid in api_services:
+                                entry_state.services.pop(service_uuid, None)
+                            if not entry_state.services:
+                                entry_state.addresses.pop(address.uuid, None)
+
+                elif peer.type == 'FILTER':
+                    #Rule that filters by Category
+                    log("INFO", f"\t{name} Filter by Category.")
+                    api_services = [service.uuid for service in peer.services or ()]
+                    for api_category, api_value in peer.filter.params:
+                        log("INFO", f"\tCategory: {api_category}  Value: {api_value[0]}")
+                        for index in self.by_category[direction].get((api_category, api_value[0]), ()):
+                            entry_state = self._state(state, direction, index)
+                            log("INFO", f"{name} rule type Category match for base rule: {self.entries[direction][index].rule_name}")
+                            for service_uuid in api_services:
+                                entry_state.services.pop(service_uuid, None)
+
+                else:
+                    raise ValueError(f"Unknown filter type: {peer.type}.")
+
+            #A base rule with the same category and value as the policy target is not allowed, remove it
+            for target_category, target_value in target_params.items():
+                for index in self.by_category[direction].get((target_category, target_value[0]), ()):
+                    log("INFO", f"{name} rule matches security policy, will remove because matching categories is not allowed.")
+                    self._state(state, direction, index).removed = True
+
+            #Add what is left of the base rules
+            for index, entry in enumerate(self.entries[direction]):
+                entry_state = state.get(index)
+                services = entry_state.services if entry_state else entry.services
+                addresses = entry_state.addresses if entry_state else entry.addresses
+                if entry_state and entry_state.removed:
+                    continue
+
+                if entry.type == 'address':
+                    # { address_group_inclusion_list: [ { kind, uuid }, { kind, uuid } ],
+                    #   peer_specification_type: IP_SUBNET,
+                    #   service_group_list: [ { kind, uuid }, { kind, uuid } ] }
+                    if addresses and services:
+                        allowed.append(Peer('IP_SUBNET', addresses=tuple(addresses.values()), services=tuple(services.values())))
+                    elif addresses:
+                        # TODO - future version to handle this
+                        log("ERROR", f"Empty {direction} SERVICE, Address has data that was not added: {[address.to_v3() for address in addresses.values()]}")
+                    elif services:
+                        # TODO - future version to handle this
+                        log("ERROR", f"Empty {direction} ADDRESS, Service has data that was not added: {[service.to_v3() for service in services.values()]}")
+                    else:
+                        #Empty because all the rules were already in the policy.
+                        log("INFO", f"Empty Address and Service, no {name} rule to add.")
+
+                elif services:
+                    # { filter: { kind_list: [ "vm" ], params: { category: [ value ] }, type: CATEGORIES_MATCH_ALL },
+                    #   peer_specification_type: FILTER,
+                    #   service_group_list: [ { kind, uuid }, { kind, uuid } ] }
+                    base_category, base_value = entry.category
+                    allowed.append(Peer('FILTER', services=tuple(services.values()),
+                                        filter=CategoryFilter('CATEGORIES_MATCH_ALL', ('vm',), ((base_category, (base_value,)),))))
+
+            allow_lists[direction] = allowed
+
+        return rule.with_app_rule(app_rule.with_allow_lists(**allow_lists))
+
+    def _state(self, state, direction, index):
+        '''
+        Function that returns the per policy state of a base rule, made the first time the policy touches it
+        '''
+        entry_state = state.get(index)
+        if entry_state is None:
+            entry_state = state[index] = EntryState(self.entries[direction][index])
+        return entry_state
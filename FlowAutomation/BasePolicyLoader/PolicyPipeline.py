@@ -0,0 +1,182 @@
+#!/user/bin/env python
+
+"""
+Runs the policy updates as three stages joined by bounded queues so merging and updating overlap.
+
+BasePolicyLoader read a policy, merged the base rules into it and sent the PUT before it looked
+at the next policy, all on one thread, so the CPU sat idle during every PUT and the network sat
+idle during every merge.  The pipeline runs the work as stages that all run at the same time:
+    1. fetch   - the calling thread reads the policies and puts them on the fetch queue.
+    2. compute - the merge runs in a pool of processes, up to queue_size policies at a time.
+                 Results are passed on in the order the policies were read.
+    3. submit  - submit_workers threads take the results and send the updates, the task
+                 tracker waits on the update tasks in the background.
+Each queue holds at most queue_size items, so a slow stage makes the stages before it wait
+instead of every policy being held in memory.  The first error in any stage stops the work,
+the stages drain their queues and run() raises the error again.
+
+compute must be a function at the top of a module so it can be sent to the processes, and
+initializer sets up each process once.  processes=None uses one process per CPU less one, which is left
+for the fetch and submit threads.  With processes=0, or on a single CPU, compute runs on the compute thread.
+The fetch is done on the calling thread so the source can be a generator tied to that thread,
+such as InventoryCache.entities().
+
+Usage:
+    pipeline = PolicyPipeline(merge_policy, submit, initializer=start_worker, initargs=(base_data,))
+    pipeline.run(policies)
+    print (pipeline.counts)
+
+submit is called on a submit thread with each item and its compute result.
+A script that uses a process pool must keep its main code under if __name__ == '__main__':,
+on Windows every process imports the script again.
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+#Put on a queue after the last item
+DONE = object()
+
+
+class PolicyPipeline:
+    '''
+    Fetch, compute and submit stages joined by bounded queues
+    '''
+    def __init__(self, compute, submit, initializer=None, initargs=(), processes=None, submit_workers=8, queue_size=64):
+        self.compute = compute
+        self.submit = submit
+        self.initializer = initializer
+        self.initargs = initargs
+        #None leaves one CPU for the threads, a single CPU machine computes on the compute thread
+        self.processes = processes if processes is not None else (os.cpu_count() or 1) - 1
+        self.submit_workers = submit_workers
+        self.queue_size = queue_size
+        self.counts = {'fetched': 0, 'computed': 0, 'submitted': 0}
+        self.error = None
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+
+    def run(self, source):
+        '''
+        Function that runs every item from source through the stages and returns when all are submitted
+        '''
+        fetch_queue = queue.Queue(self.queue_size)
+        submit_queue = queue.Queue(self.queue_size)
+        threads = [threading.Thread(target=self._compute_stage, args=(fetch_queue, submit_queue), daemon=True)]
+        threads += [threading.Thread(target=self._submit_stage, args=(submit_queue,), daemon=True) for worker in range(self.submit_workers)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for item in source:
+                if self.stopped.is_set():
+                    break
+                fetch_queue.put(item)
+                self.counts['fetched'] += 1
+        except Exception as ex:
+            self._fail(ex)
+        #The stages after this one keep reading until DONE, so this put can not block for good
+        fetch_queue.put(DONE)
+        for thread in threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.counts
+
+    def _compute_stage(self, fetch_queue, submit_queue):
+        '''
+        Function run on the compute thread, keeps up to queue_size items in the process pool
+        '''
+        pool = None
+        try:
+            if self.processes == 0:
+                if self.initializer:
+                    self.initializer(*self.initargs)
+            else:
+                pool = ProcessPoolExecutor(max_workers=self.processes, initializer=self.initializer, initargs=self.initargs)
+        except Exception as ex:
+            self._fail(ex)
+        #(item, future) in the order the items were read
+        running = deque()
+        while True:
+            item = fetch_queue.get()
+            if item is DONE:
+                break
+            if self.stopped.is_set():
+                continue
+            if pool is None:
+                try:
+                    result = self.compute(item)
+                except Exception as ex:
+                    self._fail(ex)
+                    continue
+                self._hand_on(submit_queue, item, result)
+                continue
+            try:
+                running.append((item, pool.submit(self.compute, item)))
+            except Exception as ex:
+                #The pool is broken, such as a worker process that died
+                self._fail(ex)
+                continue
+            while len(running) >= self.queue_size:
+                self._collect(running.popleft(), submit_queue)
+        while running:
+            self._collect(running.popleft(), submit_queue)
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        for worker in range(self.submit_workers):
+            submit_queue.put(DONE)
+
+    def _collect(self, running, submit_queue):
+        '''
+        Function that waits for one item in the process pool and passes its result to the submit stage
+        '''
+        item, future = running
+        if self.stopped.is_set():
+            future.cancel()
+            return
+        try:
+            result = future.result()
+        except Exception as ex:
+            self._fail(ex)
+            return
+        self._hand_on(submit_queue, item, result)
+
+    def _hand_on(self, submit_queue, item, result):
+        '''
+        Function that puts one compute result on the submit queue
+        '''
+        self.counts['computed'] += 1
+        submit_queue.put((item, result))
+
+    def _submit_stage(self, submit_queue):
+        '''
+        Function run on each submit thread, sends the updates until the compute stage is done
+        '''
+        while True:
+            work = submit_queue.get()
+            if work is DONE:
+                return
+            if self.stopped.is_set():
+                continue
+            try:
+                self.submit(*work)
+            except Exception as ex:
+                self._fail(ex)
+                continue
+            with self.lock:
+                self.counts['submitted'] += 1
+
+    def _fail(self, error):
+        '''
+        Function that keeps the first error and tells every stage to stop
+        '''
+        with self.lock:
+            if self.error is None:
+                self.error = error
+        self.stopped.set()
@@ -0,0 +1,228 @@
+#!/user/bin/env python
+
+"""
+Checks the categories on a VM against the rules in CategoryRules.json.
+
+FixVMCategories used to check one thing in code: a VM in one of the Apps_* groups must have the
+matching AppType.  Every new check meant another script and another pass over all the VMs.
+The checks are now rules in a file and every rule is checked on each VM in the one pass:
+    required            - the key must be on the VM, "when" limits it to VMs with other categories
+    implied             - VMs with the "if" categories must also have the "then" categories
+    mutually_exclusive  - a VM can have at most one of the keys
+    must_match          - a VM with one of the keys must have target set to that key (or its value)
+A value of "*" matches any value.  Missing categories are added when the rule says what to add,
+anything else is reported for a manual fix.  All the categories a VM is missing are merged into
+one fix, and the rules are checked again on the fixed categories so an added category can bring
+in the categories it implies.
+
+Usage:
+    rules = load_rules(file_path + '\\CategoryRules.json')
+    check = rules.check(vm['metadata']['categories'])
+    for level, message in check.messages:
+        ...
+    if check.fixes:
+        #key -> value to add to the VM
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+
+import json
+
+#Fields each rule type needs in the rules file
+RULE_FIELDS = {
+    'required': ('key',),
+    'implied': ('if', 'then'),
+    'mutually_exclusive': ('keys',),
+    'must_match': ('keys', 'target'),
+}
+
+
+def load_rules(file_name):
+    '''
+    Function that reads the rules file and returns the checked rules
+    '''
+    with open(file_name) as rules_json:
+        return CategoryRules(json.load(rules_json))
+
+
+def value_matches(actual, expected):
+    '''
+    Function that compares a category value with a rule value, "*" matches anything and a list matches any of its values
+    '''
+    if expected == '*':
+        return True
+    if isinstance(expected, list):
+        return actual in expected
+    return actual == expected
+
+
+def conditions_match(categories, conditions):
+    '''
+    Function that checks key -> value conditions against the categories on a VM
+    '''
+    for key, expected in conditions.items():
+        if key not in categories or not value_matches(categories[key], expected):
+            return False
+    return True
+
+
+class CategoryCheck:
+    '''
+    Outcome of checking one VM, fixes is key -> value to add and messages is (level, message)
+    '''
+    __slots__ = ('fixes', 'messages', 'applied')
+
+    def __init__(self):
+        self.fixes = {}
+        self.messages = []
+        #Names of the rules that applied to the VM, fixed or not
+        self.applied = []
+
+
+class CategoryRules:
+    '''
+    The rules from the rules file, checked on one VM at a time
+    '''
+    def __init__(self, rules_data):
+        self.rules = []
+        for number, rule in enumerate(rules_data.get('rules', []), 1):
+            rule_type = rule.get('type')
+            if rule_type not in RULE_FIELDS:
+                raise ValueError("Unknown category rule type {0} in rule {1}".format(rule_type, rule.get('name', number)))
+            for field in RULE_FIELDS[rule_type]:
+                if field not in rule:
+                    raise ValueError("Category rule {0} is missing {1}".format(rule.get('name', number), field))
+            rule = dict(rule)
+            rule.setdefault('name', "Rule {0}".format(number))
+            rule.setdefault('fix', True)
+            self.rules.append(rule)
+
+    def scope_keys(self):
+        '''
+        Function that returns the category keys a VM needs for any rule to apply to it
+        None when a rule applies to every VM, such as a required key without "when".
+        '''
+        keys = set()
+        for rule in self.rules:
+            if rule['type'] == 'required':
+                if not rule.get('when'):
+                    return None
+                keys.update(rule['when'])
+            elif rule['type'] == 'implied':
+                keys.update(rule['if'])
+            else:
+                keys.update(rule['keys'])
+        return sorted(keys)
+
+    def check(self, categories):
+        '''
+        Function that checks every rule on the categories of one VM and merges the fixes
+        '''
+        result = CategoryCheck()
+        current = dict(categories)
+        #key -> rule name for every category added, and the keys two rules want set to different values
+        fixed_by = {}
+        conflicts = {}
+        #Each round checks all the rules on the categories fixed so far, it stops when a round changes nothing
+        for attempt in range(len(self.rules) + 1):
+            fixes = {}
+            problems = []
+            applied = []
+            changed = False
+            for rule in self.rules:
+                wanted, rule_problems = getattr(self, '_' + rule['type'])(rule, current, fixed_by)
+                if wanted is None:
+                    continue
+                applied.append(rule['name'])
+                problems.extend(rule_problems)
+                for key, value in wanted.items():
+                    if key in conflicts:
+                        continue
+                    other = fixes.get(key, result.fixes.get(key))
+                    if other is not None and other != value:
+                        conflicts[key] = "Rules {0} and {1} want {2}:{3} and {2}:{4}, MANUAL FIX NEEDED".format(
+                            fixed_by[key], rule['name'], key, other, value)
+                        fixes.pop(key, None)
+                        if key in result.fixes:
+                            #Added in an earlier round, take it back off
+                            del result.fixes[key]
+                            del current[key]
+                            changed = True
+                        continue
+                    if other is None:
+                        fixes[key] = value
+                        fixed_by[key] = rule['name']
+            if not fixes and not changed:
+                break
+            current.update(fixes)
+            result.fixes.update(fixes)
+        else:
+            problems = [("ERROR", "Rules keep changing the categories, check the rules file for a loop")]
+        for key, value in result.fixes.items():
+            result.messages.append(("WARN", "{0} was missing, will add {0}:{1} ({2})".format(key, value, fixed_by[key])))
+        result.messages.extend(problems)
+        result.messages.extend(("ERROR", message) for message in conflicts.values())
+        result.applied = applied
+        return result
+
+    def _required(self, rule, categories, fixed):
+        '''
+        Function that checks a required key, returns the fix and problems or None when the rule does not apply
+        fixed has the keys added by other rules, a rule that wants a different value for one of those asks for its own value
+        '''
+        if not conditions_match(categories, rule.get('when', {})):
+            return None, []
+        if rule['key'] in categories:
+            return {}, []
+        if rule['fix'] and rule.get('value', '*') != '*':
+            return {rule['key']: rule['value']}, []
+        return {}, [("ERROR", "{0} is missing ({1}) MANUAL FIX NEEDED".format(rule['key'], rule['name']))]
+
+    def _implied(self, rule, categories, fixed):
+        '''
+        Function that checks the categories implied by other categories
+        '''
+        if not conditions_match(categories, rule['if']):
+            return None, []
+        wanted = {}
+        problems = []
+        for key, expected in rule['then'].items():
+            if key not in categories or (key in fixed and not value_matches(categories[key], expected)):
+                if rule['fix'] and expected != '*' and not isinstance(expected, list):
+                    wanted[key] = expected
+                else:
+                    problems.append(("ERROR", "{0} is missing ({1}) MANUAL FIX NEEDED".format(key, rule['name'])))
+            elif not value_matches(categories[key], expected):
+                problems.append(("ERROR", "{0} is {1} and should be {2} ({3}) MANUAL FIX NEEDED".format(key, categories[key], expected, rule['name'])))
+        return wanted, problems
+
+    def _mutually_exclusive(self, rule, categories, fixed):
+        '''
+        Function that checks that at most one of the keys is on the VM
+        '''
+        found = [key for key in rule['keys'] if key in categories]
+        if not found:
+            return None, []
+        if len(found) > 1:
+            return {}, [("ERROR", "Only one of {0} is allowed ({1}) MANUAL FIX NEEDED".format(', '.join(found), rule['name']))]
+        return {}, []
+
+    def _must_match(self, rule, categories, fixed):
+        '''
+        Function that checks the target is set to the key found, or to its value when match is "value"
+        '''
+        found = [key for key in rule['keys'] if key in categories]
+        if not found:
+            return None, []
+        if len(found) > 1:
+            return {}, [("ERROR", "{0} can not be matched, the VM has {1} ({2}) INVESTIGATE".format(rule['target'], ', '.join(found), rule['name']))]
+        expected = categories[found[0]] if rule.get('match') == 'value' else found[0]
+        actual = categories.get(rule['target'])
+        if actual is None or (rule['target'] in fixed and actual != expected):
+            if rule['fix']:
+                return {rule['target']: expected}, []
+            return {}, [("ERROR", "{0} is missing ({1}) MANUAL FIX NEEDED".format(rule['target'], rule['name']))]
+        if actual != expected:
+            return {}, [("ERROR", "{0} is {1} and {2} is on the VM ({3}) MANUAL FIX NEEDED".format(rule['target'], actual, found[0], rule['name']))]
+        return {}, []
@@ -9,96 +9,55 @@ To keep the overall AppType category from being overloaded the Apps were broken
     Apps-S-Z
 For the Flow Security policies to work the VMs need both AppType and the Apps above assigned.  
 This script is to fix the missing AppType assignment, will find the assigned name from the above list.
+The checks are rules in CategoryRules.json, every rule is checked on each VM in one pass and
+a VM gets one update with all of its missing categories.
 
 Author: Corey Anson
 Date: 10/10/2024
 """
-from dataclasses import dataclass
-import requests
-import urllib3
 import getpass
 import json
 import os
-import math
+import sys
+import threading
 import time
-from requests.auth import HTTPBasicAuth
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-
-
-def make_request(ip_address,user,passwd,call_type,data_list):
-    '''
-    Function that return the response of the REST API call in a JSON object
-    '''
-    header = {"content-type": "application/json"}
-    auth = HTTPBasicAuth(user, passwd)
-    url_list = "https://{0}:9440/api/nutanix/v3/{1}/list".format(ip_address,call_type)
-    try:
-        res_list = requests.post(url=url_list, data=json.dumps(data_list), auth=auth, headers=header, verify=False)
-        return res_list
-    except Exception as ex:
-        writeLog ("Error","There was an issue requesting the VM list.",logfile)
-        writeLog ("Error",ex.args,logfile)
-
-def update_vm(ip_address,user,passwd,vm_uuid,data_list):
-    '''
-    Function to update the VM
-    '''
-    header = {"content-type": "application/json"}
-    auth = HTTPBasicAuth(user, passwd)
-    url_list = "https://{0}:9440/api/nutanix/v3/vms/{1}".format(ip_address,vm_uuid)
-    try:
-        status = requests.put(url=url_list, data=json.dumps(data_list), auth=auth, headers=header, verify=False)
-        if status.ok:
-            writeLog ("Info","VM has been updated, waiting on task to complete.",logfile)
-            task_uuid = json.loads(status.text)['status']['execution_context']['task_uuid']
-            #wait for task to complete and print out status
-            get_task_status(ip_address,user,passwd,task_uuid)
-
-        else:
-            writeLog ("Warn","Status not OK",logfile)
-            writeLog ("Warn",status.text,logfile)
-    except Exception as ex:
-        writeLog ("Error","There was an issue performing the update.",logfile)
-        writeLog ("Error",ex.args,logfile)
-
-def get_task_status(ip_address,user,passwd,task_uuid):
+#The shared Prism API client is in the PrismClient folder at the top of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'PrismClient'))
+from PrismClient import PrismClient, PrismError
+from TaskTracker import TaskTracker
+from BulkUpdate import BulkUpdate
+from BatchUpdate import BatchUpdate
+from CategoryAssociation import CategoryAssociation
+from CategoryRules import load_rules
+from CategoryQuery import CategoryQuery
+from InventoryCache import InventoryCache
+
+
+def update_done(result):
     '''
-    Function that waits for the task to complete
+    Function called by the bulk updater when a VM update finishes
     '''
-    header = {"content-type": "application/json"}
-    data_list = {}
-    auth = HTTPBasicAuth(user, passwd)
-    url_list = "https://{0}:9440/api/nutanix/v3/tasks/{1}".format(ip_address,task_uuid)
-    state = "RUNNING"
-    try:
-        #Loop until task changes status from running
-        while state == "RUNNING":
-            time.sleep(5)
-            task_status = requests.get(url=url_list, data=json.dumps(data_list), auth=auth, headers=header, verify=False)
-            if task_status.ok:
-                state = json.loads(task_status.content)['status']
-                p_complete = json.loads(task_status.content)['percentage_complete']
-                writeLog ("Info","Task Status: {0},  Percent Complete: {1}".format(state,p_complete),logfile)
-                
-            else:
-                writeLog ("Error","There was an issue requesting the task status. ",logfile)
-                writeLog ("Error",task_status.text,logfile)
-
-    except Exception as ex:
-        writeLog ("Error","There was an issue requesting the task status.",logfile)
-        writeLog ("Error",ex.args,logfile)
+    level = "Info" if result.status == 'SUCCEEDED' else "Error"
+    #The status and the message of one VM are kept together in the log
+    with log_lock:
+        writeLog (level,"VM: {0:40s}  Task Status: {1},  Seconds: {2:.1f}".format(result.name,result.status,result.total_seconds),logfile)
+        if result.message:
+            writeLog (level,result.message,logfile)
+
+#writeLog is called from the main thread and from the updater and task tracker threads
+log_lock = threading.RLock()
 
 def writeLog (level,info,logfile):
     #Write output to screen and html log for color output
     level = level.upper()
-    logfile.write(f'[{level}]: {info}\n')
-    if level == 'INFO':
-        prGreen(info)
-    elif level == "WARN":
-        prYellow(info)
-    elif level == "ERROR":
-        prRed(info)
+    with log_lock:
+        logfile.write(f'[{level}]: {info}\n')
+        if level == 'INFO':
+            prGreen(info)
+        elif level == "WARN":
+            prYellow(info)
+        elif level == "ERROR":
+            prRed(info)
 
 def prRed(skk): print("\033[91m {}\033[00m" .format(skk))
  
@@ -113,6 +72,32 @@ def prYellow(skk): print("\033[93m {}\033[00m" .format(skk))
 PC_address = input ("Prism IP or DNS name: ")
 PC_user = input ("User ID for Prism: ")
 PC_pass = getpass.getpass('Password for Prism: ')
+#One pooled connection is used for every call this script makes
+client = PrismClient(PC_address, PC_user, PC_pass)
+#Update tasks are checked together in the background instead of waiting on each one
+tracker = TaskTracker(client)
+#Number of VM updates allowed to run at the same time, raise with care on busy clusters
+max_in_flight = 10
+#Send the updates as v3 /batch calls, batch_size VMs per call, instead of one PUT per VM
+use_batch = True
+batch_size = 20
+#Number of batches running at the same time, each one holds up to batch_size tasks
+max_batches = 2
+#Add AppType with the v4 associate-categories action, only the category is sent instead of the whole VM spec
+#The full v3 PUT is used when the v4 APIs are not available on this Prism
+use_v4 = True
+v4_updater = None
+if use_v4:
+    v4_updater = CategoryAssociation(client, tracker, batch_size, max_batches, on_result=update_done)
+    if not v4_updater.available():
+        v4_updater.close()
+        v4_updater = None
+if v4_updater:
+    updater = v4_updater
+elif use_batch:
+    updater = BatchUpdate(client, tracker, batch_size, max_batches, on_result=update_done)
+else:
+    updater = BulkUpdate(client, tracker, max_in_flight, on_result=update_done)
 
 #Log the output
 file_path = os.path.dirname(__file__)
@@ -120,71 +105,93 @@ log_time = time.strftime('%Y%m%d.%H%M')
 logfile_name = file_path + '\\FixCategories.' + log_time + '.log'
 print (logfile_name)
 logfile = open(logfile_name, 'w')
+if use_v4 and not v4_updater:
+    writeLog("WARN","The v4 category API is not available, VMs will be updated with the v3 PUT",logfile)
 
 # # # # # # # Pull a list of VMs to compare the Categories # # # # # #
 #default is 20 VMs without a payload to increase the response number
 max_vms_in_response = 500
-#starting the loop at zero. This is to handle more than 500 VM systems.
-offset = 0
+#Pages after the first are fetched in parallel, this is the number of pages requested at the same time
+page_workers = 4
 call_type = 'vms'
-
-payload = {'kind':'vm','length': max_vms_in_response,'offset': offset}
-resp = make_request(PC_address, PC_user, PC_pass, call_type, payload)
-app_categories = ['Apps_A-C','Apps_D-K','Apps-L-R','Apps-S-Z']
-# If the request went through correctly, print it out.  Otherwise error out, and print the response.
-if resp.ok:
-    #Get the count of how many VMs are hosted in this system
-    vm_count = json.loads(resp.content)['metadata']['total_matches']
-    vms_in_request = json.loads(resp.content)['metadata']['length']
-
-    #Set how many loops are needed to work through all the VMs 
-    iterations = math.ceil((vm_count - vms_in_request) / max_vms_in_response)
-    iterator = 0
-
-    while iterator <= iterations:
-        #Loop through the JSON content checking each VM
-        for vm in json.loads(resp.content)['entities']:
-            vm_name = vm['spec']['name']
-            vm_uuid = vm['metadata']['uuid']
-            found_apptype = ''
-            found_application = ''
-
-            for categories,value in vm['metadata']['categories'].items():
-                if categories == 'AppType':
-                    found_apptype = value
-                if categories in app_categories:
-                    found_application = categories
-
-            if found_application in app_categories:
-                if not found_apptype:
-                    writeLog ("WARN","AppType was missing, will add AppType:{:10s} to VM: {:40s}".format(found_application,vm_name),logfile)
-                    #remove the current VM status section, only configuration items are needed
-                    del vm['status']
-                    new_catmap = [found_application]
-                    vm['metadata']['categories']['AppType'] = found_application
-                    vm['metadata']['categories_mapping']['AppType'] = new_catmap
-                    
-                    #Update the VM in Prism Central
-                    update_vm(PC_address, PC_user, PC_pass,vm_uuid,vm)  
-
-                elif found_application != found_apptype:
-                    writeLog ("ERROR","AppType mismatch on VM: {:20s}  AppType is: {:15s} and Application Group is: {:15s} MANUAL FIX NEEDED".format(vm_name,found_apptype,found_application),logfile)
-                elif found_application == found_apptype:
-                    writeLog ("INFO","No action needed for VM: {:20s}  AppType is: {:15s} and Application Group is: {:15s}".format(vm_name,found_apptype,found_application),logfile)
-                else:
-                    writeLog ("ERROR","Nothing matched on VM: {:20s}  AppType is: {:15s} and Application Group is: {:15s} INVESTIGATE".format(vm_name,found_apptype,found_application),logfile)  
-                     
-        iterator += 1
-        offset += vms_in_request
-        #Loop through the remaining VMs up to 500 at a time, system will not return more than 500
-        payload = {'kind':'vm','length': max_vms_in_response,'offset': offset}
-        resp = make_request(PC_address, PC_user, PC_pass, call_type, payload)
-   
-else:
-    prRed("Something went wrong."), resp.content
+#Keep a local copy of the VMs between runs, later runs only read the VMs that changed
+use_cache = True
+#Only read the name and categories of the VMs that have a category the rules look at
+#The full VM is only read for the VMs that need a v3 update
+#The query reads the in scope VMs from Prism on every run, so when it is True it is used instead of
+#the cache, the cache is used when it is False, and the full VM list is read when both are False
+use_category_query = False
+
+#The category checks, see the README for the rule types
+rules = load_rules(file_path + '\\CategoryRules.json')
+# If a page request fails, error out, and print the response.
+scope_keys = rules.scope_keys()
+query = None
+try:
+    if use_category_query and scope_keys:
+        query = CategoryQuery(client)
+        vm_source = query.vms(scope_keys)
+    elif use_cache:
+        cache = InventoryCache(client, file_path + '\\Inventory.db')
+        writeLog("INFO",f"Inventory sync: {cache.sync(call_type, 'vm')}",logfile)
+        vm_source = cache.entities('vm')
+    else:
+        #Loop through the VMs one at a time, each page is read once and dropped when done
+        vm_source = client.list_entities(call_type, 'vm', length=max_vms_in_response, workers=page_workers)
+    for vm in vm_source:
+        vm_name = vm['spec']['name']
+        vm_uuid = vm['metadata']['uuid']
+
+        check = rules.check(vm['metadata'].get('categories', {}))
+        for level, message in check.messages:
+            writeLog (level,"VM: {:40s}  {}".format(vm_name,message),logfile)
+        if not check.fixes:
+            if check.applied and not check.messages:
+                writeLog ("INFO","No action needed for VM: {:40s}  Rules: {}".format(vm_name,', '.join(check.applied)),logfile)
+            continue
+
+        if v4_updater:
+            #Only the categories are sent, the VM's ETag guards against changes made since it was read
+            updater.submit(vm_uuid, check.fixes, name=vm_name)
+            continue
+        if 'status' not in vm:
+            #Only the name and categories were read, the PUT needs the full VM
+            resp = client.get("vms/{0}".format(vm_uuid))
+            if not resp.ok:
+                writeLog ("ERROR","Could not read VM: {:40s}  {}".format(vm_name,resp.text),logfile)
+                continue
+            vm = json.loads(resp.content)
+        #remove the current VM status section, only configuration items are needed
+        del vm['status']
+        for key, value in check.fixes.items():
+            vm['metadata']['categories'][key] = value
+            vm['metadata']['categories_mapping'][key] = [value]
+
+        #Update the VM in Prism Central with every missing category at once
+        updater.submit("vms/{0}".format(vm_uuid), vm, name=vm_name)
+
+
+except PrismError as ex:
+    writeLog("ERROR","Something went wrong.", logfile)
+    writeLog("ERROR",ex.response.content, logfile)
+    logfile.close()
     exit(1)
 
 
+if query:
+    writeLog("INFO",f"VMs with the rule categories: {query.in_scope},  read in full: {query.full_reads}",logfile)
+
+#Wait for the updates that are still running
+writeLog("INFO","Waiting on the remaining update tasks.",logfile)
+updater.close()
+writeLog("INFO",f"Update results: {updater.summary()}",logfile)
+if use_batch or v4_updater:
+    writeLog("INFO",f"Batches sent: {updater.batch_count},  VMs retried: {len(updater.retried())}",logfile)
+
+#Per VM results with timings
+results_name = file_path + '\\FixCategories.' + log_time + '.results.csv'
+updater.write_csv(results_name)
+writeLog("INFO",f"Results file: {results_name}",logfile)
 logfile.close()
 
 exit(0)
@@ -0,0 +1,310 @@
+#!/user/bin/env python
+
+"""
+Local stand-in for Prism Central to try FixVMCategories without touching a real system.
+
+It answers the calls FixVMCategories makes:
+    v3 - vms/list, vms/{uuid} GET and PUT (with spec_version checks), batch, tasks/list and tasks/{uuid},
+         categories/{key}/list, category/query and the groups call for VM names and categories,
+         categories/{key} and categories/{key}/{value} GET and PUT
+    v4 - categories list, VM GET with an ETag, the batch action for associate-categories,
+         the batch task and the batch results
+--scope is the percent of VMs with one of the Apps_* categories, every third one of those is missing AppType.
+With --no-v4 every v4 path returns 404 so the v3 PUT path is used.
+--etag-conflicts N changes the first N VMs just before their batch runs, those get a 412 and are retried.
+
+Usage:
+    python MockPrism.py --vms 500 --port 9440
+    python FixVMCategories.py      (Prism IP or DNS name: http://127.0.0.1:9440)
+Press Ctrl+C to stop, the number of calls, bytes sent and VMs fixed are printed.
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import argparse
+import json
+import re
+import threading
+import uuid
+
+
+app_categories = ['Apps_A-C','Apps_D-K','Apps-L-R','Apps-S-Z']
+#Application values, more of them start with S to T than with the other letters like on a real system
+app_names = ['Ariba', 'Bamboo', 'Confluence', 'Docker', 'Exchange', 'Grafana', 'Jira', 'Kafka', 'Lync', 'Mongo', 'Oracle', 'Redis',
+             'Salesforce', 'SAP', 'SCCM', 'ServiceNow', 'SharePoint', 'Skype', 'Solarwinds', 'Splunk', 'SQL', 'Tableau', 'Teams', 'Tomcat']
+lock = threading.Lock()
+vms = {}
+categories = {}
+category_keys = set()
+tasks = {}
+batches = {}
+calls = {}
+conflicts = [0]
+v4_enabled = [True]
+
+
+def make_vms(count, scope=100):
+    '''
+    Function that builds the VMs, scope percent have an Apps_* category and every third one of those is missing AppType
+    '''
+    for number in range(count):
+        vm_uuid = str(uuid.uuid4())
+        app_name = app_names[number % len(app_names)]
+        app = group_of(app_name)
+        vm_categories = {}
+        if number % 100 < scope:
+            vm_categories[app] = app_name
+            if number % 3:
+                vm_categories['AppType'] = app
+        vms[vm_uuid] = {
+            'metadata': {'kind': 'vm', 'uuid': vm_uuid, 'spec_version': 1, 'categories': vm_categories,
+                         'categories_mapping': {key: [value] for key, value in vm_categories.items()}},
+            'spec': {'name': 'MockVM{0:05d}'.format(number), 'resources': {'nic_list': [], 'disk_list': []}},
+            'status': {'name': 'MockVM{0:05d}'.format(number)},
+            'etag': 1,
+        }
+    for value in app_categories:
+        categories[str(uuid.uuid4())] = {'key': 'AppType', 'value': value}
+    for value in app_names:
+        categories[str(uuid.uuid4())] = {'key': group_of(value), 'value': value}
+
+
+def group_of(app_name):
+    '''
+    Function that returns the Apps_* group an application is in today
+    '''
+    letter = app_name[0].upper()
+    for key in app_categories:
+        if key[-3] <= letter <= key[-1]:
+            return key
+    return app_categories[0]
+
+
+def new_task(status='SUCCEEDED', **extra):
+    '''
+    Function that records a finished task and returns its UUID
+    '''
+    task_uuid = str(uuid.uuid4())
+    tasks[task_uuid] = dict(extra, status=status)
+    return task_uuid
+
+
+def v3_vm(vm):
+    '''
+    Function that returns a VM without the mock's own fields
+    '''
+    return {key: value for key, value in vm.items() if key != 'etag'}
+
+
+class Handler(BaseHTTPRequestHandler):
+    '''
+    Answers the v3 and v4 calls
+    '''
+    def log_message(self, *args):
+        pass
+
+    def send(self, code, body, headers=None):
+        data = json.dumps(body).encode()
+        with lock:
+            calls['bytes'] = calls.get('bytes', 0) + len(data)
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def count(self, name):
+        with lock:
+            calls[name] = calls.get(name, 0) + 1
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        path = url.path
+        if path.startswith('/api/nutanix/v3/vms/'):
+            self.count('v3 VM GET')
+            vm = vms.get(path.split('/')[-1])
+            return self.send(200, v3_vm(vm)) if vm else self.send(404, {'message': 'VM not found'})
+        match = re.match(r'/api/nutanix/v3/categories/([^/]+)(?:/([^/]+))?$', path)
+        if match:
+            found = [value for value in categories.values() if value['key'] == match.group(1) and match.group(2) in (None, value['value'])]
+            if found or (match.group(2) is None and match.group(1) in category_keys):
+                return self.send(200, {'name': match.group(1), 'value': match.group(2)})
+            return self.send(404, {'message': 'Category not found'})
+        if path.startswith('/api/nutanix/v3/tasks/'):
+            task = tasks.get(path.split('/')[-1])
+            return self.send(200, dict(task, uuid=path.split('/')[-1])) if task else self.send(404, {})
+        if not v4_enabled[0]:
+            return self.send(404, {'message': 'Not found'})
+        if path == '/api/prism/v4.0/config/categories':
+            self.count('v4 categories')
+            found = [dict(value, extId=ext_id) for ext_id, value in categories.items()]
+            match = re.match(r"key eq '(.*)'", query.get('$filter', ''))
+            if match:
+                found = [category for category in found if category['key'] == match.group(1)]
+            limit = int(query.get('$limit', 50))
+            page = int(query.get('$page', 0))
+            return self.send(200, {'data': found[page * limit:(page + 1) * limit], 'metadata': {'totalAvailableResults': len(found)}})
+        if path.startswith('/api/vmm/v4.0/ahv/config/vms/'):
+            self.count('v4 VM GET')
+            vm = vms.get(path.split('/')[-1])
+            if not vm:
+                return self.send(404, {'message': 'VM not found'})
+            return self.send(200, {'data': {'extId': vm['metadata']['uuid'], 'name': vm['spec']['name']}}, {'ETag': 'etag-{0}'.format(vm['etag'])})
+        if path.startswith('/api/prism/v4.0/config/tasks/'):
+            task = tasks.get(path.split('/')[-1])
+            return self.send(200, {'data': task}) if task else self.send(404, {})
+        if path.startswith('/api/prism/v4.0/operations/batches/'):
+            results = batches.get(path.split('/')[-1])
+            return self.send(200, {'data': {'results': results}}) if results is not None else self.send(404, {})
+        self.send(404, {'message': 'Not found'})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self.body()
+        if path == '/api/nutanix/v3/vms/list':
+            self.count('v3 VM list')
+            entities = [v3_vm(vm) for vm in vms.values()]
+            offset = body.get('offset', 0)
+            length = min(body.get('length', 20), 500)
+            return self.send(200, {'metadata': {'total_matches': len(entities), 'offset': offset, 'length': length},
+                                   'entities': entities[offset:offset + length]})
+        if path == '/api/nutanix/v3/batch':
+            self.count('v3 batch')
+            responses = []
+            for request in body.get('api_request_list', []):
+                code, response = self.put_vm(request['path_and_params'], request['body'])
+                responses.append({'status': str(code), 'path_and_params': request['path_and_params'], 'api_response': response})
+            return self.send(200, {'api_response_list': responses})
+        match = re.match(r'/api/nutanix/v3/categories/(.+)/list$', path)
+        if match:
+            self.count('v3 category values')
+            found = [{'name': value['key'], 'value': value['value']} for value in categories.values() if value['key'] == match.group(1)]
+            return self.send(200, {'metadata': {'total_matches': len(found)}, 'entities': found[body.get('offset', 0):body.get('offset', 0) + body.get('length', 20)]})
+        if path == '/api/nutanix/v3/category/query':
+            self.count('v3 category query')
+            params = body['category_filter']['params']
+            found = [vm for vm in vms.values() if any(vm['metadata']['categories'].get(key) in values for key, values in params.items())]
+            offset = body.get('group_member_offset', 0)
+            references = [{'kind': 'vm', 'uuid': vm['metadata']['uuid'], 'name': vm['spec']['name']}
+                          for vm in found[offset:offset + body.get('group_member_count', 20)]]
+            return self.send(200, {'results': [{'kind': 'vm', 'filtered_entity_count': len(found), 'kind_reference_list': references}]})
+        if path == '/api/nutanix/v3/groups' and 'entity_ids' in body:
+            self.count('v3 groups')
+            results = []
+            for vm_uuid in body['entity_ids']:
+                vm = vms.get(vm_uuid)
+                if vm:
+                    results.append({'entity_id': vm_uuid, 'data': [
+                        {'name': 'vm_name', 'values': [{'values': [vm['spec']['name']]}]},
+                        {'name': 'categories', 'values': [{'values': ['{0}:{1}'.format(key, value) for key, value in vm['metadata']['categories'].items()]}]}]})
+            return self.send(200, {'filtered_entity_count': len(results), 'group_results': [{'entity_results': results}]})
+        if path == '/api/nutanix/v3/tasks/list':
+            task_uuids = [term.split('==')[-1] for term in body.get('filter', '').split(',')]
+            return self.send(200, {'entities': [dict(tasks[task_uuid], uuid=task_uuid) for task_uuid in task_uuids if task_uuid in tasks]})
+        if path == '/api/prism/v4.0/operations/$actions/batch' and v4_enabled[0]:
+            self.count('v4 batch')
+            return self.send(202, {'data': {'extId': self.run_batch(body)}})
+        self.send(404, {'message': 'Not found'})
+
+    def do_PUT(self):
+        path = urlparse(self.path).path
+        body = self.body()
+        if path.startswith('/api/nutanix/v3/vms/'):
+            self.count('v3 VM PUT')
+            return self.send(*self.put_vm(path, body))
+        match = re.match(r'/api/nutanix/v3/categories/([^/]+)(?:/([^/]+))?$', path)
+        if match:
+            self.count('v3 category PUT')
+            with lock:
+                category_keys.add(match.group(1))
+                if match.group(2):
+                    categories[str(uuid.uuid4())] = {'key': match.group(1), 'value': match.group(2)}
+            return self.send(200, body)
+        self.send(404, {'message': 'Not found'})
+
+    def put_vm(self, path, body):
+        '''
+        Function that applies a v3 VM PUT, returns the HTTP status and the response body
+        '''
+        with lock:
+            vm = vms.get(path.split('/')[-1])
+            if not vm:
+                return 404, {'message': 'VM not found'}
+            if body['metadata'].get('spec_version') != vm['metadata']['spec_version']:
+                return 409, {'message': 'spec_version mismatch'}
+            vm['metadata']['categories'] = body['metadata'].get('categories', {})
+            vm['metadata']['categories_mapping'] = body['metadata'].get('categories_mapping', {})
+            vm['metadata']['spec_version'] += 1
+            vm['etag'] += 1
+        return 202, {'status': {'execution_context': {'task_uuid': new_task()}}}
+
+    def run_batch(self, spec):
+        '''
+        Function that runs every associate-categories action in a batch and returns the batch task
+        '''
+        results = []
+        for action in spec.get('payload', []):
+            match = re.match(r'/api/vmm/v4.0/ahv/config/vms/([^/]+)/\$actions/associate-categories$', action['metadata'].get('path', ''))
+            with lock:
+                vm = vms.get(match.group(1)) if match else None
+                if vm is None:
+                    results.append({'statusCode': 404, 'response': {'message': 'VM not found'}})
+                    continue
+                if conflicts[0] > 0:
+                    #Something else changed the VM after its ETag was read
+                    conflicts[0] -= 1
+                    vm['etag'] += 1
+                if action['metadata'].get('headers', {}).get('If-Match') != 'etag-{0}'.format(vm['etag']):
+                    results.append({'statusCode': 412, 'response': {'message': 'ETag mismatch'}})
+                    continue
+                for reference in action['data'].get('categories', []):
+                    category = categories.get(reference['extId'])
+                    if category is None:
+                        results.append({'statusCode': 400, 'response': {'message': 'Unknown category'}})
+                        break
+                    vm['metadata']['categories'][category['key']] = category['value']
+                    vm['metadata']['categories_mapping'][category['key']] = [category['value']]
+                else:
+                    vm['metadata']['spec_version'] += 1
+                    vm['etag'] += 1
+                    results.append({'statusCode': 202, 'response': {'data': {'extId': new_task()}}})
+        batch_id = str(uuid.uuid4())
+        batches[batch_id] = results
+        return new_task(entitiesAffected=[{'extId': batch_id, 'rel': 'prism:operations:batch'}])
+
+
+parser = argparse.ArgumentParser(description="Local mock of the Prism calls FixVMCategories makes")
+parser.add_argument('--port', type=int, default=9440)
+parser.add_argument('--vms', type=int, default=200, help="number of VMs, every third one is missing AppType")
+parser.add_argument('--scope', type=int, default=100, help="percent of VMs with an Apps_* category")
+parser.add_argument('--no-v4', action='store_true', help="answer every v4 call with 404 so the v3 PUT is used")
+parser.add_argument('--etag-conflicts', type=int, default=0, help="number of VMs changed just before their batch runs")
+args = parser.parse_args()
+
+make_vms(args.vms, args.scope)
+v4_enabled[0] = not args.no_v4
+conflicts[0] = args.etag_conflicts
+server = ThreadingHTTPServer(('127.0.0.1', args.port), Handler)
+print ("Mock Prism on http://127.0.0.1:{0}  VMs: {1}  v4: {2}".format(args.port, args.vms, v4_enabled[0]))
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    pass
+server.server_close()
+fixed = sum(1 for vm in vms.values() if 'AppType' in vm['metadata']['categories'])
+print ("Calls: {0}".format(calls))
+print ("VMs with AppType: {0} of {1}".format(fixed, len(vms)))
+groups = {}
+for vm in vms.values():
+    if 'AppType' in vm['metadata']['categories']:
+        groups[vm['metadata']['categories']['AppType']] = groups.get(vm['metadata']['categories']['AppType'], 0) + 1
+print ("VMs by AppType: {0}".format(dict(sorted(groups.items()))))
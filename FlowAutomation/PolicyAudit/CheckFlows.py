@@ -0,0 +1,154 @@
+#!/user/bin/env python
+
+"""
+Checks if traffic between VMs is allowed by the Flow security policies, without clicking through Prism.
+
+The policies, address groups, service groups and VMs are read once and checked offline with
+FlowEvaluator from the PrismClient folder.  The script runs in one of three modes:
+    snapshot - reads everything from Prism and saves it to the snapshot file
+    check    - checks one flow
+    batch    - checks every flow in a CSV file and writes the results to a CSV file
+    python CheckFlows.py snapshot --prism pc.example.com --user admin
+    python CheckFlows.py check web01 db01 --port 1433
+    python CheckFlows.py batch --flows flows.csv --what-if NewWebPolicy.json
+check and batch use the snapshot file, or read from Prism when --prism is given.
+--what-if takes v3 policy JSON files, each flow is checked against the policies as they are and with
+those policies in place of the ones with the same UUID, and the flows that change are counted.
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+import argparse
+import csv
+import getpass
+import json
+import os
+import sys
+import time
+#The shared Prism API client is in the PrismClient folder at the top of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'PrismClient'))
+from PrismClient import PrismClient, PrismError
+from FlowModel import SecurityRule
+from FlowEvaluator import FlowEvaluator, save_snapshot, load_snapshot
+
+
+def read_policies(file_name):
+    '''
+    Function that reads v3 policies from a file with one policy, a list of policies or a list response
+    '''
+    with open(file_name) as infile:
+        data = json.load(infile)
+    if isinstance(data, dict):
+        data = data.get('entities', [data])
+    return [SecurityRule.from_v3(policy) for policy in data]
+
+
+def read_flows(file_name):
+    '''
+    Function that reads the Source, Destination, Protocol and Port columns of the flows file
+    '''
+    flows = []
+    with open(file_name, newline='') as infile:
+        for row in csv.DictReader(infile):
+            port = (row.get('Port') or '').strip()
+            flows.append((row['Source'].strip(), row['Destination'].strip(), (row.get('Protocol') or 'TCP').strip() or 'TCP',
+                          int(port) if port else None))
+    return flows
+
+
+parser = argparse.ArgumentParser(description="Check if traffic is allowed by the Flow security policies.")
+parser.add_argument('mode', choices=['snapshot', 'check', 'batch'])
+parser.add_argument('source', nargs='?', help="VM name, VM UUID or IP address the traffic comes from, for check")
+parser.add_argument('destination', nargs='?', help="VM name, VM UUID or IP address the traffic goes to, for check")
+parser.add_argument('--protocol', default='TCP', help="TCP, UDP or ICMP")
+parser.add_argument('--port', type=int, help="Port, or ICMP type.  Leave out to check any port")
+parser.add_argument('--prism', help="Prism IP or DNS name, read from Prism instead of the snapshot file")
+parser.add_argument('--user', help="User ID for Prism, the password is read from PRISM_PASSWORD or prompted")
+parser.add_argument('--snapshot', default='FlowSnapshot.json', help="Snapshot file written by the snapshot mode")
+parser.add_argument('--flows', help="CSV file with Source, Destination, Protocol and Port columns, for batch")
+parser.add_argument('--output', help="Results CSV file for batch, <flows>.results.csv by default")
+parser.add_argument('--what-if', nargs='+', default=[], help="v3 policy JSON files to check the flows against as well")
+args = parser.parse_args()
+
+if args.mode == 'snapshot' or args.prism:
+    if not args.prism or not args.user:
+        parser.error("--prism and --user are needed to read from Prism")
+    password = os.environ.get('PRISM_PASSWORD') or getpass.getpass('Password for Prism: ')
+    try:
+        with PrismClient(args.prism, args.user, password) as client:
+            started = time.monotonic()
+            evaluator = FlowEvaluator.from_prism(client)
+    except PrismError as ex:
+        print ("Could not read from Prism: {0}".format(ex))
+        if ex.response is not None:
+            print (ex.response.text)
+        exit(1)
+    print ("Read {0} policies and {1} VMs in {2:.1f} seconds".format(len(evaluator.rules), len(evaluator.endpoints), time.monotonic() - started))
+    if args.mode == 'snapshot':
+        save_snapshot(args.snapshot, evaluator)
+        print ("Snapshot file: {0}".format(args.snapshot))
+        exit(0)
+else:
+    if not os.path.exists(args.snapshot):
+        parser.error("Snapshot file {0} not found, run the snapshot mode or give --prism".format(args.snapshot))
+    started = time.monotonic()
+    evaluator = load_snapshot(args.snapshot)
+    print ("Loaded {0} policies and {1} VMs in {2:.1f} seconds".format(len(evaluator.rules), len(evaluator.endpoints), time.monotonic() - started))
+
+for name, problems in evaluator.problems.items():
+    for problem in problems:
+        print ("Policy {0}: {1}".format(name, problem))
+
+what_if = None
+if args.what_if:
+    changed_rules = [rule for file_name in args.what_if for rule in read_policies(file_name)]
+    what_if = evaluator.with_rules(changed_rules)
+    print ("What if: {0}".format(', '.join(rule.name or rule.uuid for rule in changed_rules)))
+
+if args.mode == 'check':
+    if not args.source or not args.destination:
+        parser.error("check needs a source and a destination")
+    for title, checker in (('Now', evaluator), ('What if', what_if)):
+        if checker is None:
+            continue
+        try:
+            decision = checker.check(args.source, args.destination, args.protocol, args.port)
+        except ValueError as ex:
+            print (ex)
+            exit(1)
+        print ("{0}: {1}  {2}".format(title, 'ALLOWED' if decision.allowed else 'DENIED', decision.reason))
+    exit(0)
+
+if not args.flows:
+    parser.error("batch needs --flows")
+flows = read_flows(args.flows)
+started = time.monotonic()
+decisions = evaluator.check_all(flows)
+seconds = time.monotonic() - started
+print ("Checked {0} flows in {1:.3f} seconds ({2:.1f} microseconds each)".format(len(flows), seconds, 1000000.0 * seconds / max(len(flows), 1)))
+what_if_decisions = what_if.check_all(flows) if what_if else [None] * len(flows)
+
+output = args.output or os.path.splitext(args.flows)[0] + '.results.csv'
+counts = {'allowed': 0, 'denied': 0, 'errors': 0, 'changed': 0}
+with open(output, 'w', newline='') as outfile:
+    writer = csv.writer(outfile)
+    header = ['Source', 'Destination', 'Protocol', 'Port', 'Allowed', 'Reason', 'Policies']
+    if what_if:
+        header += ['What If Allowed', 'What If Reason', 'Changed']
+    writer.writerow(header)
+    for flow, decision, after in zip(flows, decisions, what_if_decisions):
+        if decision.reason.startswith('ERROR'):
+            counts['errors'] += 1
+        else:
+            counts['allowed' if decision.allowed else 'denied'] += 1
+        row = list(flow) + [decision.allowed, decision.reason, '; '.join(decision.policies)]
+        if after is not None:
+            changed = after.allowed != decision.allowed
+            counts['changed'] += changed
+            row += [after.allowed, after.reason, changed]
+        writer.writerow(row)
+
+print ("Allowed: {0}  Denied: {1}  Errors: {2}".format(counts['allowed'], counts['denied'], counts['errors']))
+if what_if:
+    print ("Flows that change with the what if policies: {0}".format(counts['changed']))
+print ("Results file: {0}".format(output))
@@ -0,0 +1,76 @@
+#!/user/bin/env python
+
+"""
+Checks that PolicyConflicts finds overlapping targets in time that grows with the number of policies, not with its square.
+
+Policies are made up in memory the way targets usually are, AppType:<app> and Environment:Prod, so the
+Environment:Prod value is in almost every target.  A few policies target Environment:Prod alone or another
+category, so every kind of target finding is made.  The target checks are timed for each size and the time
+per policy is printed.  The script exits with 1 when the time per policy at the largest size is more than
+--limit times the time per policy at the smallest size, comparing every pair of policies quadruples it from
+750 to 3,000 policies.  No Prism is needed.
+    python ConflictScaleCheck.py
+    python ConflictScaleCheck.py --sizes 1500 3000 6000
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+import argparse
+import os
+import sys
+import time
+#The shared Prism API client is in the PrismClient folder at the top of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'PrismClient'))
+from FlowModel import SecurityRule
+from FlowEvaluator import FlowEvaluator
+from PolicyConflicts import PolicyConflicts
+
+
+def make_policy(number, params):
+    '''
+    Function that returns a SecurityRule with the target params and no allow list entries
+    '''
+    return SecurityRule.from_v3({'metadata': {'kind': 'network_security_rule', 'uuid': 'policy-{0:05d}'.format(number)},
+                                 'spec': {'name': 'Policy-{0:05d}'.format(number), 'resources': {'app_rule': {
+                                     'action': 'APPLY', 'inbound_allow_list': [], 'outbound_allow_list': [],
+                                     'target_group': {'peer_specification_type': 'FILTER', 'filter': {
+                                         'type': 'CATEGORIES_MATCH_ALL', 'kind_list': ['vm'], 'params': params}}}}}})
+
+
+def make_policies(count):
+    '''
+    Function that returns count policies, most of them on AppType and Environment:Prod
+    '''
+    rules = [make_policy(number, {'AppType': ['App{0:05d}'.format(number)], 'Environment': ['Prod']}) for number in range(count - 4)]
+    #A second policy on the first app, one on every Prod VM, and two on another category
+    rules.append(make_policy(count - 4, {'AppType': ['App00000'], 'Environment': ['Prod']}))
+    rules.append(make_policy(count - 3, {'Environment': ['Prod']}))
+    rules.append(make_policy(count - 2, {'Owner': ['Finance']}))
+    rules.append(make_policy(count - 1, {'Owner': ['Finance'], 'Environment': ['Dev']}))
+    return rules
+
+
+parser = argparse.ArgumentParser(description="Check how the PolicyConflicts target checks scale with the number of policies.")
+parser.add_argument('--sizes', type=int, nargs='+', default=[750, 1500, 3000], help="Numbers of policies to time")
+parser.add_argument('--repeat', type=int, default=3, help="Runs at each size, the fastest is used")
+parser.add_argument('--limit', type=float, default=2.0, help="Most the time per policy may grow from the smallest to the largest size")
+args = parser.parse_args()
+
+per_policy = []
+for count in args.sizes:
+    conflicts = PolicyConflicts(FlowEvaluator(make_policies(count), {}, {}, []))
+    best = None
+    for run in range(args.repeat):
+        started = time.perf_counter()
+        findings = conflicts.target_overlaps()
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    counts = {}
+    for finding in findings:
+        counts[finding.type] = counts.get(finding.type, 0) + 1
+    per_policy.append(best / count)
+    print ("Policies: {0:6d}  Seconds: {1:.4f}  Microseconds per policy: {2:.1f}  {3}".format(count, best, 1000000.0 * best / count, counts))
+
+growth = per_policy[-1] / per_policy[0]
+print ("Time per policy grew {0:.2f} times from {1} to {2} policies, the limit is {3}".format(growth, args.sizes[0], args.sizes[-1], args.limit))
+exit(1 if growth > args.limit else 0)
@@ -0,0 +1,81 @@
+#!/user/bin/env python
+
+"""
+Finds overlapping targets, duplicate and shadowed allow list entries and base rule collisions across all the Flow security policies.
+
+The policies are indexed once with PolicyConflicts from the PrismClient folder, so each policy and
+entry is only compared with the ones that share a category with it instead of every other one.
+The findings are written to a CSV file with Type, Policy, Other, Direction and Detail columns.
+    python FindConflicts.py
+    python FindConflicts.py --base-rules ..\\BasePolicyLoader\\BaseRules.json
+    python FindConflicts.py --prism pc.example.com --user admin --output Conflicts.csv
+The snapshot file written by CheckFlows.py is used, or Prism is read when --prism is given.
+--base-rules checks the category base rules of a BasePolicyLoader config file against the policy targets.
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+import argparse
+import csv
+import getpass
+import json
+import os
+import sys
+import time
+#The shared Prism API client is in the PrismClient folder at the top of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'PrismClient'))
+from PrismClient import PrismClient, PrismError
+from FlowEvaluator import FlowEvaluator, load_snapshot
+from PolicyConflicts import PolicyConflicts
+
+parser = argparse.ArgumentParser(description="Find overlapping and conflicting Flow security policies.")
+parser.add_argument('--prism', help="Prism IP or DNS name, read from Prism instead of the snapshot file")
+parser.add_argument('--user', help="User ID for Prism, the password is read from PRISM_PASSWORD or prompted")
+parser.add_argument('--snapshot', default='FlowSnapshot.json', help="Snapshot file written by CheckFlows.py snapshot")
+parser.add_argument('--base-rules', help="BasePolicyLoader config file to check against the policy targets")
+parser.add_argument('--output', default='PolicyConflicts.csv', help="Findings CSV file")
+args = parser.parse_args()
+
+if args.prism:
+    if not args.user:
+        parser.error("--user is needed to read from Prism")
+    password = os.environ.get('PRISM_PASSWORD') or getpass.getpass('Password for Prism: ')
+    try:
+        with PrismClient(args.prism, args.user, password) as client:
+            started = time.monotonic()
+            evaluator = FlowEvaluator.from_prism(client)
+    except PrismError as ex:
+        print ("Could not read from Prism: {0}".format(ex))
+        if ex.response is not None:
+            print (ex.response.text)
+        exit(1)
+    print ("Read {0} policies and {1} VMs in {2:.1f} seconds".format(len(evaluator.rules), len(evaluator.endpoints), time.monotonic() - started))
+else:
+    if not os.path.exists(args.snapshot):
+        parser.error("Snapshot file {0} not found, run CheckFlows.py snapshot or give --prism".format(args.snapshot))
+    started = time.monotonic()
+    evaluator = load_snapshot(args.snapshot)
+    print ("Loaded {0} policies and {1} VMs in {2:.1f} seconds".format(len(evaluator.rules), len(evaluator.endpoints), time.monotonic() - started))
+
+base_data = None
+if args.base_rules:
+    with open(args.base_rules) as infile:
+        base_data = json.load(infile)
+
+started = time.monotonic()
+findings = PolicyConflicts(evaluator, base_data).find()
+print ("Checked {0} policies in {1:.2f} seconds".format(len(evaluator.rules), time.monotonic() - started))
+
+counts = {}
+with open(args.output, 'w', newline='') as outfile:
+    writer = csv.writer(outfile)
+    writer.writerow(['Type', 'Policy', 'Other', 'Direction', 'Detail'])
+    for finding in findings:
+        counts[finding.type] = counts.get(finding.type, 0) + 1
+        writer.writerow(finding)
+
+for finding_type, count in counts.items():
+    print ("{0}: {1}".format(finding_type, count))
+if not counts:
+    print ("No conflicts found")
+print ("Findings file: {0}".format(args.output))
@@ -3,19 +3,17 @@
 # The UUID can be used to trigger services such as ScaleOut 
 # Example code for calling a function provided at the end
 
-import requests
 import json
 import getpass
-from requests.auth import HTTPBasicAuth
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+import os
+import sys
+#The shared Prism API client is in the PrismClient folder at the top of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'PrismClient'))
+from PrismClient import PrismClient
  
-def make_request(ip_address,user,passwd,call_type,data_list):
-    header = {"content-type": "application/json"}
-    auth = HTTPBasicAuth(user, passwd)
-    url_list = "https://{0}:9440/api/nutanix/v3/{1}".format(ip_address,call_type)
+def make_request(client,call_type,data_list):
     try:
-        res_list = requests.post(url=url_list, data=json.dumps(data_list), auth=auth, headers=header, verify=False)
+        res_list = client.post(call_type, data_list)
         return res_list
     except Exception as ex:
         print ("There was an issue requesting the VM list.")
@@ -24,9 +22,11 @@ def make_request(ip_address,user,passwd,call_type,data_list):
 ip_address = input ("Prism IP or DNS name: ")
 user = input ("User ID for Prism: ")
 password = getpass.getpass('Password for Prism: ')
+#One pooled connection is used for every call this script makes
+client = PrismClient(ip_address,user,password)
 
 payload = {'kind':'app'}
-app_list = make_request(ip_address,user,password,"apps/list",payload)
+app_list = make_request(client,"apps/list",payload)
 
 if app_list.ok:
     for app in json.loads(app_list.content)['entities']:
@@ -36,7 +36,7 @@ if app_list.ok:
 
 # This section of code uses the UUID from an application listed above to call the ScaleOut function
 #payload = {'name':'ScaleOut'}
-#app_call = make_request(ip_address,user,password,"apps/f98fc27c-cc89-4953-834d-e6fc339d203f/actions/run",payload) 
+#app_call = make_request(client,"apps/f98fc27c-cc89-4953-834d-e6fc339d203f/actions/run",payload) 
 #print (json.dumps(json.loads(app_call.content), indent=4))
 #
 # Sample Output from the ScaleOut call above
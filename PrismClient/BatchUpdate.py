@@ -0,0 +1,273 @@
+#!/user/bin/env python
+
+"""
+Sends many Prism updates as v3 /batch requests instead of one PUT per entity.
+
+BulkUpdate makes one HTTP call for every VM, a fleet wide category fix is thousands of PUTs.
+BatchUpdate groups the updates into POST /batch calls of batch_size requests each, so the same
+fix is a few dozen calls.  Each item in the batch response is matched back to its update by
+path, the task it started is handed to the tracker and the result is kept under the VM name.
+Items the batch did not accept are sent again on their own with a normal PUT.
+
+Usage:
+    updater = BatchUpdate(client, tracker, batch_size=20)
+    for vm in ...:
+        updater.submit('vms/' + vm_uuid, vm, name=vm_name)
+    updater.close()
+    updater.write_csv('results.csv')
+
+submit() only sends when a batch is full, wait() and close() send the last part batch.
+Up to max_batches batches are running at the same time, a batch holds its slot until all of its
+tasks have finished, so the number of tasks in flight stays at about batch_size x max_batches.
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+from dataclasses import dataclass
+import csv
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from BulkUpdate import UpdateResult
+
+
+#path_and_params in a batch request is the full API path, not the path after v3/
+API_PATH = '/api/nutanix/v3/'
+
+
+@dataclass
+class BatchResult(UpdateResult):
+    '''
+    Outcome of one update sent in a batch, retried is set when it had to be sent again on its own
+    '''
+    batch: int = 0
+    retried: bool = False
+
+
+def item_status(item):
+    '''
+    Function that returns the HTTP status of one batch response item as a number, such as 202 from "202 Accepted"
+    '''
+    try:
+        return int(str(item.get('status', '')).split()[0])
+    except (IndexError, ValueError):
+        return 0
+
+
+def item_task_uuid(item):
+    '''
+    Function that returns the task UUID from one batch response item, or an empty string
+    '''
+    response = item.get('api_response') or {}
+    if isinstance(response, str):
+        try:
+            response = json.loads(response)
+        except ValueError:
+            return ''
+    return response.get('status', {}).get('execution_context', {}).get('task_uuid', '')
+
+
+class BatchUpdate:
+    '''
+    Groups PUT calls into v3 /batch requests and collects a result for every item
+    '''
+    def __init__(self, client, tracker, batch_size=20, max_batches=2, on_result=None, operation='PUT'):
+        self.client = client
+        self.tracker = tracker
+        self.batch_size = batch_size
+        self.operation = operation
+        self.on_result = on_result
+        self.results = []
+        #(result, data_list) waiting for the batch to fill
+        self.pending = []
+        self.batch_count = 0
+        self.slots = threading.BoundedSemaphore(max_batches)
+        self.lock = threading.Lock()
+        self.outstanding = 0
+        self.all_done = threading.Event()
+        self.all_done.set()
+        self.pool = ThreadPoolExecutor(max_workers=max_batches)
+
+    def submit(self, path, data_list, name=None):
+        '''
+        Function that adds one update to the current batch, the batch is sent when it is full
+        '''
+        result = BatchResult(name=name or path, path=path)
+        with self.lock:
+            self.results.append(result)
+            self.outstanding += 1
+            self.all_done.clear()
+        self.pending.append((result, data_list))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return result
+
+    def flush(self):
+        '''
+        Function that sends the current batch, waits for a free slot when max_batches are running
+        '''
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        self.batch_count += 1
+        self.slots.acquire()
+        self.pool.submit(self._send, self.batch_count, batch, time.monotonic())
+
+    def wait(self):
+        '''
+        Function that sends the last batch and blocks until every update has finished, returns the results table
+        '''
+        self.flush()
+        self.all_done.wait()
+        return list(self.results)
+
+    def summary(self):
+        '''
+        Function that returns a count of updates by status
+        '''
+        counts = {}
+        for result in self.results:
+            counts[result.status] = counts.get(result.status, 0) + 1
+        return counts
+
+    def retried(self):
+        '''
+        Function that returns the updates that were sent again on their own
+        '''
+        return [result for result in self.results if result.retried]
+
+    def failures(self):
+        '''
+        Function that returns the updates that did not succeed
+        '''
+        return [result for result in self.results if result.status != 'SUCCEEDED']
+
+    def write_csv(self, file_name):
+        '''
+        Function that writes the results table to a CSV file
+        '''
+        with open(file_name, 'w', newline='') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(['Name', 'Status', 'Message', 'Task UUID', 'Batch', 'Retried', 'PUT Seconds', 'Task Seconds', 'Total Seconds'])
+            for result in self.results:
+                writer.writerow([result.name, result.status, result.message, result.task_uuid, result.batch, result.retried,
+                                 round(result.put_seconds, 2), round(result.task_seconds, 2), round(result.total_seconds, 2)])
+
+    def close(self):
+        '''
+        Function that waits for the running updates and stops the worker threads
+        '''
+        self.wait()
+        self.pool.shutdown()
+
+    def _send(self, number, batch, started):
+        '''
+        Function run on a worker thread, sends one batch and matches each response item to its update
+        '''
+        #Items of this batch still running, the slot is freed when it reaches 0
+        remaining = [len(batch)]
+        payload = {
+            'action_on_failure': 'CONTINUE',
+            'execution_order': 'NON_SEQUENTIAL',
+            'api_version': '3.0',
+            'api_request_list': [{'operation': self.operation, 'path_and_params': API_PATH + result.path.strip('/'), 'body': data_list}
+                                 for result, data_list in batch],
+        }
+        #When the batch call fails every item is sent on its own
+        responses = []
+        try:
+            resp = self.client.post('batch', payload)
+            if resp.ok:
+                responses = json.loads(resp.content).get('api_response_list', [])
+        except Exception:
+            pass
+        put_seconds = time.monotonic() - started
+
+        #Responses are matched by path, the position is only used when the path is not returned
+        by_path = {}
+        for item in responses:
+            by_path.setdefault(item.get('path_and_params', '').rstrip('/'), []).append(item)
+        for index, (result, data_list) in enumerate(batch):
+            result.batch = number
+            result.put_seconds = put_seconds
+            key = API_PATH + result.path.strip('/')
+            if by_path.get(key):
+                item = by_path[key].pop(0)
+            elif index < len(responses) and not responses[index].get('path_and_params'):
+                item = responses[index]
+            else:
+                item = None
+
+            if item is not None and 200 <= item_status(item) < 300:
+                task_uuid = item_task_uuid(item)
+                if task_uuid:
+                    self._track(result, task_uuid, started, remaining)
+                else:
+                    result.status = 'SUCCEEDED'
+                    self._finish(result, started, remaining)
+                continue
+            #Not accepted in the batch, send it again on its own
+            result.retried = True
+            self._put(result, data_list, started, remaining)
+
+    def _put(self, result, data_list, started, remaining):
+        '''
+        Function that sends one update with a normal PUT after the batch did not take it
+        '''
+        try:
+            put_started = time.monotonic()
+            resp = self.client.put(result.path, data_list)
+            result.put_seconds += time.monotonic() - put_started
+            if not resp.ok:
+                result.status = 'PUT_FAILED'
+                result.message = resp.text
+                self._finish(result, started, remaining)
+                return
+            task_uuid = json.loads(resp.content)['status']['execution_context']['task_uuid']
+        except Exception as ex:
+            result.status = 'ERROR'
+            result.message = str(ex)
+            self._finish(result, started, remaining)
+            return
+        self._track(result, task_uuid, started, remaining)
+
+    def _track(self, result, task_uuid, started, remaining):
+        '''
+        Function that hands the task of an update to the tracker
+        '''
+        result.task_uuid = task_uuid
+        result.status = 'RUNNING'
+        task_started = time.monotonic()
+        future = self.tracker.add(task_uuid)
+        future.add_done_callback(lambda done: self._task_done(result, done.result(), started, task_started, remaining))
+
+    def _task_done(self, result, task, started, task_started, remaining):
+        '''
+        Function called when the update task finishes
+        '''
+        result.task_seconds = time.monotonic() - task_started
+        result.status = task.get('status', 'UNKNOWN')
+        if 'error_detail' in task:
+            result.message = task['error_detail']
+        self._finish(result, started, remaining)
+
+    def _finish(self, result, started, remaining):
+        '''
+        Function that records the end of an update, frees the batch slot after its last update
+        '''
+        result.total_seconds = time.monotonic() - started
+        if self.on_result:
+            try:
+                self.on_result(result)
+            except Exception:
+                #A reporting error must not keep the slot from being freed
+                pass
+        with self.lock:
+            self.outstanding -= 1
+            if self.outstanding == 0:
+                self.all_done.set()
+            remaining[0] -= 1
+            batch_done = remaining[0] == 0
+        if batch_done:
+            self.slots.release()
@@ -0,0 +1,266 @@
+#!/user/bin/env python
+
+"""
+Runs many Prism updates at once while keeping a limit on how many are in flight.
+
+The scripts used to PUT one VM, wait for its task and only then move to the next VM.
+BulkUpdate keeps up to max_in_flight updates running.  A new update is only sent once
+an earlier task has finished, so Prism is never flooded with more than the limit.
+Every update ends up in the results table with its status, error and timings.
+
+Usage:
+    updater = BulkUpdate(client, tracker, max_in_flight=10)
+    for vm in ...:
+        updater.submit('vms/' + vm_uuid, vm, name=vm_name)
+    results = updater.wait()
+    updater.write_csv('results.csv')
+
+submit() returns straight away unless max_in_flight updates are already running,
+then it waits for one of them to finish.
+
+LanedUpdate splits the updates into lanes, such as one per cluster, each with its own limit.
+A lane that is full only holds up its own updates, the other lanes keep going.
+    lanes = LanedUpdate(client, tracker, max_in_flight=10, lane_limits={'cable': 5})
+    lanes.submit(cluster_name, 'vms/' + vm_uuid, vm, name=vm_name)
+    lanes.close()
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+from dataclasses import dataclass
+import csv
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+@dataclass
+class UpdateResult:
+    '''
+    Outcome of one update, status is the task status or PUT_FAILED / ERROR when the PUT did not go through
+    '''
+    name: str
+    path: str
+    status: str = 'PENDING'
+    message: str = ''
+    task_uuid: str = ''
+    put_seconds: float = 0.0
+    task_seconds: float = 0.0
+    total_seconds: float = 0.0
+
+
+class BulkUpdate:
+    '''
+    Sends PUT calls with a limit on the number of updates in flight and collects the results
+    '''
+    def __init__(self, client, tracker, max_in_flight=10, on_result=None):
+        self.client = client
+        self.tracker = tracker
+        self.max_in_flight = max_in_flight
+        self.on_result = on_result
+        self.results = []
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.lock = threading.Lock()
+        self.outstanding = 0
+        self.all_done = threading.Event()
+        self.all_done.set()
+        self.pool = ThreadPoolExecutor(max_workers=max_in_flight)
+
+    def submit(self, path, data_list, name=None):
+        '''
+        Function that queues one PUT, waits for a free slot when max_in_flight updates are running
+        '''
+        result = UpdateResult(name=name or path, path=path)
+        self.slots.acquire()
+        with self.lock:
+            self.results.append(result)
+            self.outstanding += 1
+            self.all_done.clear()
+        self.pool.submit(self._put, result, data_list, time.monotonic())
+        return result
+
+    def wait(self):
+        '''
+        Function that blocks until every update has finished, returns the results table
+        '''
+        self.all_done.wait()
+        return list(self.results)
+
+    def summary(self):
+        '''
+        Function that returns a count of updates by status
+        '''
+        counts = {}
+        for result in self.results:
+            counts[result.status] = counts.get(result.status, 0) + 1
+        return counts
+
+    def failures(self):
+        '''
+        Function that returns the updates that did not succeed
+        '''
+        return [result for result in self.results if result.status != 'SUCCEEDED']
+
+    def write_csv(self, file_name):
+        '''
+        Function that writes the results table to a CSV file
+        '''
+        with open(file_name, 'w', newline='') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(['Name', 'Status', 'Message', 'Task UUID', 'PUT Seconds', 'Task Seconds', 'Total Seconds'])
+            for result in self.results:
+                writer.writerow([result.name, result.status, result.message, result.task_uuid,
+                                 round(result.put_seconds, 2), round(result.task_seconds, 2), round(result.total_seconds, 2)])
+
+    def close(self):
+        '''
+        Function that waits for the running updates and stops the worker threads
+        '''
+        self.wait()
+        self.pool.shutdown()
+
+    def _put(self, result, data_list, started):
+        '''
+        Function run on a worker thread, sends the PUT and hands the task to the tracker
+        '''
+        try:
+            resp = self.client.put(result.path, data_list)
+            result.put_seconds = time.monotonic() - started
+            if not resp.ok:
+                result.status = 'PUT_FAILED'
+                result.message = resp.text
+                self._finish(result, started)
+                return
+            result.task_uuid = json.loads(resp.content)['status']['execution_context']['task_uuid']
+            result.status = 'RUNNING'
+        except Exception as ex:
+            result.status = 'ERROR'
+            result.message = str(ex)
+            self._finish(result, started)
+            return
+
+        task_started = time.monotonic()
+        future = self.tracker.add(result.task_uuid)
+        future.add_done_callback(lambda done: self._task_done(result, done.result(), started, task_started))
+
+    def _task_done(self, result, task, started, task_started):
+        '''
+        Function called when the update task finishes
+        '''
+        result.task_seconds = time.monotonic() - task_started
+        result.status = task.get('status', 'UNKNOWN')
+        if 'error_detail' in task:
+            result.message = task['error_detail']
+        self._finish(result, started)
+
+    def _finish(self, result, started):
+        '''
+        Function that records the end of an update and frees its slot
+        '''
+        result.total_seconds = time.monotonic() - started
+        if self.on_result:
+            try:
+                self.on_result(result)
+            except Exception:
+                #A reporting error must not keep the slot from being freed
+                pass
+        with self.lock:
+            self.outstanding -= 1
+            if self.outstanding == 0:
+                self.all_done.set()
+        self.slots.release()
+
+
+class LanedUpdate:
+    '''
+    A BulkUpdate for each lane, fed from its own queue so a busy lane does not hold up the others
+    '''
+    def __init__(self, client, tracker, max_in_flight=10, on_result=None, lane_limits=None):
+        self.client = client
+        self.tracker = tracker
+        self.max_in_flight = max_in_flight
+        self.on_result = on_result
+        self.lane_limits = lane_limits or {}
+        #lane -> [BulkUpdate, queue, feeder thread]
+        self.lanes = {}
+        self.lock = threading.Lock()
+
+    def submit(self, lane, path, data_list, name=None):
+        '''
+        Function that queues one PUT in a lane and returns straight away
+        '''
+        with self.lock:
+            if lane not in self.lanes:
+                updater = BulkUpdate(self.client, self.tracker, self.lane_limits.get(lane, self.max_in_flight), self.on_result)
+                work = queue.Queue()
+                feeder = threading.Thread(target=self._feed, args=(updater, work), name="Lane-{0}".format(lane), daemon=True)
+                self.lanes[lane] = [updater, work, feeder]
+                feeder.start()
+            self.lanes[lane][1].put((path, data_list, name))
+
+    def wait(self):
+        '''
+        Function that blocks until every lane has sent and finished its updates, returns lane -> results
+        '''
+        for updater, work, feeder in list(self.lanes.values()):
+            work.join()
+        return {lane: entry[0].wait() for lane, entry in self.lanes.items()}
+
+    def summary(self):
+        '''
+        Function that returns a count of updates by status across all the lanes
+        '''
+        counts = {}
+        for updater, work, feeder in self.lanes.values():
+            for status, count in updater.summary().items():
+                counts[status] = counts.get(status, 0) + count
+        return counts
+
+    def lane_summary(self):
+        '''
+        Function that returns the count of updates by status for each lane
+        '''
+        return {lane: entry[0].summary() for lane, entry in self.lanes.items()}
+
+    def failures(self):
+        '''
+        Function that returns the updates that did not succeed in any lane
+        '''
+        return [result for entry in self.lanes.values() for result in entry[0].failures()]
+
+    def write_csv(self, file_name):
+        '''
+        Function that writes the results of every lane to one CSV file
+        '''
+        with open(file_name, 'w', newline='') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(['Lane', 'Name', 'Status', 'Message', 'Task UUID', 'PUT Seconds', 'Task Seconds', 'Total Seconds'])
+            for lane, entry in self.lanes.items():
+                for result in entry[0].results:
+                    writer.writerow([lane, result.name, result.status, result.message, result.task_uuid,
+                                     round(result.put_seconds, 2), round(result.task_seconds, 2), round(result.total_seconds, 2)])
+
+    def close(self):
+        '''
+        Function that waits for every lane and stops their worker threads
+        '''
+        self.wait()
+        for updater, work, feeder in self.lanes.values():
+            work.put(None)
+            updater.close()
+
+    def _feed(self, updater, work):
+        '''
+        Function run on each lane thread, hands the queued updates to the lane's BulkUpdate
+        '''
+        while True:
+            item = work.get()
+            if item is None:
+                work.task_done()
+                return
+            try:
+                updater.submit(*item)
+            finally:
+                work.task_done()
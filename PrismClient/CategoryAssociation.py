@@ -0,0 +1,306 @@
+#!/user/bin/env python
+
+"""
+Adds categories to many VMs with the Prism v4 associate-categories action instead of a full v3 PUT.
+
+To add one category with v3 the whole VM spec, every disk and NIC, is read and sent back with the
+spec_version it was read at.  A large spec is slow to send and any change to the VM in between
+fails the PUT with a spec_version conflict.
+The v4 action only sends the category IDs, and the VM's ETag (If-Match) makes sure nothing changed
+since it was read.  The actions are grouped into v4 batch requests of batch_size VMs each.
+A VM whose ETag changed before the batch ran (412) is read again and sent in one more round.
+
+When the v4 APIs are not available the VM is read and updated with the v3 PUT the same way
+FixVMCategories always did, those updates are marked as retried.
+
+Usage:
+    updater = CategoryAssociation(client, tracker, batch_size=20)
+    if updater.available():
+        updater.submit(vm_uuid, {'AppType': 'Apps_A-C'}, name=vm_name)
+        ...
+        updater.close()
+        updater.write_csv('results.csv')
+
+The results, summary() and write_csv() are the same as BatchUpdate.
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from BatchUpdate import BatchUpdate
+from PrismClient import PrismError
+
+
+V4_VMS = 'vmm/v4.0/ahv/config/vms/'
+V4_CATEGORIES = 'prism/v4.0/config/categories'
+V4_BATCH = 'prism/v4.0/operations/$actions/batch'
+V4_BATCHES = 'prism/v4.0/operations/batches/'
+V4_TASKS = 'prism/v4.0/config/tasks/'
+#v4 task states that mean the task is done
+V4_FINISHED_STATES = ('SUCCEEDED', 'FAILED', 'CANCELED')
+#A batch call answered with one of these means the v4 batch API is not on this Prism
+V4_MISSING = (404, 405, 501)
+
+
+class CategoryAssociation(BatchUpdate):
+    '''
+    Sends v4 associate-categories actions in batches, with ETags, and falls back to the v3 PUT
+    '''
+    def __init__(self, client, tracker, batch_size=20, max_batches=2, on_result=None, workers=8, task_timeout=3600):
+        super().__init__(client, tracker, batch_size, max_batches, on_result)
+        self.task_timeout = task_timeout
+        #Reads the ETags of a batch, one small GET per VM
+        self.etag_pool = ThreadPoolExecutor(max_workers=workers)
+        #(key, value) -> category extId, loaded one key at a time
+        self.categories = {}
+        self.loaded_keys = set()
+        self.category_lock = threading.Lock()
+        self.v4 = None
+
+    def available(self):
+        '''
+        Function that checks once whether the v4 category API answers on this Prism
+        '''
+        if self.v4 is None:
+            try:
+                self.v4 = self.client.api_get(V4_CATEGORIES, params={'$limit': 1}).ok
+            except Exception:
+                self.v4 = False
+        return self.v4
+
+    def submit(self, vm_uuid, categories, name=None):
+        '''
+        Function that adds the categories, key -> value, to a VM in the current batch
+        '''
+        return super().submit('vms/' + vm_uuid, categories, name)
+
+    def category_id(self, key, value):
+        '''
+        Function that returns the v4 extId of a category value, None when it does not exist
+        Raises PrismError, or the connection error, when the values of the key could not be read.
+        '''
+        with self.category_lock:
+            if key not in self.loaded_keys:
+                self._load_categories(key)
+            return self.categories.get((key, value))
+
+    def close(self):
+        '''
+        Function that waits for the running updates and stops the worker threads
+        '''
+        super().close()
+        self.etag_pool.shutdown()
+
+    def _load_categories(self, key):
+        '''
+        Function that reads every value of a category key
+        Raises PrismError when a page can not be read, the key is then read again the next time it is needed.
+        '''
+        page = 0
+        found = {}
+        while True:
+            resp = self.client.api_get(V4_CATEGORIES, params={'$filter': "key eq '{0}'".format(key), '$page': page, '$limit': 100})
+            if not resp.ok:
+                raise PrismError("Could not read the values of category {0}".format(key), resp)
+            try:
+                body = json.loads(resp.content)
+                data = body.get('data') or []
+                for category in data:
+                    found[(category['key'], category['value'])] = category['extId']
+            except (ValueError, KeyError, TypeError, AttributeError) as ex:
+                raise PrismError("Could not read the values of category {0}: {1}".format(key, ex), resp)
+            page += 1
+            if not data or page * 100 >= body.get('metadata', {}).get('totalAvailableResults', 0):
+                break
+        #Only a key read to the end is kept, so a failed read is not taken as values that do not exist
+        self.categories.update(found)
+        self.loaded_keys.add(key)
+
+    def _send(self, number, batch, started):
+        '''
+        Function run on a worker thread, sends one batch of associate actions and records each VM
+        '''
+        remaining = [len(batch)]
+        items = []
+        for result, categories in batch:
+            result.batch = number
+            if not self.available():
+                self._v3_update(result, categories, started, remaining)
+                continue
+            category_ids = []
+            for key, value in categories.items():
+                try:
+                    category_id = self.category_id(key, value)
+                except Exception as ex:
+                    #The VM is still finished, or close() would wait on it for good
+                    result.status = 'FAILED'
+                    result.message = str(ex)
+                    break
+                if category_id is None:
+                    result.status = 'FAILED'
+                    result.message = "Category {0}:{1} was not found".format(key, value)
+                    break
+                category_ids.append(category_id)
+            if result.status == 'FAILED':
+                self._finish(result, started, remaining)
+            else:
+                items.append((result, categories, category_ids))
+
+        #A VM changed between reading the ETag and the batch running gets one more round
+        for attempt in range(2):
+            if not items:
+                break
+            retry = []
+            for (result, categories, category_ids), status, message in zip(items, *self._send_round(number, items, started)):
+                if status == 412 and attempt == 0:
+                    result.retried = True
+                    retry.append((result, categories, category_ids))
+                elif status in V4_MISSING and not self.v4:
+                    self._v3_update(result, categories, started, remaining)
+                elif 200 <= status < 300:
+                    result.status = 'SUCCEEDED'
+                    self._finish(result, started, remaining)
+                else:
+                    result.status = 'FAILED'
+                    result.message = message
+                    self._finish(result, started, remaining)
+            items = retry
+
+    def _send_round(self, number, items, started):
+        '''
+        Function that reads the ETags, sends one v4 batch and waits for it
+        Returns the HTTP status and message for each item, in order
+        '''
+        vm_uuids = [result.path.split('/')[-1] for result, categories, category_ids in items]
+        etags = list(self.etag_pool.map(self._etag, vm_uuids))
+        statuses = [0] * len(items)
+        messages = [''] * len(items)
+        payload = []
+        sent = []
+        for index, ((result, categories, category_ids), vm_uuid, (etag, message)) in enumerate(zip(items, vm_uuids, etags)):
+            if not etag:
+                statuses[index] = 0
+                messages[index] = message
+                continue
+            sent.append(index)
+            payload.append({
+                'data': {'categories': [{'extId': category_id} for category_id in category_ids]},
+                'metadata': {
+                    'httpMethod': 'POST',
+                    'path': '/api/' + V4_VMS + vm_uuid + '/$actions/associate-categories',
+                    'headers': {'If-Match': etag},
+                },
+            })
+        if not payload:
+            return statuses, messages
+
+        spec = {
+            'name': 'Associate categories batch {0}'.format(number),
+            'actionType': 'ACTION',
+            'executionMode': 'ASYNC',
+            'stopOnError': False,
+            'chunkSize': len(payload),
+            'payload': payload,
+        }
+        try:
+            resp = self.client.api_post(V4_BATCH, spec)
+            put_seconds = time.monotonic() - started
+            for result, categories, category_ids in items:
+                result.put_seconds = put_seconds
+            if resp.status_code in V4_MISSING:
+                self.v4 = False
+            if not resp.ok:
+                for index in sent:
+                    statuses[index] = resp.status_code
+                    messages[index] = resp.text
+                return statuses, messages
+            task_id = json.loads(resp.content)['data']['extId']
+            task_started = time.monotonic()
+            task = self._wait_task(task_id)
+            batch_results = self._batch_results(task_id, task)
+        except Exception as ex:
+            for index in sent:
+                messages[index] = str(ex)
+            return statuses, messages
+
+        task_seconds = time.monotonic() - task_started
+        for position, index in enumerate(sent):
+            items[index][0].task_uuid = task_id
+            items[index][0].task_seconds = task_seconds
+            if position < len(batch_results):
+                item = batch_results[position]
+                statuses[index] = int(item.get('statusCode', 0))
+                messages[index] = json.dumps(item.get('response', ''))
+            else:
+                messages[index] = "Batch task {0}: {1}".format(task.get('status', 'UNKNOWN'), json.dumps(task.get('errorMessages', '')))
+        return statuses, messages
+
+    def _etag(self, vm_uuid):
+        '''
+        Function that returns the ETag of a VM and an error message when it could not be read
+        '''
+        try:
+            resp = self.client.api_get(V4_VMS + vm_uuid)
+        except Exception as ex:
+            return '', str(ex)
+        if not resp.ok:
+            return '', resp.text
+        return resp.headers.get('ETag', ''), ''
+
+    def _wait_task(self, task_id):
+        '''
+        Function that polls a v4 task until it finishes, returns the task data
+        '''
+        wait = 0.5
+        deadline = time.monotonic() + self.task_timeout
+        while True:
+            resp = self.client.api_get(V4_TASKS + task_id)
+            if resp.ok:
+                task = json.loads(resp.content).get('data', {})
+                if task.get('status') in V4_FINISHED_STATES:
+                    return task
+            if time.monotonic() > deadline:
+                return {'status': 'TIMED_OUT'}
+            time.sleep(wait)
+            wait = min(wait * 1.5, 5)
+
+    def _batch_results(self, task_id, task):
+        '''
+        Function that returns the result of each action in a finished batch, in the order they were sent
+        '''
+        batch_id = task_id
+        for entity in task.get('entitiesAffected', []):
+            if entity.get('rel', '').endswith('batch'):
+                batch_id = entity['extId']
+        resp = self.client.api_get(V4_BATCHES + batch_id)
+        if not resp.ok:
+            return []
+        return json.loads(resp.content).get('data', {}).get('results', [])
+
+    def _v3_update(self, result, categories, started, remaining):
+        '''
+        Function that adds the categories with a full v3 PUT, used when the v4 APIs are not available
+        '''
+        result.retried = True
+        try:
+            resp = self.client.get(result.path)
+            if not resp.ok:
+                result.status = 'PUT_FAILED'
+                result.message = resp.text
+                self._finish(result, started, remaining)
+                return
+            vm = json.loads(resp.content)
+        except Exception as ex:
+            result.status = 'ERROR'
+            result.message = str(ex)
+            self._finish(result, started, remaining)
+            return
+        #remove the current VM status section, only configuration items are needed
+        del vm['status']
+        for key, value in categories.items():
+            vm['metadata'].setdefault('categories', {})[key] = value
+            vm['metadata'].setdefault('categories_mapping', {})[key] = [value]
+        self._put(result, vm, started, remaining)
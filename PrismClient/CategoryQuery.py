@@ -0,0 +1,167 @@
+#!/user/bin/env python
+
+"""
+Finds the VMs that have one of a set of category keys without reading every VM.
+
+FixVMCategories read the full spec and status of every VM and then skipped the ones without an
+Apps_* category, on most systems that is well over 90% of the data read.
+CategoryQuery asks Prism for only the VMs in scope:
+    1. The values of each category key are read from categories/{key}/list.
+    2. The v3 category query (category/query) returns the UUID and name of every VM that has any of those values.
+    3. The groups API returns only the name and categories of those VMs, in chunks of 500.
+The VMs come back in the v3 shape with only metadata.uuid, metadata.categories and spec.name,
+the full VM is read with a GET when an update needs it.  A VM the groups API does not return the
+categories for is read with a GET straight away.
+
+Usage:
+    query = CategoryQuery(client)
+    for vm in query.vms(['Apps_A-C', 'Apps_D-K']):
+        print (vm['spec']['name'], vm['metadata']['categories'])
+    print (query.in_scope)
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from PrismClient import PrismError
+
+
+#Groups attributes with the VM name and the categories as key:value strings
+NAME_ATTRIBUTE = 'vm_name'
+CATEGORIES_ATTRIBUTE = 'categories'
+
+
+def parse_categories(values):
+    '''
+    Function that turns groups API category values such as "AppType:Apps_A-C" into key -> value
+    '''
+    categories = {}
+    for value in values:
+        key, separator, category_value = value.partition(':')
+        if separator:
+            categories[key] = category_value
+    return categories
+
+
+class CategoryQuery:
+    '''
+    Reads the names and categories of only the VMs that have one of the category keys
+    '''
+    def __init__(self, client, page_size=500, workers=8):
+        self.client = client
+        self.page_size = page_size
+        self.workers = workers
+        #Number of VMs the category query found, set by vms()
+        self.in_scope = 0
+        #Number of VMs read with a full GET because the groups API did not have their categories
+        self.full_reads = 0
+
+    def values(self, key):
+        '''
+        Function that returns every value of a category key, an unknown key has no values
+        '''
+        values = []
+        offset = 0
+        while True:
+            resp = self.client.post('categories/{0}/list'.format(key), {'kind': 'category', 'length': self.page_size, 'offset': offset})
+            if resp.status_code == 404:
+                return values
+            if not resp.ok:
+                raise PrismError("Could not read the values of category {0}".format(key), resp)
+            body = json.loads(resp.content)
+            entities = body.get('entities', [])
+            values.extend(entity['value'] for entity in entities)
+            offset += len(entities)
+            if not entities or offset >= body.get('metadata', {}).get('total_matches', 0):
+                return values
+
+    def vm_references(self, keys):
+        '''
+        Function that returns UUID -> name for every VM with any value of the category keys
+        '''
+        params = {}
+        for key in keys:
+            key_values = self.values(key)
+            if key_values:
+                params[key] = key_values
+        references = {}
+        if not params:
+            return references
+        offset = 0
+        while True:
+            payload = {
+                'usage_type': 'APPLIED_TO',
+                'category_filter': {'type': 'CATEGORIES_MATCH_ANY', 'kind_list': ['vm'], 'params': params},
+                'group_member_count': self.page_size,
+                'group_member_offset': offset,
+            }
+            resp = self.client.post('category/query', payload)
+            if not resp.ok:
+                raise PrismError("Category query failed at offset {0}".format(offset), resp)
+            body = json.loads(resp.content)
+            page_count = 0
+            total = 0
+            for result in body.get('results', []):
+                total = max(total, result.get('filtered_entity_count', 0))
+                for reference in result.get('kind_reference_list', []):
+                    page_count += 1
+                    references[reference['uuid']] = reference.get('name', '')
+            offset += page_count
+            if page_count < self.page_size or offset >= total:
+                return references
+
+    def vms(self, keys):
+        '''
+        Function that returns each VM with any of the category keys, with only its UUID, name and categories
+        '''
+        references = self.vm_references(keys)
+        self.in_scope = len(references)
+        uuids = list(references)
+        for start in range(0, len(uuids), self.page_size):
+            chunk = uuids[start:start + self.page_size]
+            found = self._categories(chunk)
+            missing = [uuid for uuid in chunk if uuid not in found]
+            for uuid in chunk:
+                if uuid in found:
+                    name, categories = found[uuid]
+                    yield {'metadata': {'uuid': uuid, 'categories': categories}, 'spec': {'name': name or references[uuid]}}
+            if missing:
+                self.full_reads += len(missing)
+                with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                    for uuid, resp in zip(missing, pool.map(lambda uuid: self.client.get('vms/' + uuid), missing)):
+                        if resp.ok:
+                            yield json.loads(resp.content)
+
+    def _categories(self, uuids):
+        '''
+        Function that returns UUID -> (name, categories) from the groups API for a chunk of VMs
+        VMs without a categories column are left out, an empty dict is returned when the groups API can not be used.
+        '''
+        payload = {
+            'entity_type': 'mh_vm',
+            'entity_ids': uuids,
+            'group_member_attributes': [{'attribute': NAME_ATTRIBUTE}, {'attribute': CATEGORIES_ATTRIBUTE}],
+            'group_member_count': len(uuids),
+            'group_member_offset': 0,
+        }
+        try:
+            resp = self.client.post('groups', payload)
+        except Exception:
+            return {}
+        if not resp.ok:
+            return {}
+        found = {}
+        for group in json.loads(resp.content).get('group_results', []):
+            for result in group.get('entity_results', []):
+                name = ''
+                categories = None
+                for column in result.get('data', []):
+                    values = (column.get('values') or [{}])[0].get('values') or []
+                    if column.get('name') == NAME_ATTRIBUTE and values:
+                        name = values[0]
+                    elif column.get('name') == CATEGORIES_ATTRIBUTE:
+                        categories = parse_categories(values)
+                if categories is not None:
+                    found[result['entity_id']] = (name, categories)
+        return found
@@ -0,0 +1,548 @@
+#!/user/bin/env python
+
+"""
+Answers "is this traffic allowed?" from a copy of the Flow security policies, without Prism.
+
+The policies, address groups, service groups and the VMs with their categories and IPs are read
+once, from Prism or from a snapshot file, and compiled into lookup tables:
+    - policies by target category and value, so the policies of a VM are found from its categories
+    - each allow list by peer category and value, with the subnet and allow all entries kept apart
+    - each service list as port ranges by protocol
+A check looks up the policies of the two VMs and the entries that can match the other VM, so a
+check takes microseconds and thousands of flows can be checked for an audit in a second.
+
+A flow from A to B is allowed when:
+    1. no isolation rule puts A and B on opposite sides
+    2. B is not the target of an applied policy, or one of its policies allows A inbound
+    3. A is not the target of an applied policy, or one of its policies allows B outbound
+A VM in a quarantine policy is only checked against its quarantine policies.  Policies in monitor
+mode do not block, a flow they would have blocked is allowed and says so in the reason.
+VMs in the same policy are allowed to reach each other when its target group has ALLOW_ALL.
+
+Usage:
+    evaluator = FlowEvaluator.from_prism(client)
+    decision = evaluator.check('web01', 'db01', 'TCP', 1433)
+    print (decision.allowed, decision.reason)
+    save_snapshot('FlowSnapshot.json', evaluator)
+    evaluator = load_snapshot('FlowSnapshot.json')
+
+    #What if these policies were changed, only the changed policies are compiled again
+    changed = evaluator.with_rules([SecurityRule.from_v3(policy)])
+    for flow, before, after in zip(flows, evaluator.check_all(flows), changed.check_all(flows)):
+
+A source or destination is a VM name, a VM UUID or an IP address.  An IP that is not on a VM is
+treated as an outside address with no categories.
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+import ipaddress
+import json
+from typing import NamedTuple
+from FlowModel import SecurityRule, AddressGroup, ServiceGroup, Service, read_address_groups, read_service_groups, intern
+
+
+class Decision(NamedTuple):
+    '''
+    Outcome of one check, the policies are the names that decided it
+    '''
+    allowed: bool
+    reason: str
+    policies: tuple = ()
+
+
+def ip_range(ip, prefix_length=None):
+    '''
+    Function that returns (version, first, last) for an IP address or subnet as numbers
+    '''
+    network = ipaddress.ip_network(ip if prefix_length is None else '{0}/{1}'.format(ip, prefix_length), strict=False)
+    return (network.version, int(network.network_address), int(network.broadcast_address))
+
+
+def filter_params(category_filter):
+    '''
+    Function that returns category -> frozenset of values for a CategoryFilter
+    '''
+    if category_filter is None or not category_filter.params:
+        return {}
+    return {category: frozenset(values) for category, values in category_filter.params}
+
+
+class Endpoint:
+    '''
+    A VM or outside address, categories is category -> frozenset of values and addresses is (version, number)
+    '''
+    __slots__ = ('uuid', 'name', 'categories', 'ips', 'addresses')
+
+    def __init__(self, uuid, name, categories=None, ips=()):
+        self.uuid = intern(uuid)
+        self.name = name
+        self.categories = categories or {}
+        self.ips = tuple(ips)
+        self.addresses = tuple((address.version, int(address)) for address in map(ipaddress.ip_address, self.ips))
+
+    @classmethod
+    def from_vm(cls, vm):
+        '''
+        Function that makes an Endpoint from a v3 VM, categories_mapping is used when the VM has it
+        '''
+        metadata = vm.get('metadata', {})
+        mapping = metadata.get('categories_mapping') or {key: [value] for key, value in metadata.get('categories', {}).items()}
+        categories = {intern(key): frozenset(intern(value) for value in values) for key, values in mapping.items()}
+        ips = []
+        for section in ('status', 'spec'):
+            for nic in vm.get(section, {}).get('resources', {}).get('nic_list', []):
+                for endpoint in nic.get('ip_endpoint_list', []):
+                    if endpoint.get('ip') and endpoint['ip'] not in ips:
+                        ips.append(endpoint['ip'])
+        name = vm.get('spec', {}).get('name') or vm.get('status', {}).get('name')
+        return cls(metadata.get('uuid'), name, categories, ips)
+
+    def matches(self, params):
+        '''
+        Function that checks a CATEGORIES_MATCH_ALL filter, every category must have one of its values on the endpoint
+        '''
+        if not params:
+            return False
+        for category, values in params.items():
+            if self.categories.get(category, frozenset()).isdisjoint(values):
+                return False
+        return True
+
+    def in_ranges(self, ranges):
+        '''
+        Function that checks if any address of the endpoint is in one of the (version, first, last) ranges
+        '''
+        for version, number in self.addresses:
+            for range_version, first, last in ranges:
+                if version == range_version and first <= number <= last:
+                    return True
+        return False
+
+    def to_json(self):
+        return {'uuid': self.uuid, 'name': self.name, 'categories': {key: sorted(values) for key, values in self.categories.items()}, 'ips': list(self.ips)}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data.get('uuid'), data.get('name'), {intern(key): frozenset(values) for key, values in data.get('categories', {}).items()}, data.get('ips', ()))
+
+
+class ServiceSet:
+    '''
+    The services of one allow list entry as port ranges by protocol
+    ports is protocol -> tuple of (first, last), None for every port.  ICMP ranges are of ICMP types.
+    '''
+    __slots__ = ('all', 'ports')
+
+    def __init__(self, services=None):
+        self.all = services is None
+        self.ports = {}
+        for service in services or ():
+            self.add(service)
+
+    def add(self, service):
+        protocol = (service.protocol or 'ALL').upper()
+        if protocol == 'ALL':
+            self.all = True
+            return
+        if protocol == 'ICMP':
+            if service.icmp is None or any(code.type is None for code in service.icmp):
+                ranges = None
+            else:
+                ranges = tuple((code.type, code.type) for code in service.icmp)
+        elif service.ports is None:
+            ranges = None
+        else:
+            ranges = tuple((port.start_port, port.end_port) for port in service.ports)
+        if ranges is None or self.ports.get(protocol, ()) is None:
+            self.ports[protocol] = None
+        else:
+            self.ports[protocol] = self.ports.get(protocol, ()) + ranges
+
+    def allows(self, protocol, port):
+        '''
+        Function that checks a protocol and port, a port of None checks the protocol on any port
+        '''
+        if self.all:
+            return True
+        ranges = self.ports.get(protocol, False)
+        if ranges is False:
+            return False
+        if ranges is None or port is None:
+            return True
+        for first, last in ranges:
+            if first <= port <= last:
+                return True
+        return False
+
+    def covers(self, other):
+        '''
+        Function that checks if every protocol and port of the other set is in this one
+        '''
+        if self.all:
+            return True
+        if other.all:
+            return False
+        for protocol, ranges in other.ports.items():
+            mine = self.ports.get(protocol, False)
+            if mine is False or (mine is not None and ranges is None):
+                return False
+            if mine is None:
+                continue
+            for first, last in ranges:
+                if not any(start <= first and last <= end for start, end in mine):
+                    return False
+        return True
+
+
+class AllowEntry:
+    '''
+    One compiled allow list entry, kind is ALL, FILTER or IP_SUBNET
+    '''
+    __slots__ = ('kind', 'params', 'ranges', 'services')
+
+    def __init__(self, kind, services, params=None, ranges=()):
+        self.kind = kind
+        self.services = services
+        self.params = params or {}
+        self.ranges = ranges
+
+    def matches(self, endpoint):
+        if self.kind == 'ALL':
+            return True
+        if self.kind == 'FILTER':
+            return endpoint.matches(self.params)
+        return endpoint.in_ranges(self.ranges)
+
+    def covers(self, other):
+        '''
+        Function that checks if this entry allows everything the other entry allows
+        A filter covers another when each of its categories is in the other with fewer or the same values.
+        '''
+        if not self.services.covers(other.services):
+            return False
+        if self.kind == 'ALL':
+            return True
+        if self.kind != other.kind:
+            return False
+        if self.kind == 'FILTER':
+            return all(category in other.params and other.params[category] <= values for category, values in self.params.items())
+        return all(any(version == mine and start <= first and last <= end for mine, start, end in self.ranges)
+                   for version, first, last in other.ranges)
+
+
+class AllowList:
+    '''
+    The inbound or outbound allow list of a policy indexed by peer category and value
+    '''
+    __slots__ = ('any', 'by_category', 'subnets')
+
+    def __init__(self, peers, address_groups, service_groups, problems):
+        self.any = []
+        self.by_category = {}
+        self.subnets = []
+        for peer in peers or ():
+            entry = compile_entry(peer, address_groups, service_groups, problems)
+            if entry is None:
+                continue
+            if entry.kind == 'ALL':
+                self.any.append(entry)
+            elif entry.kind == 'FILTER':
+                #Indexed on one category of the filter, the entry is checked in full when it is found
+                category, values = next(iter(entry.params.items()))
+                for value in values:
+                    self.by_category.setdefault((category, value), []).append(entry)
+            else:
+                self.subnets.append(entry)
+
+    def allows(self, endpoint, protocol, port):
+        '''
+        Function that checks if any entry allows the endpoint on the protocol and port
+        '''
+        for entry in self.any:
+            if entry.services.allows(protocol, port):
+                return True
+        for category, values in endpoint.categories.items():
+            for value in values:
+                for entry in self.by_category.get((category, value), ()):
+                    if entry.services.allows(protocol, port) and entry.matches(endpoint):
+                        return True
+        if endpoint.addresses:
+            for entry in self.subnets:
+                if entry.services.allows(protocol, port) and entry.matches(endpoint):
+                    return True
+        return False
+
+
+def compile_entry(peer, address_groups, service_groups, problems):
+    '''
+    Function that compiles one Peer, returns None for an entry that can never match
+    A service or address group that is not found is added to problems and left out.
+    '''
+    if peer.services is not None:
+        services = []
+        for reference in peer.services:
+            group = service_groups.get(reference.uuid)
+            if group is None:
+                problems.append("Service group {0} not found".format(reference.uuid))
+            else:
+                services.extend(group.services or ())
+        service_set = ServiceSet(services)
+    elif any(key == 'protocol' for key, value in peer.extra):
+        #Older entries list the protocol and ports on the entry itself
+        service_set = ServiceSet([Service.from_v3(dict(peer.extra))])
+    else:
+        service_set = ServiceSet()
+
+    if peer.type == 'ALL':
+        return AllowEntry('ALL', service_set)
+    if peer.type == 'FILTER':
+        params = filter_params(peer.filter)
+        return AllowEntry('FILTER', service_set, params=params) if params else None
+    if peer.type == 'IP_SUBNET':
+        ranges = []
+        if peer.ip_subnet is not None:
+            ranges.append(ip_range(peer.ip_subnet.ip, peer.ip_subnet.prefix_length))
+        for reference in peer.addresses or ():
+            group = address_groups.get(reference.uuid)
+            if group is None:
+                problems.append("Address group {0} not found".format(reference.uuid))
+                continue
+            for block in group.subnets or ():
+                ranges.append(ip_range(block.ip, block.prefix_length))
+        return AllowEntry('IP_SUBNET', service_set, ranges=tuple(ranges)) if ranges else None
+    problems.append("Unknown peer type {0}".format(peer.type))
+    return None
+
+
+class CompiledRule:
+    '''
+    One app_rule or quarantine_rule of a policy ready to check flows
+    '''
+    __slots__ = ('name', 'uuid', 'enforced', 'quarantine', 'target', 'allow_internal', 'inbound', 'outbound')
+
+    def __init__(self, rule, app_rule, quarantine, address_groups, service_groups, problems):
+        self.name = rule.name
+        self.uuid = rule.uuid
+        self.enforced = app_rule.action == 'APPLY'
+        self.quarantine = quarantine
+        self.target = filter_params(app_rule.target.filter) if app_rule.target is not None else {}
+        target_extra = dict(app_rule.target.extra) if app_rule.target is not None else {}
+        self.allow_internal = target_extra.get('default_internal_policy') == 'ALLOW_ALL'
+        self.inbound = AllowList(app_rule.inbound, address_groups, service_groups, problems)
+        self.outbound = AllowList(app_rule.outbound, address_groups, service_groups, problems)
+
+
+class IsolationRule:
+    '''
+    An isolation_rule, VMs that match the first filter can not reach VMs that match the second and the other way
+    '''
+    __slots__ = ('name', 'enforced', 'first', 'second')
+
+    def __init__(self, rule, isolation):
+        self.name = rule.name
+        self.enforced = isolation.get('action') == 'APPLY'
+        self.first = {key: frozenset(values) for key, values in isolation.get('first_entity_filter', {}).get('params', {}).items()}
+        self.second = {key: frozenset(values) for key, values in isolation.get('second_entity_filter', {}).get('params', {}).items()}
+
+    def separates(self, source, destination):
+        return (source.matches(self.first) and destination.matches(self.second)) or \
+               (source.matches(self.second) and destination.matches(self.first))
+
+
+class FlowEvaluator:
+    '''
+    The compiled policies, groups and VMs, checks flows without calling Prism
+    '''
+    def __init__(self, rules, address_groups, service_groups, endpoints, compiled=None, problems=None):
+        #rules is a list of SecurityRule, the groups are UUID -> group and endpoints a list of Endpoint
+        self.rules = list(rules)
+        self.address_groups = address_groups
+        self.service_groups = service_groups
+        self.endpoints = list(endpoints)
+        #Policy name -> problems found while compiling, such as a missing service group
+        self.problems = {}
+        self.by_uuid = {}
+        self.by_name = {}
+        self.by_ip = {}
+        for endpoint in self.endpoints:
+            self.by_uuid[endpoint.uuid] = endpoint
+            self.by_name.setdefault(endpoint.name, endpoint)
+            for ip in endpoint.ips:
+                self.by_ip.setdefault(ip, endpoint)
+        self.outside = {}
+
+        #SecurityRule -> its compiled rules, reused by with_rules() for the policies that did not change
+        self.compiled = {}
+        self.isolation = []
+        #(category, value) -> compiled rules whose target has it
+        self.by_target = {}
+        for rule in self.rules:
+            parts = (compiled or {}).get(rule)
+            if parts is None:
+                parts = self._compile(rule)
+            elif rule.name in (problems or {}):
+                self.problems[rule.name] = problems[rule.name]
+            self.compiled[rule] = parts
+            for part in parts:
+                if isinstance(part, IsolationRule):
+                    self.isolation.append(part)
+                    continue
+                for category, values in part.target.items():
+                    #Indexed on one category of the target, checked in full when it is found
+                    for value in values:
+                        self.by_target.setdefault((category, value), []).append(part)
+                    break
+        #Endpoint UUID -> its compiled rules, filled in as endpoints are checked
+        self.policy_cache = {}
+
+    @classmethod
+    def from_prism(cls, client, workers=4):
+        '''
+        Function that reads the policies, groups and VMs from Prism
+        '''
+        rules = [SecurityRule.from_v3(policy) for policy in client.list_entities('network_security_rules', 'network_security_rule', workers=workers)]
+        endpoints = [Endpoint.from_vm(vm) for vm in client.list_entities('vms', 'vm', workers=workers)]
+        return cls(rules, read_address_groups(client, workers), read_service_groups(client, workers), endpoints)
+
+    def with_rules(self, changed_rules):
+        '''
+        Function that returns an evaluator with the changed policies in place of the ones with the same UUID
+        A policy without a UUID, or with one that is not found, is added.  Only the changed policies are compiled.
+        '''
+        changed = {rule.uuid or rule.name: rule for rule in changed_rules}
+        rules = [changed.pop(rule.uuid, rule) for rule in self.rules] + list(changed.values())
+        return FlowEvaluator(rules, self.address_groups, self.service_groups, self.endpoints, self.compiled, self.problems)
+
+    def endpoint(self, value):
+        '''
+        Function that returns the Endpoint for a VM name, VM UUID or IP address
+        '''
+        if isinstance(value, Endpoint):
+            return value
+        found = self.by_uuid.get(value) or self.by_name.get(value) or self.by_ip.get(value)
+        if found is not None:
+            return found
+        if value not in self.outside:
+            try:
+                self.outside[value] = Endpoint(None, value, ips=[str(ipaddress.ip_address(value))])
+            except ValueError:
+                raise ValueError("{0} is not a VM name, VM UUID or IP address".format(value))
+        return self.outside[value]
+
+    def policies(self, endpoint):
+        '''
+        Function that returns the compiled rules whose target the endpoint is in, quarantine rules only when it is quarantined
+        '''
+        endpoint = self.endpoint(endpoint)
+        key = endpoint.uuid or endpoint.name
+        found = self.policy_cache.get(key)
+        if found is None:
+            found = []
+            for category, values in endpoint.categories.items():
+                for value in values:
+                    for part in self.by_target.get((category, value), ()):
+                        if part not in found and endpoint.matches(part.target):
+                            found.append(part)
+            quarantine = [part for part in found if part.quarantine]
+            found = self.policy_cache[key] = quarantine or found
+        return found
+
+    def check(self, source, destination, protocol='TCP', port=None):
+        '''
+        Function that checks one flow, returns a Decision
+        '''
+        source = self.endpoint(source)
+        destination = self.endpoint(destination)
+        protocol = protocol.upper()
+        for isolation in self.isolation:
+            if isolation.separates(source, destination):
+                if isolation.enforced:
+                    return Decision(False, "Isolated by {0}".format(isolation.name), (isolation.name,))
+
+        decided = []
+        monitored = []
+        for direction, endpoint, other in (('inbound', destination, source), ('outbound', source, destination)):
+            parts = self.policies(endpoint)
+            if not parts:
+                continue
+            allowed_by = [part for part in parts if self._allows(part, direction, endpoint, other, protocol, port)]
+            enforced = [part for part in parts if part.enforced]
+            if enforced and not any(part.enforced for part in allowed_by):
+                names = tuple(part.name for part in enforced)
+                word = 'to' if direction == 'inbound' else 'from'
+                return Decision(False, "Denied {0} {1} {2} by {3}".format(direction, word, endpoint.name, ', '.join(names)), names)
+            if not allowed_by:
+                monitored.extend(part.name for part in parts)
+            decided.extend(part.name for part in allowed_by)
+
+        if monitored:
+            return Decision(True, "Allowed, {0} in monitor mode would deny".format(', '.join(monitored)), tuple(decided + monitored))
+        if decided:
+            return Decision(True, "Allowed by {0}".format(', '.join(dict.fromkeys(decided))), tuple(dict.fromkeys(decided)))
+        return Decision(True, "Allowed, no policy applies", ())
+
+    def check_all(self, flows):
+        '''
+        Function that checks (source, destination, protocol, port) flows, returns a Decision for each
+        A flow with an unknown source or destination gets a Decision with the error as the reason.
+        '''
+        decisions = []
+        for source, destination, protocol, port in flows:
+            try:
+                decisions.append(self.check(source, destination, protocol, port))
+            except ValueError as ex:
+                decisions.append(Decision(False, "ERROR: {0}".format(ex)))
+        return decisions
+
+    def _allows(self, part, direction, endpoint, other, protocol, port):
+        '''
+        Function that checks one compiled rule for the endpoint in its target and the other side of the flow
+        '''
+        if part.allow_internal and other.matches(part.target):
+            return True
+        allow_list = part.inbound if direction == 'inbound' else part.outbound
+        return allow_list.allows(other, protocol, port)
+
+    def _compile(self, rule):
+        '''
+        Function that compiles the app, quarantine and isolation rules of one policy
+        '''
+        problems = []
+        parts = []
+        if rule.app_rule is not None:
+            parts.append(CompiledRule(rule, rule.app_rule, False, self.address_groups, self.service_groups, problems))
+        if rule.quarantine_rule is not None:
+            parts.append(CompiledRule(rule, rule.quarantine_rule, True, self.address_groups, self.service_groups, problems))
+        isolation = dict(rule.resources_extra).get('isolation_rule')
+        if isinstance(isolation, dict):
+            parts.append(IsolationRule(rule, isolation))
+        if problems:
+            self.problems[rule.name] = problems
+        return tuple(parts)
+
+
+def save_snapshot(file_name, evaluator):
+    '''
+    Function that writes the policies, groups and VMs of an evaluator to a JSON file
+    '''
+    snapshot = {
+        'network_security_rules': [rule.to_v3() for rule in evaluator.rules],
+        'address_groups': [group.to_v3() for group in evaluator.address_groups.values()],
+        'service_groups': [group.to_v3() for group in evaluator.service_groups.values()],
+        'vms': [endpoint.to_json() for endpoint in evaluator.endpoints],
+    }
+    with open(file_name, 'w') as outfile:
+        json.dump(snapshot, outfile)
+
+
+def load_snapshot(file_name):
+    '''
+    Function that makes an evaluator from a file written by save_snapshot
+    '''
+    with open(file_name) as infile:
+        snapshot = json.load(infile)
+    address_groups = {group.uuid: group for group in map(AddressGroup.from_v3, snapshot.get('address_groups', []))}
+    service_groups = {group.uuid: group for group in map(ServiceGroup.from_v3, snapshot.get('service_groups', []))}
+    rules = [SecurityRule.from_v3(policy) for policy in snapshot.get('network_security_rules', [])]
+    return FlowEvaluator(rules, address_groups, service_groups, map(Endpoint.from_json, snapshot.get('vms', [])))
@@ -0,0 +1,634 @@
+#!/user/bin/env python
+
+"""
+Typed in-memory model of Flow security policies, address groups and service groups.
+
+The Flow scripts worked on the v3 JSON as nested dicts, such as
+value['spec']['resources']['app_rule']['inbound_allow_list'], and a change meant copying the dicts.
+The model keeps the same data in small read only objects:
+    SecurityRule  - one network_security_rule, with its app_rule and quarantine_rule
+    AppRule       - action, target group and the inbound and outbound allow lists
+    Peer          - one allow list entry, its address groups, service groups, category filter or subnet
+    AddressGroup  - one address_group and its subnets
+    ServiceGroup  - one service_group and its services
+The classes use __slots__ and the small values are tuples.  UUIDs are interned and every
+{kind, uuid} reference is made once and shared, so the same address group in a thousand policies
+is one object.  A change is a new object that shares everything that did not change, nothing is copied.
+
+from_v3() followed by to_v3() gives back the same JSON.  Keys the model does not know are kept as they
+are in extra, so fields from newer Prism versions are not lost.  The status section of an entity is
+left out, it repeats the spec and is never sent back in a PUT.
+
+Usage:
+    rule = SecurityRule.from_v3(entity)
+    for peer in rule.app_rule.inbound:
+        print (peer.type, [address.uuid for address in peer.addresses or ()])
+    new_rule = rule.with_app_rule(rule.app_rule.with_allow_lists(inbound=rule.app_rule.inbound + (peer,)))
+    client.put('network_security_rules/' + rule.uuid, new_rule.to_v3())
+
+    address_groups = read_address_groups(client)
+    service_groups = read_service_groups(client)
+
+key() on a peer or app_rule is a form that does not depend on order or names, two that allow the same
+traffic have the same key.  compacted() on an app_rule joins the entries that only differ in their service
+groups or address groups, see compact_peers.
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+import json
+import sys
+from typing import NamedTuple, Optional
+
+#Every reference made, so each {kind, uuid, name} is one shared object
+_references = {}
+
+
+def intern(value):
+    '''
+    Function that interns a string so each UUID, kind and category name is kept once
+    '''
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def extra_items(data, known):
+    '''
+    Function that returns the keys of a v3 dict the model does not know as a tuple of (key, value)
+    '''
+    return tuple((key, value) for key, value in data.items() if key not in known)
+
+
+def canonical_extra(extra):
+    '''
+    Function that returns the extra keys as a string that does not depend on their order
+    '''
+    return json.dumps(dict(extra), sort_keys=True) if extra else ''
+
+
+class Reference(NamedTuple):
+    '''
+    A {kind, uuid, name} reference to an address group, service group or other entity
+    '''
+    kind: Optional[str]
+    uuid: str
+    name: Optional[str] = None
+
+    def __reduce__(self):
+        #Unpickled through the shared references, a worker process keeps one object for each reference too
+        return (reference, (self.kind, self.uuid, self.name))
+
+    def to_v3(self):
+        data = {}
+        if self.kind is not None:
+            data['kind'] = self.kind
+        data['uuid'] = self.uuid
+        if self.name is not None:
+            data['name'] = self.name
+        return data
+
+
+def reference(kind, uuid, name=None):
+    '''
+    Function that returns the shared Reference for a kind, UUID and name
+    '''
+    key = (kind, uuid, name)
+    found = _references.get(key)
+    if found is None:
+        found = _references[key] = Reference(intern(kind), intern(uuid), name)
+    return found
+
+
+def references(items):
+    '''
+    Function that turns a v3 list of references into a tuple of Reference
+    None when the list has anything besides kind, uuid and name, the caller then keeps the list as it is.
+    '''
+    if not isinstance(items, list):
+        return None
+    found = []
+    for item in items:
+        if not isinstance(item, dict) or 'uuid' not in item or len(item) != 1 + ('kind' in item) + ('name' in item):
+            return None
+        key = (item.get('kind'), item['uuid'], item.get('name'))
+        #Most references have been seen before, look them up without a call
+        found.append(_references.get(key) or reference(*key))
+    return tuple(found)
+
+
+class Subnet(NamedTuple):
+    '''
+    An {ip, prefix_length} subnet
+    '''
+    ip: str
+    prefix_length: int
+
+    def to_v3(self):
+        return {'ip': self.ip, 'prefix_length': self.prefix_length}
+
+
+def subnet(data):
+    '''
+    Function that returns a Subnet, None when the dict has anything besides ip and prefix_length
+    '''
+    if isinstance(data, dict) and set(data) == {'ip', 'prefix_length'}:
+        return Subnet(data['ip'], data['prefix_length'])
+    return None
+
+
+class CategoryFilter(NamedTuple):
+    '''
+    A category filter, params is ((category, (value, ...)), ...) in the order of the v3 JSON
+    '''
+    type: Optional[str]
+    kind_list: Optional[tuple]
+    params: Optional[tuple]
+    extra: tuple = ()
+
+    @classmethod
+    def from_v3(cls, data):
+        params = data.get('params')
+        if isinstance(params, dict) and all(isinstance(values, list) for values in params.values()):
+            params = tuple((intern(category), tuple(intern(value) for value in values)) for category, values in params.items())
+            known = ('type', 'kind_list', 'params')
+        else:
+            params = None
+            known = ('type', 'kind_list')
+        kind_list = data.get('kind_list')
+        if kind_list is not None:
+            kind_list = tuple(intern(kind) for kind in kind_list)
+        return cls(data.get('type'), kind_list, params, extra_items(data, known))
+
+    def to_v3(self):
+        data = {}
+        if self.kind_list is not None:
+            data['kind_list'] = list(self.kind_list)
+        if self.params is not None:
+            data['params'] = {category: list(values) for category, values in self.params}
+        if self.type is not None:
+            data['type'] = self.type
+        data.update(self.extra)
+        return data
+
+    def key(self):
+        return (self.type, tuple(sorted(self.kind_list or ())),
+                tuple(sorted((category, tuple(sorted(values))) for category, values in self.params or ())),
+                canonical_extra(self.extra))
+
+
+class Peer:
+    '''
+    One inbound or outbound allow list entry, or the target group of a rule
+    addresses and services are tuples of Reference, None when the entry does not have the list.
+    '''
+    __slots__ = ('type', 'addresses', 'services', 'filter', 'ip_subnet', 'extra')
+
+    def __init__(self, type, addresses=None, services=None, filter=None, ip_subnet=None, extra=()):
+        self.type = type
+        self.addresses = addresses
+        self.services = services
+        self.filter = filter
+        self.ip_subnet = ip_subnet
+        self.extra = extra
+
+    def __reduce__(self):
+        #Pickled as the constructor arguments, smaller than the slots by name when sent to a worker process
+        return (Peer, (self.type, self.addresses, self.services, self.filter, self.ip_subnet, self.extra))
+
+    @classmethod
+    def from_v3(cls, data):
+        known = {'peer_specification_type'}
+        addresses = references(data.get('address_group_inclusion_list'))
+        if addresses is not None:
+            known.add('address_group_inclusion_list')
+        services = references(data.get('service_group_list'))
+        if services is not None:
+            known.add('service_group_list')
+        category_filter = None
+        if isinstance(data.get('filter'), dict):
+            category_filter = CategoryFilter.from_v3(data['filter'])
+            known.add('filter')
+        ip_subnet = subnet(data.get('ip_subnet'))
+        if ip_subnet is not None:
+            known.add('ip_subnet')
+        return cls(data.get('peer_specification_type'), addresses, services, category_filter, ip_subnet, extra_items(data, known))
+
+    def to_v3(self):
+        data = {}
+        if self.addresses is not None:
+            data['address_group_inclusion_list'] = [address.to_v3() for address in self.addresses]
+        if self.filter is not None:
+            data['filter'] = self.filter.to_v3()
+        if self.ip_subnet is not None:
+            data['ip_subnet'] = self.ip_subnet.to_v3()
+        if self.type is not None:
+            data['peer_specification_type'] = self.type
+        if self.services is not None:
+            data['service_group_list'] = [service.to_v3() for service in self.services]
+        data.update(self.extra)
+        return data
+
+    def key(self):
+        '''
+        Function that returns the entry in a form that does not depend on order or names
+        '''
+        return (self.type,
+                tuple(sorted(address.uuid for address in self.addresses or ())),
+                tuple(sorted(service.uuid for service in self.services or ())),
+                self.filter.key() if self.filter is not None else None,
+                self.ip_subnet, canonical_extra(self.extra))
+
+    def __repr__(self):
+        return "Peer({0!r}, addresses={1!r}, services={2!r}, filter={3!r}, ip_subnet={4!r})".format(
+            self.type, self.addresses, self.services, self.filter, self.ip_subnet)
+
+
+def peers(items):
+    '''
+    Function that turns a v3 allow list into a tuple of Peer, None when the policy does not have the list
+    '''
+    if items is None:
+        return None
+    return tuple(Peer.from_v3(item) for item in items)
+
+
+def join_references(first, second):
+    '''
+    Function that returns the references of both lists once each, in order, None (every service) wins
+    '''
+    if first is None or second is None:
+        return None
+    joined = {item.uuid: item for item in first}
+    for item in second:
+        joined.setdefault(item.uuid, item)
+    return tuple(joined.values())
+
+
+def compact_peers(items):
+    '''
+    Function that joins the entries of an allow list that only differ in their services or in their address groups
+    Exact duplicates are dropped, entries with the same peer get the union of their service groups, and
+    address group entries with the same service groups get the union of their address groups.  The joined
+    entry takes the place of the first one, so the list allows the same traffic with fewer entries.
+    Entries with keys the model does not know, such as ports on the entry itself, are only dropped when duplicated.
+    '''
+    compacted = []
+    seen = set()
+    for peer in items:
+        key = peer.key()
+        if key not in seen:
+            seen.add(key)
+            compacted.append(peer)
+
+    while True:
+        count = len(compacted)
+        #Same peer, the services are joined
+        compacted = _join_peers(compacted, _peer_key,
+                                lambda peer, other: Peer(peer.type, peer.addresses, join_references(peer.services, other.services),
+                                                         peer.filter, peer.ip_subnet))
+        #Same services, the address groups are joined
+        compacted = _join_peers(compacted, _services_key,
+                                lambda peer, other: Peer(peer.type, join_references(peer.addresses, other.addresses), peer.services,
+                                                         peer.filter, peer.ip_subnet))
+        #Joining services can make two address entries the same, stop when a pass joins nothing
+        if len(compacted) == count:
+            return tuple(compacted)
+
+
+def _peer_key(peer):
+    '''
+    Function that returns who an entry allows, leaving out the services
+    '''
+    return (peer.type, tuple(sorted(address.uuid for address in peer.addresses or ())),
+            peer.filter.key() if peer.filter is not None else None, peer.ip_subnet)
+
+
+def _services_key(peer):
+    '''
+    Function that returns what an address group entry allows, leaving out the address groups, None for other entries
+    '''
+    if peer.type != 'IP_SUBNET' or not peer.addresses or peer.filter is not None:
+        return None
+    return (peer.ip_subnet, None if peer.services is None else tuple(sorted(service.uuid for service in peer.services)))
+
+
+def _join_peers(items, group_key, join):
+    '''
+    Function that joins the entries with the same group_key into the first of them, a key of None is not joined
+    '''
+    joined = []
+    #group key -> index in joined
+    first = {}
+    for peer in items:
+        key = group_key(peer) if not peer.extra else None
+        if key is None:
+            joined.append(peer)
+        elif key in first:
+            joined[first[key]] = join(joined[first[key]], peer)
+        else:
+            first[key] = len(joined)
+            joined.append(peer)
+    return joined
+
+
+class AppRule:
+    '''
+    The app_rule or quarantine_rule of a security policy
+    inbound and outbound are tuples of Peer, None when the rule does not have the list.
+    '''
+    __slots__ = ('action', 'target', 'inbound', 'outbound', 'extra')
+
+    def __init__(self, action=None, target=None, inbound=None, outbound=None, extra=()):
+        self.action = action
+        self.target = target
+        self.inbound = inbound
+        self.outbound = outbound
+        self.extra = extra
+
+    def __reduce__(self):
+        return (AppRule, (self.action, self.target, self.inbound, self.outbound, self.extra))
+
+    @classmethod
+    def from_v3(cls, data):
+        target = Peer.from_v3(data['target_group']) if isinstance(data.get('target_group'), dict) else None
+        known = ('action', 'target_group', 'inbound_allow_list', 'outbound_allow_list') if target is not None else \
+                ('action', 'inbound_allow_list', 'outbound_allow_list')
+        return cls(data.get('action'), target, peers(data.get('inbound_allow_list')), peers(data.get('outbound_allow_list')),
+                   extra_items(data, known))
+
+    def to_v3(self):
+        data = {}
+        if self.action is not None:
+            data['action'] = self.action
+        if self.inbound is not None:
+            data['inbound_allow_list'] = [peer.to_v3() for peer in self.inbound]
+        if self.outbound is not None:
+            data['outbound_allow_list'] = [peer.to_v3() for peer in self.outbound]
+        if self.target is not None:
+            data['target_group'] = self.target.to_v3()
+        data.update(self.extra)
+        return data
+
+    def allow_list(self, direction):
+        '''
+        Function that returns the 'inbound' or 'outbound' peers, a missing list is empty
+        '''
+        return getattr(self, direction) or ()
+
+    def target_params(self):
+        '''
+        Function that returns the category -> values of the target group
+        '''
+        if self.target is None or self.target.filter is None:
+            return {}
+        return dict(self.target.filter.params or ())
+
+    def entry_count(self):
+        '''
+        Function that returns the number of inbound and outbound entries
+        '''
+        return len(self.inbound or ()) + len(self.outbound or ())
+
+    def compacted(self):
+        '''
+        Function that returns a copy with the allow lists joined by compact_peers, a missing list stays missing
+        '''
+        return AppRule(self.action, self.target, None if self.inbound is None else compact_peers(self.inbound),
+                       None if self.outbound is None else compact_peers(self.outbound), self.extra)
+
+    def with_allow_lists(self, inbound=None, outbound=None):
+        '''
+        Function that returns a copy with new allow lists, a list left as None is shared with this rule
+        '''
+        return AppRule(self.action, self.target, self.inbound if inbound is None else tuple(inbound),
+                       self.outbound if outbound is None else tuple(outbound), self.extra)
+
+    def key(self):
+        '''
+        Function that returns the rule in a form that does not depend on order or names
+        A missing allow list and an empty one are the same.
+        '''
+        return (self.action, self.target.key() if self.target is not None else None,
+                tuple(sorted(peer.key() for peer in self.inbound or ())),
+                tuple(sorted(peer.key() for peer in self.outbound or ())),
+                canonical_extra(self.extra))
+
+
+class SecurityRule:
+    '''
+    One network_security_rule, metadata is kept as the v3 dict with the UUID interned
+    '''
+    __slots__ = ('uuid', 'name', 'description', 'metadata', 'app_rule', 'quarantine_rule', 'resources_extra', 'spec_extra', 'extra')
+
+    def __init__(self, uuid, name, description=None, metadata=None, app_rule=None, quarantine_rule=None, resources_extra=(), spec_extra=(), extra=()):
+        self.uuid = uuid
+        self.name = name
+        self.description = description
+        self.metadata = metadata if metadata is not None else {}
+        self.app_rule = app_rule
+        self.quarantine_rule = quarantine_rule
+        self.resources_extra = resources_extra
+        self.spec_extra = spec_extra
+        self.extra = extra
+
+    def __reduce__(self):
+        return (SecurityRule, (self.uuid, self.name, self.description, self.metadata, self.app_rule, self.quarantine_rule,
+                                    self.resources_extra, self.spec_extra, self.extra))
+
+    @classmethod
+    def from_v3(cls, entity):
+        spec = entity.get('spec', {})
+        resources = spec.get('resources', {})
+        metadata = dict(entity.get('metadata', {}))
+        if 'uuid' in metadata:
+            metadata['uuid'] = intern(metadata['uuid'])
+        app_rule = AppRule.from_v3(resources['app_rule']) if 'app_rule' in resources else None
+        quarantine_rule = AppRule.from_v3(resources['quarantine_rule']) if 'quarantine_rule' in resources else None
+        return cls(metadata.get('uuid'), spec.get('name'), spec.get('description'), metadata, app_rule, quarantine_rule,
+                   extra_items(resources, ('app_rule', 'quarantine_rule')),
+                   extra_items(spec, ('name', 'description', 'resources')),
+                   extra_items(entity, ('spec', 'metadata', 'status')))
+
+    def to_v3(self):
+        '''
+        Function that returns the v3 JSON of the rule, ready for a PUT
+        '''
+        resources = {}
+        if self.app_rule is not None:
+            resources['app_rule'] = self.app_rule.to_v3()
+        if self.quarantine_rule is not None:
+            resources['quarantine_rule'] = self.quarantine_rule.to_v3()
+        resources.update(self.resources_extra)
+        spec = {}
+        if self.description is not None:
+            spec['description'] = self.description
+        if self.name is not None:
+            spec['name'] = self.name
+        spec['resources'] = resources
+        spec.update(self.spec_extra)
+        entity = dict(self.extra)
+        entity['metadata'] = dict(self.metadata)
+        entity['spec'] = spec
+        return entity
+
+    def with_app_rule(self, app_rule):
+        '''
+        Function that returns a copy with a new app_rule, everything else is shared with this rule
+        '''
+        return SecurityRule(self.uuid, self.name, self.description, self.metadata, app_rule, self.quarantine_rule,
+                            self.resources_extra, self.spec_extra, self.extra)
+
+
+class AddressGroup:
+    '''
+    One address_group, subnets is a tuple of Subnet, None when the group does not have the list
+    '''
+    __slots__ = ('uuid', 'name', 'description', 'subnets', 'extra', 'entity_extra')
+
+    def __init__(self, uuid, name, description=None, subnets=None, extra=(), entity_extra=()):
+        self.uuid = uuid
+        self.name = name
+        self.description = description
+        self.subnets = subnets
+        self.extra = extra
+        self.entity_extra = entity_extra
+
+    def __reduce__(self):
+        return (AddressGroup, (self.uuid, self.name, self.description, self.subnets, self.extra, self.entity_extra))
+
+    @classmethod
+    def from_v3(cls, entity):
+        group = entity.get('address_group', {})
+        subnets = None
+        known = ('name', 'description')
+        if isinstance(group.get('ip_address_block_list'), list):
+            subnets = tuple(subnet(block) for block in group['ip_address_block_list'])
+            if None in subnets:
+                subnets = None
+            else:
+                known += ('ip_address_block_list',)
+        return cls(intern(entity.get('uuid')), group.get('name'), group.get('description'), subnets,
+                   extra_items(group, known), extra_items(entity, ('address_group', 'uuid')))
+
+    def to_v3(self):
+        group = {}
+        if self.name is not None:
+            group['name'] = self.name
+        if self.description is not None:
+            group['description'] = self.description
+        if self.subnets is not None:
+            group['ip_address_block_list'] = [block.to_v3() for block in self.subnets]
+        group.update(self.extra)
+        entity = {'address_group': group}
+        if self.uuid is not None:
+            entity['uuid'] = self.uuid
+        entity.update(self.entity_extra)
+        return entity
+
+
+class PortRange(NamedTuple):
+    start_port: int
+    end_port: int
+
+
+class IcmpCode(NamedTuple):
+    '''
+    An ICMP type and code, None matches any
+    '''
+    type: Optional[int] = None
+    code: Optional[int] = None
+
+
+class Service(NamedTuple):
+    '''
+    One entry of a service group, ports for TCP and UDP and icmp for ICMP, None when not in the JSON
+    '''
+    protocol: Optional[str]
+    ports: Optional[tuple] = None
+    icmp: Optional[tuple] = None
+    extra: tuple = ()
+
+    @classmethod
+    def from_v3(cls, data):
+        known = ['protocol']
+        ports = None
+        port_key = '{0}_port_range_list'.format(str(data.get('protocol', '')).lower())
+        if isinstance(data.get(port_key), list) and all(isinstance(item, dict) and set(item) == {'start_port', 'end_port'} for item in data[port_key]):
+            ports = tuple(PortRange(item['start_port'], item['end_port']) for item in data[port_key])
+            known.append(port_key)
+        icmp = None
+        if isinstance(data.get('icmp_type_code_list'), list) and all(isinstance(item, dict) and set(item) <= {'type', 'code'} and None not in item.values() for item in data['icmp_type_code_list']):
+            icmp = tuple(IcmpCode(item.get('type'), item.get('code')) for item in data['icmp_type_code_list'])
+            known.append('icmp_type_code_list')
+        return cls(data.get('protocol'), ports, icmp, extra_items(data, known))
+
+    def to_v3(self):
+        data = {}
+        if self.protocol is not None:
+            data['protocol'] = self.protocol
+        if self.ports is not None:
+            data['{0}_port_range_list'.format(self.protocol.lower())] = [{'start_port': port.start_port, 'end_port': port.end_port} for port in self.ports]
+        if self.icmp is not None:
+            data['icmp_type_code_list'] = [{key: value for key, value in (('type', code.type), ('code', code.code)) if value is not None} for code in self.icmp]
+        data.update(self.extra)
+        return data
+
+
+class ServiceGroup:
+    '''
+    One service_group, services is a tuple of Service, None when the group does not have the list
+    '''
+    __slots__ = ('uuid', 'name', 'description', 'system_defined', 'services', 'extra', 'entity_extra')
+
+    def __init__(self, uuid, name, description=None, system_defined=None, services=None, extra=(), entity_extra=()):
+        self.uuid = uuid
+        self.name = name
+        self.description = description
+        self.system_defined = system_defined
+        self.services = services
+        self.extra = extra
+        self.entity_extra = entity_extra
+
+    def __reduce__(self):
+        return (ServiceGroup, (self.uuid, self.name, self.description, self.system_defined, self.services, self.extra, self.entity_extra))
+
+    @classmethod
+    def from_v3(cls, entity):
+        group = entity.get('service_group', {})
+        services = None
+        known = ('name', 'description', 'is_system_defined')
+        if isinstance(group.get('service_list'), list):
+            services = tuple(Service.from_v3(service) for service in group['service_list'])
+            known += ('service_list',)
+        return cls(intern(entity.get('uuid')), group.get('name'), group.get('description'), group.get('is_system_defined'),
+                   services, extra_items(group, known), extra_items(entity, ('service_group', 'uuid')))
+
+    def to_v3(self):
+        group = {}
+        if self.name is not None:
+            group['name'] = self.name
+        if self.description is not None:
+            group['description'] = self.description
+        if self.system_defined is not None:
+            group['is_system_defined'] = self.system_defined
+        if self.services is not None:
+            group['service_list'] = [service.to_v3() for service in self.services]
+        group.update(self.extra)
+        entity = {'service_group': group}
+        if self.uuid is not None:
+            entity['uuid'] = self.uuid
+        entity.update(self.entity_extra)
+        return entity
+
+
+def read_address_groups(client, workers=4):
+    '''
+    Function that reads every address group, returns UUID -> AddressGroup
+    '''
+    return {group.uuid: group for group in map(AddressGroup.from_v3, client.list_entities('address_groups', 'address_group', workers=workers))}
+
+
+def read_service_groups(client, workers=4):
+    '''
+    Function that reads every service group, returns UUID -> ServiceGroup
+    '''
+    return {group.uuid: group for group in map(ServiceGroup.from_v3, client.list_entities('service_groups', 'service_group', workers=workers))}
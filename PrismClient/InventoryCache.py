@@ -0,0 +1,256 @@
+#!/user/bin/env python
+
+"""
+Local copy of Prism entities kept in a SQLite file between runs.
+
+Every script used to read the full list of VMs, subnets or policies on each run.
+The cache keeps the last copy of each entity keyed by Prism address, kind and UUID along with
+metadata.spec_version and metadata.last_update_time.  A sync only reads what changed since the last run:
+    1. The groups API returns the UUID and modified time of every entity, a small response with no specs.
+    2. Entities that are new or have a new modified time are read with a GET, in parallel.
+    3. Entities that are gone from Prism are removed from the cache.
+When the groups API is not available, or most of the entities changed, the normal list call is used
+and only the rows that changed are written.
+
+Usage:
+    cache = InventoryCache(client, file_path + '\\Inventory.db')
+    counts = cache.sync('vms', 'vm')
+    for vm in cache.entities('vm'):
+        print (vm['spec']['name'])
+    vm = cache.get('vm', vm_uuid)
+    for vm in cache.find('vm', name_prefix='CMA-'):
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PrismClient import PrismError
+
+#Entity type used by the groups API for each v3 kind
+GROUPS_ENTITY_TYPES = {
+    'vm': 'mh_vm',
+    'subnet': 'subnet',
+    'network_security_rule': 'network_security_rule',
+    'address_group': 'address_group',
+    'service_group': 'service_group',
+}
+
+#Groups attribute with the time the entity was last changed
+MODIFIED_ATTRIBUTE = '_modified_timestamp_usecs_'
+
+#When more than this part of the entities changed one list walk is cheaper than a GET for each
+FULL_SYNC_FRACTION = 0.25
+
+
+def entity_uuid(entity):
+    '''
+    Function that returns the UUID of an entity, address and service groups keep it at the top level
+    '''
+    return entity.get('metadata', {}).get('uuid') or entity.get('uuid')
+
+
+def entity_name(entity, kind):
+    '''
+    Function that returns the name of an entity from spec, status or the address / service group section
+    '''
+    for section in ('spec', kind, 'status'):
+        if isinstance(entity.get(section), dict) and 'name' in entity[section]:
+            return entity[section]['name']
+    return None
+
+
+class InventoryCache:
+    '''
+    SQLite copy of Prism entities that is brought up to date with a delta sync
+    '''
+    def __init__(self, client, file_name, workers=8):
+        self.client = client
+        self.prism = client.ip_address
+        self.workers = workers
+        self.db = sqlite3.connect(file_name)
+        self.db.execute('CREATE TABLE IF NOT EXISTS entities (prism TEXT, kind TEXT, uuid TEXT, name TEXT, '
+                        'spec_version INTEGER, last_update_time TEXT, modified TEXT, data TEXT, '
+                        'PRIMARY KEY (prism, kind, uuid))')
+        self.db.execute('CREATE INDEX IF NOT EXISTS entities_name ON entities (prism, kind, name)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS syncs (prism TEXT, kind TEXT, synced_at TEXT, PRIMARY KEY (prism, kind))')
+        self.db.commit()
+
+    def sync(self, call_type, kind):
+        '''
+        Function that brings the cache up to date for one kind, such as sync('vms', 'vm')
+        Returns a count of the entities added, changed, removed and unchanged.
+        '''
+        counts = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+        modified_times = self._modified_times(kind)
+        cached = {uuid: (modified, spec_version, last_update_time) for uuid, modified, spec_version, last_update_time in self.db.execute(
+            'SELECT uuid, modified, spec_version, last_update_time FROM entities WHERE prism=? AND kind=?', (self.prism, kind))}
+
+        if modified_times and any(modified_times.values()):
+            changed = [uuid for uuid, modified in modified_times.items() if modified is None or uuid not in cached or cached[uuid][0] != modified]
+            if len(changed) <= len(modified_times) * FULL_SYNC_FRACTION:
+                self._delta_sync(call_type, kind, cached, modified_times, changed, counts)
+                return counts
+
+        self._full_sync(call_type, kind, cached, modified_times or {}, counts)
+        return counts
+
+    def entities(self, kind):
+        '''
+        Function that returns every cached entity of a kind, one at a time
+        '''
+        for (data,) in self.db.execute('SELECT data FROM entities WHERE prism=? AND kind=? ORDER BY name', (self.prism, kind)):
+            yield json.loads(data)
+
+    def get(self, kind, uuid):
+        '''
+        Function that returns one cached entity or None
+        '''
+        row = self.db.execute('SELECT data FROM entities WHERE prism=? AND kind=? AND uuid=?', (self.prism, kind, uuid)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find(self, kind, name=None, name_prefix=None):
+        '''
+        Function that returns the cached entities with the name or name prefix
+        '''
+        query = 'SELECT data FROM entities WHERE prism=? AND kind=?'
+        params = [self.prism, kind]
+        if name is not None:
+            query += ' AND name=?'
+            params.append(name)
+        if name_prefix is not None:
+            query += ' AND substr(name, 1, ?)=?'
+            params.extend([len(name_prefix), name_prefix])
+        for (data,) in self.db.execute(query + ' ORDER BY name', params):
+            yield json.loads(data)
+
+    def count(self, kind):
+        '''
+        Function that returns the number of cached entities of a kind
+        '''
+        return self.db.execute('SELECT COUNT(*) FROM entities WHERE prism=? AND kind=?', (self.prism, kind)).fetchone()[0]
+
+    def last_sync(self, kind):
+        '''
+        Function that returns when the kind was last synced, None if it never was
+        '''
+        row = self.db.execute('SELECT synced_at FROM syncs WHERE prism=? AND kind=?', (self.prism, kind)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        '''
+        Function that closes the SQLite file
+        '''
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _modified_times(self, kind):
+        '''
+        Function that returns UUID -> modified time for every entity of the kind from the groups API
+        Returns None when the groups API can not be used for this kind.
+        '''
+        entity_type = GROUPS_ENTITY_TYPES.get(kind)
+        if entity_type is None:
+            return None
+        modified_times = {}
+        offset = 0
+        page_size = 500
+        while True:
+            payload = {
+                'entity_type': entity_type,
+                'group_member_attributes': [{'attribute': MODIFIED_ATTRIBUTE}],
+                'group_member_count': page_size,
+                'group_member_offset': offset,
+            }
+            try:
+                resp = self.client.post('groups', payload)
+            except Exception:
+                return None
+            if not resp.ok:
+                return None
+            body = json.loads(resp.content)
+            page_count = 0
+            for group in body.get('group_results', []):
+                for result in group.get('entity_results', []):
+                    page_count += 1
+                    modified = None
+                    for column in result.get('data', []):
+                        if column.get('name') == MODIFIED_ATTRIBUTE and column.get('values'):
+                            values = column['values'][0].get('values') or []
+                            modified = values[0] if values else None
+                    modified_times[result['entity_id']] = modified
+            offset += page_count
+            if page_count < page_size or offset >= body.get('filtered_entity_count', offset):
+                return modified_times
+
+    def _delta_sync(self, call_type, kind, cached, modified_times, changed, counts):
+        '''
+        Function that reads only the changed entities and removes the deleted ones
+        '''
+        rows = []
+        removed = [uuid for uuid in cached if uuid not in modified_times]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for uuid, resp in zip(changed, pool.map(lambda uuid: self.client.get('{0}/{1}'.format(call_type, uuid)), changed)):
+                if resp.status_code == 404:
+                    #Deleted after the groups call
+                    removed.append(uuid)
+                    continue
+                if not resp.ok:
+                    raise PrismError("Read of {0} {1} failed".format(kind, uuid), resp)
+                entity = json.loads(resp.content)
+                counts['changed' if uuid in cached else 'added'] += 1
+                rows.append(self._row(kind, entity, modified_times.get(uuid)))
+        counts['removed'] = len([uuid for uuid in removed if uuid in cached])
+        counts['unchanged'] = len(modified_times) - len(changed)
+        self._save(kind, rows, removed)
+
+    def _full_sync(self, call_type, kind, cached, modified_times, counts):
+        '''
+        Function that walks the full list and writes only the entities whose version changed
+        '''
+        rows = []
+        seen = set()
+        for entity in self.client.list_entities(call_type, kind):
+            uuid = entity_uuid(entity)
+            seen.add(uuid)
+            metadata = entity.get('metadata', {})
+            modified = modified_times.get(uuid)
+            if uuid in cached:
+                #Address and service groups have no spec_version, they are always written
+                old_modified, spec_version, last_update_time = cached[uuid]
+                same_version = (spec_version, last_update_time) == (metadata.get('spec_version'), metadata.get('last_update_time'))
+                #Without the groups API there is no modified time to compare
+                if metadata.get('spec_version') is not None and same_version and (not modified_times or old_modified == modified):
+                    counts['unchanged'] += 1
+                    continue
+                counts['changed'] += 1
+            else:
+                counts['added'] += 1
+            rows.append(self._row(kind, entity, modified))
+        removed = [uuid for uuid in cached if uuid not in seen]
+        counts['removed'] = len(removed)
+        self._save(kind, rows, removed)
+
+    def _row(self, kind, entity, modified):
+        '''
+        Function that returns the table row for an entity
+        '''
+        metadata = entity.get('metadata', {})
+        return (self.prism, kind, entity_uuid(entity), entity_name(entity, kind), metadata.get('spec_version'),
+                metadata.get('last_update_time'), modified, json.dumps(entity))
+
+    def _save(self, kind, rows, removed):
+        '''
+        Function that writes the changed rows and removes the deleted ones in one transaction
+        '''
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO entities VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self.db.executemany('DELETE FROM entities WHERE prism=? AND kind=? AND uuid=?', [(self.prism, kind, uuid) for uuid in removed])
+            self.db.execute('INSERT OR REPLACE INTO syncs VALUES (?, ?, ?)', (self.prism, kind, time.strftime('%Y-%m-%d %H:%M:%S')))
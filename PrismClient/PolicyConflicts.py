@@ -0,0 +1,320 @@
+#!/user/bin/env python
+
+"""
+Finds overlapping targets, duplicate and shadowed entries and base rule collisions across every security policy.
+
+BasePolicyLoader only checks that a base rule category is not the target of the one policy it is
+merging.  Comparing every policy with every other policy is over a million pairs on a large system.
+PolicyConflicts builds the indexes once and finds everything in one pass:
+    - policies with the same target are found by hashing the target, each target is then checked once
+    - each target starts from its most selective category, such as AppType rather than Environment,
+      and only meets the targets that have one of its values there
+    - targets by their set of categories, two sets where neither holds the other are reported once as a pair
+    - each allow list by peer category and value and by subnet prefix, an entry only meets the entries that could cover it
+    - VMs are matched to policies through the target index, for the VMs in more than one policy
+The findings are:
+    SAME_TARGET         - policies with the same target
+    OVERLAPPING_TARGET  - two policies whose targets can match the same VM, one with the categories of the other or more
+    MIXED_TARGETS       - two sets of target categories where neither holds the other, such as AppType and Environment,
+                          a VM with both is in a policy of each, the pairs are not listed one by one
+    SHARED_VMS          - VMs that are in more than one policy, from the VM categories
+    DUPLICATE_ENTRY     - an allow list entry that is in the list more than once
+    SHADOWED_ENTRY      - an entry that allows nothing an earlier or broader entry does not
+    BASE_RULE_TARGET    - a base rule category that is the target of a policy, BasePolicyLoader leaves it out of that policy
+
+Usage:
+    conflicts = PolicyConflicts(evaluator, base_data)
+    for finding in conflicts.find():
+        print (finding.type, finding.policy, finding.other, finding.detail)
+
+The policies, groups and VMs come from a FlowEvaluator, so a snapshot file can be used offline.
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+from typing import NamedTuple
+from FlowEvaluator import compile_entry, filter_params
+
+DIRECTIONS = ('inbound', 'outbound')
+#Bits in an IPv4 and an IPv6 address
+ADDRESS_BITS = {4: 32, 6: 128}
+
+
+class Finding(NamedTuple):
+    '''
+    One conflict, other is the second policy or entry and direction is set for allow list findings
+    '''
+    type: str
+    policy: str
+    other: str = ''
+    direction: str = ''
+    detail: str = ''
+
+
+def describe(peer):
+    '''
+    Function that returns a short description of an allow list entry for the report
+    '''
+    if peer.type == 'FILTER' and peer.filter is not None:
+        text = ' '.join('{0}:{1}'.format(category, ','.join(values)) for category, values in peer.filter.params or ())
+    elif peer.type == 'IP_SUBNET' and peer.ip_subnet is not None:
+        text = '{0}/{1}'.format(peer.ip_subnet.ip, peer.ip_subnet.prefix_length)
+    elif peer.type == 'IP_SUBNET':
+        text = 'address groups ' + ','.join(address.name or address.uuid for address in peer.addresses or ())
+    else:
+        text = str(peer.type)
+    if peer.services is not None:
+        text += ' services ' + ','.join(service.name or service.uuid for service in peer.services)
+    return text
+
+
+def subnet_key(version, first, last):
+    '''
+    Function that returns (version, prefix length, network bits) of a subnet range from ip_range
+    '''
+    bits = ADDRESS_BITS[version]
+    length = bits - (last - first + 1).bit_length() + 1
+    return (version, length, first >> (bits - length))
+
+
+class PolicyConflicts:
+    '''
+    Indexes every policy once and reports the conflicts between and inside them
+    '''
+    def __init__(self, evaluator, base_data=None):
+        self.evaluator = evaluator
+        self.base_data = base_data
+        #Peer.key() -> compiled entry, most policies share the same entries
+        self.compiled = {}
+        #(name, enforced, target params) of every app_rule with a target
+        self.targets = []
+        #(category, value) -> index in targets
+        self.by_target = {}
+        for rule in evaluator.rules:
+            if rule.app_rule is None:
+                continue
+            params = filter_params(rule.app_rule.target.filter) if rule.app_rule.target is not None else {}
+            if not params:
+                continue
+            index = len(self.targets)
+            self.targets.append((rule.name, rule.app_rule.action == 'APPLY', params))
+            for category, values in params.items():
+                for value in values:
+                    self.by_target.setdefault((category, value), []).append(index)
+        #(target params, indexes in targets) of each different target, the policies with the same target are one
+        self.unique = []
+        number_of = {}
+        for index, (name, enforced, params) in enumerate(self.targets):
+            key = tuple(sorted(params.items()))
+            if key not in number_of:
+                number_of[key] = len(self.unique)
+                self.unique.append((params, []))
+            self.unique[number_of[key]][1].append(index)
+        #(category, value) -> index in unique
+        self.by_value = {}
+        for number, (params, indexes) in enumerate(self.unique):
+            for category, values in params.items():
+                for value in values:
+                    self.by_value.setdefault((category, value), []).append(number)
+
+    def find(self):
+        '''
+        Function that returns every finding, grouped by type
+        '''
+        findings = []
+        findings.extend(self.target_overlaps())
+        findings.extend(self.shared_vms())
+        findings.extend(self.entry_conflicts())
+        findings.extend(self.base_rule_targets())
+        return findings
+
+    def target_overlaps(self):
+        '''
+        Function that finds the policies whose targets are the same or can match the same VM
+        Each target only meets the targets that have one of its values in its most selective category.
+        '''
+        findings = []
+        for params, indexes in self.unique:
+            if len(indexes) > 1:
+                findings.append(Finding('SAME_TARGET', self.targets[indexes[0]][0], self._names(indexes[1:]),
+                                        detail="All target {0}{1}".format(self._target_text(params), self._modes(indexes))))
+
+        reported = set()
+        for number, (params, indexes) in enumerate(self.unique):
+            #A target that overlaps this one and has all of its categories or more has one of its values in each
+            #of them, so the category with the fewest targets for its values gives every such target
+            category = min(params, key=lambda category: sum(len(self.by_value[(category, value)]) for value in params[category]))
+            candidates = set()
+            for value in params[category]:
+                candidates.update(self.by_value[(category, value)])
+            candidates.discard(number)
+            for other in sorted(candidates):
+                pair = (min(number, other), max(number, other))
+                if pair in reported:
+                    continue
+                other_params, other_indexes = self.unique[other]
+                #Targets with different sets of categories where neither holds the other are in MIXED_TARGETS
+                if not (params.keys() <= other_params.keys() or other_params.keys() <= params.keys()):
+                    continue
+                #A category in both targets needs a value in common, a category in only one does not limit the other
+                if any(params[common].isdisjoint(other_params[common]) for common in params.keys() & other_params.keys()):
+                    continue
+                reported.add(pair)
+                first, second = self.unique[pair[0]], self.unique[pair[1]]
+                findings.append(Finding('OVERLAPPING_TARGET', self._names(first[1]), self._names(second[1]),
+                                        detail="{0} and {1} can match the same VMs{2}".format(
+                                            self._target_text(first[0]), self._target_text(second[0]), self._modes(first[1] + second[1]))))
+        findings.extend(self.mixed_targets())
+        return findings
+
+    def mixed_targets(self):
+        '''
+        Function that finds the sets of target categories where neither holds the other, one finding for each two sets
+        A VM with the categories of both sets can be in a policy of each, listing every pair would be most of the policies.
+        '''
+        #Set of target categories -> indexes in targets
+        by_categories = {}
+        for params, indexes in self.unique:
+            by_categories.setdefault(frozenset(params), []).extend(indexes)
+        category_sets = sorted(by_categories, key=sorted)
+        findings = []
+        for position, first in enumerate(category_sets):
+            for second in category_sets[position + 1:]:
+                if first <= second or second <= first:
+                    continue
+                first_indexes, second_indexes = by_categories[first], by_categories[second]
+                common = first & second
+                when = " when they share a value in {0}".format(', '.join(sorted(common))) if common else ''
+                findings.append(Finding('MIXED_TARGETS', self.targets[first_indexes[0]][0], self.targets[second_indexes[0]][0],
+                                        detail="{0} policies target {1} and {2} target {3}, a VM with {4} is in a policy of each{5}, see SHARED_VMS".format(
+                                            len(first_indexes), ', '.join(sorted(first)), len(second_indexes), ', '.join(sorted(second)),
+                                            ', '.join(sorted(first | second)), when)))
+        return findings
+
+    def shared_vms(self):
+        '''
+        Function that finds the VMs in more than one policy, one finding for each set of policies
+        '''
+        groups = {}
+        for endpoint in self.evaluator.endpoints:
+            names = tuple(sorted(part.name for part in self.evaluator.policies(endpoint) if not part.quarantine))
+            if len(names) > 1:
+                groups.setdefault(names, []).append(endpoint.name)
+        findings = []
+        for names, vms in sorted(groups.items()):
+            shown = ', '.join(sorted(vms)[:5]) + (' ...' if len(vms) > 5 else '')
+            findings.append(Finding('SHARED_VMS', names[0], ', '.join(names[1:]), detail="{0} VMs in all of them: {1}".format(len(vms), shown)))
+        return findings
+
+    def entry_conflicts(self):
+        '''
+        Function that finds duplicate and shadowed entries in the allow lists of every policy
+        '''
+        findings = []
+        for rule in self.evaluator.rules:
+            for app_rule in (rule.app_rule, rule.quarantine_rule):
+                if app_rule is None:
+                    continue
+                for direction in DIRECTIONS:
+                    findings.extend(self._list_conflicts(rule.name, direction, app_rule.allow_list(direction)))
+        return findings
+
+    def base_rule_targets(self):
+        '''
+        Function that finds the category base rules whose category and value is in the target of a policy
+        '''
+        findings = []
+        if not self.base_data:
+            return findings
+        for rules in self.base_data.get('rules', []):
+            for direction in DIRECTIONS:
+                for base_rule in rules.get(direction + '_rules', []):
+                    if base_rule.get('type') != 'category':
+                        continue
+                    key = (base_rule['lookup_category'], base_rule['lookup_value'])
+                    for index in self.by_target.get(key, ()):
+                        findings.append(Finding('BASE_RULE_TARGET', self.targets[index][0], rules.get('name', ''), direction,
+                                                "Base rule {0}:{1} is the target of the policy and is left out of it".format(*key)))
+        return findings
+
+    def _list_conflicts(self, name, direction, peers):
+        '''
+        Function that checks one allow list, each entry is only compared with the entries that could cover it
+        '''
+        findings = []
+        entries = []
+        #Peer.key() -> position of its first entry
+        first_seen = {}
+        #Positions of the allow all entries, (category, value) -> positions of filter entries,
+        #(version, prefix length, network bits) of each subnet -> positions of subnet entries
+        any_entries = []
+        by_category = {}
+        subnets = {}
+        #(version, prefix length) of every subnet in the list
+        lengths = set()
+        for position, peer in enumerate(peers):
+            key = peer.key()
+            if key in first_seen:
+                findings.append(Finding('DUPLICATE_ENTRY', name, "entry {0}".format(first_seen[key] + 1), direction,
+                                        "Entry {0} is the same as entry {1}: {2}".format(position + 1, first_seen[key] + 1, describe(peer))))
+                entries.append(None)
+                continue
+            first_seen[key] = position
+            if key not in self.compiled:
+                self.compiled[key] = compile_entry(peer, self.evaluator.address_groups, self.evaluator.service_groups, [])
+            entry = self.compiled[key]
+            entries.append(entry)
+            if entry is None:
+                continue
+            if entry.kind == 'ALL':
+                any_entries.append(position)
+            elif entry.kind == 'FILTER':
+                for category, values in entry.params.items():
+                    for value in values:
+                        by_category.setdefault((category, value), []).append(position)
+            else:
+                for version, first, last in entry.ranges:
+                    key = subnet_key(version, first, last)
+                    subnets.setdefault(key, []).append(position)
+                    lengths.add(key[:2])
+
+        for position, entry in enumerate(entries):
+            if entry is None:
+                continue
+            if entry.kind == 'FILTER':
+                candidates = set(any_entries)
+                for category, values in entry.params.items():
+                    for value in values:
+                        candidates.update(by_category.get((category, value), ()))
+            elif entry.kind == 'IP_SUBNET':
+                #An entry that covers this one has a subnet holding its first subnet, that is the same network
+                #or a shorter prefix of it, so only those buckets are looked at instead of every subnet entry
+                candidates = set(any_entries)
+                version, first, last = entry.ranges[0]
+                own_length = subnet_key(version, first, last)[1]
+                for mine, length in lengths:
+                    if mine == version and length <= own_length:
+                        candidates.update(subnets.get((version, length, first >> (ADDRESS_BITS[version] - length)), ()))
+            else:
+                candidates = set(any_entries)
+            for other in sorted(candidates):
+                if other == position or not entries[other].covers(entry):
+                    continue
+                #Two entries that cover each other are reported once, the later one is the extra
+                if other > position and entry.covers(entries[other]):
+                    continue
+                findings.append(Finding('SHADOWED_ENTRY', name, "entry {0}".format(other + 1), direction,
+                                        "Entry {0} ({1}) is already allowed by entry {2} ({3})".format(
+                                            position + 1, describe(peers[position]), other + 1, describe(peers[other]))))
+                break
+        return findings
+
+    def _names(self, indexes):
+        return ', '.join(self.targets[index][0] for index in indexes)
+
+    def _modes(self, indexes):
+        enforced = set(self.targets[index][1] for index in indexes)
+        return ', one is in monitor mode' if len(enforced) > 1 else ''
+
+    def _target_text(self, params):
+        return ' '.join('{0}:{1}'.format(category, ','.join(sorted(values))) for category, values in sorted(params.items()))
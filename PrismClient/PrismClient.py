@@ -0,0 +1,271 @@
+#!/user/bin/env python
+
+"""
+Shared client for the Prism Central / Prism Element v3 REST API.
+
+Every script used to build a new HTTPBasicAuth and call requests.post/put directly,
+which opens a new TCP and TLS connection to port 9440 for every call.
+This client keeps one requests Session with a keep-alive connection pool,
+so the connection is opened once and reused for all the calls a script makes.
+The session holds the credentials and JSON headers, the scripts only pass the path and payload.
+
+Usage:
+    client = PrismClient(PC_address, PC_user, PC_pass)
+    resp = client.list('vms', {'kind':'vm','length':500,'offset':0})
+    resp = client.put('vms/' + vm_uuid, vm)
+
+The calls return the requests response object, check resp.ok before using resp.content.
+
+The v4 APIs are under /api with the namespace and version in the path, api_get and api_post take that path.
+    resp = client.api_get('vmm/v4.0/ahv/config/vms/' + vm_uuid)
+A full address such as http://127.0.0.1:9440 is used as given, so a script can be pointed at a local mock.
+
+list_pages walks every page of a list call.  The first page gives metadata.total_matches,
+the rest of the offsets are then known and are fetched in parallel by a small pool of threads.
+Pages are still returned in order.
+    for page in client.list_pages('vms', 'vm'):
+        for vm in page['entities']:
+
+list_entities does the same walk but hands back one entity at a time.
+Each page is parsed once and let go of as soon as its entities have been handed out,
+so memory stays flat no matter how many VMs or policies the system has.
+    for vm in client.list_entities('vms', 'vm'):
+
+find_entities looks up entities by name or other fields.  Lookups that the API can filter on
+are sent as the v3 list filter so only matching entities come back, everything else is checked here.
+    for vm in client.find_entities('vms', 'vm', name='CMA-Win2019'):
+    for vm in client.find_entities('vms', 'vm', name_prefix='CMA-Win2019_20261018'):
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+import json
+import re
+import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from requests.packages.urllib3.exceptions import InsecureRequestWarning
+from urllib3.util.retry import Retry
+requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+
+
+#Fields the v3 list filter can match on, by entity kind.  Anything else is matched after the list comes back.
+FILTER_ATTRIBUTES = {
+    'vm': {'name': 'vm_name'},
+    'subnet': {'name': 'name', 'vlan_id': 'vlan_id'},
+    'network_security_rule': {'name': 'name'},
+    'image': {'name': 'name'},
+    'app': {'name': 'name'},
+}
+
+#Where each field is found in a v3 entity, used to check the entities that come back
+ENTITY_FIELDS = {
+    'name': lambda entity: entity.get('spec', entity.get('status', {})).get('name'),
+    'vlan_id': lambda entity: entity['spec']['resources'].get('vlan_id'),
+    'power_state': lambda entity: entity['spec']['resources'].get('power_state'),
+    'cluster': lambda entity: entity['spec'].get('cluster_reference', {}).get('name'),
+    'uuid': lambda entity: entity['metadata'].get('uuid'),
+}
+
+#The filter value is a regular expression and ; , separate filter terms, values outside this set are not sent
+FILTER_SAFE_VALUE = re.compile(r'^[A-Za-z0-9_.\- ]+$')
+
+
+class PrismError(Exception):
+    '''
+    Raised when a call made for the scripts does not return OK, the response is kept for logging
+    '''
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+
+def make_filter(kind, name=None, name_prefix=None, **fields):
+    '''
+    Function that turns name and field lookups into a v3 list filter and a match function
+    The filter only narrows what comes back, the match function gives the exact answer.
+    Returns the filter string (empty when nothing can be sent) and the match function.
+    '''
+    attributes = FILTER_ATTRIBUTES.get(kind, {})
+    filter_terms = []
+
+    checks = []
+    if name is not None:
+        checks.append(lambda entity: ENTITY_FIELDS['name'](entity) == name)
+        if 'name' in attributes and FILTER_SAFE_VALUE.match(name):
+            filter_terms.append("{0}=={1}".format(attributes['name'], name))
+    if name_prefix is not None:
+        checks.append(lambda entity: (ENTITY_FIELDS['name'](entity) or '').startswith(name_prefix))
+        if 'name' in attributes and FILTER_SAFE_VALUE.match(name_prefix):
+            filter_terms.append("{0}=={1}.*".format(attributes['name'], name_prefix))
+    for field, value in fields.items():
+        if field not in ENTITY_FIELDS:
+            raise ValueError("Unknown lookup field: {0}".format(field))
+        checks.append(lambda entity, field=field, value=value: ENTITY_FIELDS[field](entity) == value)
+        if field in attributes and FILTER_SAFE_VALUE.match(str(value)):
+            filter_terms.append("{0}=={1}".format(attributes[field], value))
+
+    def matches(entity):
+        return all(check(entity) for check in checks)
+
+    #Terms separated by ; must all match
+    return ';'.join(filter_terms), matches
+
+
+class PrismClient:
+    '''
+    Keep-alive connection to the Prism v3 API shared by every call in a script
+    '''
+    def __init__(self, ip_address, user, passwd, port=9440, pool_size=20, timeout=120, verify=False):
+        self.ip_address = ip_address
+        self.port = port
+        self.timeout = timeout
+        if '://' in ip_address:
+            root_url = ip_address.rstrip('/')
+        else:
+            root_url = "https://{0}:{1}".format(ip_address, port)
+        self.base_url = root_url + "/api/nutanix/v3"
+        #The v4 APIs have the namespace and version in the path, such as vmm/v4.0/ahv/config/vms
+        self.api_url = root_url + "/api"
+
+        self.session = requests.Session()
+        self.session.auth = HTTPBasicAuth(user, passwd)
+        self.session.headers.update({"content-type": "application/json", "accept": "application/json"})
+        #Prism uses a self signed certificate on most clusters
+        self.session.verify = verify
+
+        #Only retry when the connection could not be made, a request that reached Prism is never sent twice
+        retries = Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.5)
+        #pool_size is the number of connections kept open, raise it when calls are made from many threads
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url(self, path):
+        '''
+        Function that returns the full URL for an API path such as vms/list
+        '''
+        return "{0}/{1}".format(self.base_url, path.strip('/'))
+
+    def post(self, path, data_list):
+        '''
+        Function that makes a POST call and returns the response
+        '''
+        return self.session.post(url=self.url(path), data=json.dumps(data_list), timeout=self.timeout)
+
+    def list(self, call_type, data_list):
+        '''
+        Function that makes a list call for the entity type, such as vms or subnets
+        '''
+        return self.post(call_type + '/list', data_list)
+
+    def list_page(self, call_type, kind, offset, length, data_list=None):
+        '''
+        Function that returns one page of a list call as parsed JSON
+        '''
+        payload = dict(data_list or {})
+        payload.update({'kind': kind, 'length': length, 'offset': offset})
+        resp = self.list(call_type, payload)
+        if not resp.ok:
+            raise PrismError("List request for {0} failed at offset {1}".format(call_type, offset), resp)
+        return json.loads(resp.content)
+
+    def list_pages(self, call_type, kind, data_list=None, length=500, workers=4):
+        '''
+        Function that returns every page of a list call, in order
+        The first page is read on its own to get total_matches, then the remaining offsets
+        are fetched by up to "workers" threads.  Only "workers" pages are held ahead of the caller.
+        '''
+        first_page = self.list_page(call_type, kind, 0, length, data_list)
+        total = first_page['metadata'].get('total_matches', 0)
+        #The system will not return more than 500 per page even if a larger length is asked for
+        step = len(first_page.get('entities', []))
+        if step == 0 or step >= total:
+            yield first_page
+            return
+
+        offsets = iter(range(step, total, step))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for offset in offsets:
+                pending.append(pool.submit(self.list_page, call_type, kind, offset, step, data_list))
+                if len(pending) >= workers:
+                    break
+            #The next pages are already on the way while the caller works on the first one
+            yield first_page
+            del first_page
+            while pending:
+                page = pending.popleft().result()
+                #Keep the pool busy, request the next offset before handing this page back
+                offset = next(offsets, None)
+                if offset is not None:
+                    pending.append(pool.submit(self.list_page, call_type, kind, offset, step, data_list))
+                yield page
+
+    def list_entities(self, call_type, kind, data_list=None, length=500, workers=4):
+        '''
+        Function that returns the entities of a list call one at a time, in order
+        Each page is parsed once, the page is dropped after its last entity is handed out.
+        '''
+        for page in self.list_pages(call_type, kind, data_list, length, workers):
+            entities = page.pop('entities', [])
+            del page
+            #Hand back the entities from the end of a reversed list so each one is let go once used
+            entities.reverse()
+            while entities:
+                yield entities.pop()
+
+    def find_entities(self, call_type, kind, name=None, name_prefix=None, length=500, workers=4, **fields):
+        '''
+        Function that returns only the entities that match the lookup
+        The lookup is sent as the list filter when it can be, so a single VM is one small request.
+        '''
+        filter_string, matches = make_filter(kind, name, name_prefix, **fields)
+        data_list = {'filter': filter_string} if filter_string else None
+        for entity in self.list_entities(call_type, kind, data_list, length, workers):
+            if matches(entity):
+                yield entity
+
+    def get(self, path):
+        '''
+        Function that makes a GET call and returns the response
+        '''
+        return self.session.get(url=self.url(path), timeout=self.timeout)
+
+    def put(self, path, data_list):
+        '''
+        Function that makes a PUT call and returns the response
+        '''
+        return self.session.put(url=self.url(path), data=json.dumps(data_list), timeout=self.timeout)
+
+    def api_get(self, path, params=None, headers=None):
+        '''
+        Function that makes a GET call to a v4 path and returns the response, the ETag is in resp.headers
+        '''
+        return self.session.get(url="{0}/{1}".format(self.api_url, path.strip('/')), params=params, headers=headers, timeout=self.timeout)
+
+    def api_post(self, path, data_list, headers=None):
+        '''
+        Function that makes a POST call to a v4 path and returns the response
+        '''
+        return self.session.post(url="{0}/{1}".format(self.api_url, path.strip('/')), data=json.dumps(data_list), headers=headers, timeout=self.timeout)
+
+    def delete(self, path):
+        '''
+        Function that makes a DELETE call and returns the response
+        '''
+        return self.session.delete(url=self.url(path), timeout=self.timeout)
+
+    def close(self):
+        '''
+        Function that closes the pooled connections
+        '''
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,157 @@
+#!/user/bin/env python
+
+"""
+Looks up subnets by cluster and VLAN ID, by cluster and name, or by UUID.
+
+The scripts used to POST subnets/list with an empty payload, which only returns the first page,
+then loop over it for the cluster and VLAN.  On a Prism Central with many clusters the VLAN could be
+on a later page and the script would say it was not found.
+The resolver reads every page of subnets once and indexes them.  The index is saved to a file
+and used again until it is older than the TTL, so repeated VLAN changes do not list the subnets each time.
+
+Usage:
+    subnets = SubnetResolver(client, file_path + '\\Subnets.json')
+    subnet = subnets.by_vlan('cable', 568)
+    subnet = subnets.by_name('cable', 'VLAN568')
+    subnet = subnets.by_uuid(subnet_uuid)
+    nic['subnet_reference'] = subnets.reference(subnet)
+
+Cluster names are not case sensitive.  A lookup that finds nothing returns None, when the index came
+from the file the subnets are read again first in case the subnet was added after the file was saved.
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+import json
+import os
+import time
+
+
+def subnet_record(subnet):
+    '''
+    Function that keeps the parts of a v3 subnet the lookups need
+    '''
+    spec = subnet.get('spec', {})
+    cluster = spec.get('cluster_reference', {})
+    return {
+        'uuid': subnet['metadata']['uuid'],
+        'name': spec.get('name', subnet.get('status', {}).get('name')),
+        'vlan_id': spec.get('resources', {}).get('vlan_id'),
+        'subnet_type': spec.get('resources', {}).get('subnet_type'),
+        'cluster_name': cluster.get('name', ''),
+        'cluster_uuid': cluster.get('uuid', ''),
+    }
+
+
+class SubnetResolver:
+    '''
+    Index of every subnet by (cluster, vlan_id), (cluster, name) and UUID
+    '''
+    def __init__(self, client, file_name=None, ttl=3600):
+        self.client = client
+        self.file_name = file_name
+        self.ttl = ttl
+        self.records = []
+        self.loaded_at = 0
+        self.by_cluster_vlan = {}
+        self.by_cluster_name = {}
+        self.uuids = {}
+        self.from_file = False
+        if not self._load_file():
+            self.refresh()
+
+    def refresh(self):
+        '''
+        Function that reads every page of subnets from Prism and rebuilds the index
+        '''
+        self.records = [subnet_record(subnet) for subnet in self.client.list_entities('subnets', 'subnet')]
+        self.loaded_at = time.time()
+        self.from_file = False
+        self._index()
+        self._save_file()
+
+    def by_vlan(self, cluster, vlan_id):
+        '''
+        Function that returns the subnet with the VLAN ID on the cluster, cluster is the name or UUID
+        '''
+        return self._find('by_cluster_vlan', (cluster.lower(), int(vlan_id)))
+
+    def by_name(self, cluster, name):
+        '''
+        Function that returns the subnet with the name on the cluster, cluster is the name or UUID
+        '''
+        return self._find('by_cluster_name', (cluster.lower(), name))
+
+    def by_uuid(self, uuid):
+        '''
+        Function that returns the subnet with the UUID
+        '''
+        return self._find('uuids', uuid)
+
+    def clusters(self):
+        '''
+        Function that returns the names of the clusters that have subnets
+        '''
+        return sorted({record['cluster_name'] for record in self.records})
+
+    def reference(self, record):
+        '''
+        Function that returns the subnet_reference for a NIC
+        '''
+        return {'kind': 'subnet', 'name': record['name'], 'uuid': record['uuid']}
+
+    def _find(self, table, key):
+        '''
+        Function that looks up a key in one of the tables, a saved index that misses is read again from Prism once
+        '''
+        record = getattr(self, table).get(key)
+        if record is None and self.from_file:
+            #The subnet may be newer than the saved index
+            self.refresh()
+            record = getattr(self, table).get(key)
+        return record
+
+    def _index(self):
+        '''
+        Function that builds the lookup tables from the records
+        '''
+        self.by_cluster_vlan = {}
+        self.by_cluster_name = {}
+        self.uuids = {}
+        for record in self.records:
+            self.uuids[record['uuid']] = record
+            for cluster in (record['cluster_name'].lower(), record['cluster_uuid'].lower()):
+                if not cluster:
+                    continue
+                #The first subnet listed is kept when a VLAN is defined twice on a cluster
+                if record['vlan_id'] is not None:
+                    self.by_cluster_vlan.setdefault((cluster, record['vlan_id']), record)
+                self.by_cluster_name.setdefault((cluster, record['name']), record)
+
+    def _load_file(self):
+        '''
+        Function that loads the saved index when it is for this Prism and not older than the TTL
+        '''
+        if not self.file_name or not os.path.exists(self.file_name):
+            return False
+        try:
+            with open(self.file_name) as infile:
+                saved = json.load(infile)
+        except (OSError, ValueError):
+            return False
+        if saved.get('prism') != self.client.ip_address or time.time() - saved.get('saved_at', 0) > self.ttl:
+            return False
+        self.records = saved['subnets']
+        self.loaded_at = saved['saved_at']
+        self.from_file = True
+        self._index()
+        return True
+
+    def _save_file(self):
+        '''
+        Function that saves the index for the next run
+        '''
+        if not self.file_name:
+            return
+        with open(self.file_name, 'w') as outfile:
+            json.dump({'prism': self.client.ip_address, 'saved_at': self.loaded_at, 'subnets': self.records}, outfile)
@@ -0,0 +1,186 @@
+#!/user/bin/env python
+
+"""
+Tracks many Prism tasks at once instead of waiting on each one in turn.
+
+The scripts used to sleep 5 seconds and then block until each task finished,
+so N updates took at least N x 5 seconds even when each task was done in under a second.
+The tracker takes task UUIDs as the updates are submitted and checks all of them together
+from one background thread.  Tasks are read in batches through tasks/list, with a GET per
+task when the system does not filter tasks/list by UUID.
+The first check is after half a second, the wait grows while nothing finishes and goes
+back to half a second as soon as something does.
+
+Usage:
+    tracker = TaskTracker(client, on_complete=task_done)
+    future = tracker.add(task_uuid)
+    ...
+    tracker.wait()
+
+on_complete is called with the task UUID and the task JSON when a task finishes.
+The future returned by add() gets the same task JSON as its result.
+Tasks that do not finish within the timeout are returned with a status of TIMED_OUT.
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+#Task states that mean the task is done, QUEUED and RUNNING are still in progress
+FINISHED_STATES = ('SUCCEEDED', 'FAILED', 'ABORTED')
+
+
+class TaskTracker:
+    '''
+    Polls a set of Prism tasks together and reports each one as it finishes
+    '''
+    def __init__(self, client, on_complete=None, first_wait=0.5, max_wait=5, backoff=1.5, timeout=3600, batch_size=100, workers=8):
+        self.client = client
+        self.on_complete = on_complete
+        self.first_wait = first_wait
+        self.max_wait = max_wait
+        self.backoff = backoff
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.workers = workers
+
+        #task_uuid -> [future, deadline, last task JSON seen]
+        self.pending = {}
+        self.results = {}
+        self.wait_time = first_wait
+        self.use_task_list = True
+        self.last_error = None
+        self.lock = threading.Condition()
+        self.thread = None
+
+    def add(self, task_uuid):
+        '''
+        Function that starts tracking a task and returns a future for its result
+        '''
+        future = Future()
+        with self.lock:
+            self.pending[task_uuid] = [future, time.monotonic() + self.timeout, {}]
+            #New work, check again soon
+            self.wait_time = self.first_wait
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="TaskTracker", daemon=True)
+                self.thread.start()
+            self.lock.notify_all()
+        return future
+
+    def wait(self):
+        '''
+        Function that blocks until every task added so far has finished and its callbacks have run
+        Returns a dictionary of task UUID to the final task JSON
+        '''
+        with self.lock:
+            while self.pending:
+                self.lock.wait()
+            return dict(self.results)
+
+    def summary(self):
+        '''
+        Function that returns a count of finished tasks by status
+        '''
+        counts = {}
+        with self.lock:
+            for task in self.results.values():
+                counts[task.get('status')] = counts.get(task.get('status'), 0) + 1
+        return counts
+
+    def _run(self):
+        '''
+        Function for the background thread, checks all pending tasks every wait_time
+        '''
+        while True:
+            with self.lock:
+                while not self.pending:
+                    self.lock.wait()
+                wait_time = self.wait_time
+                task_uuids = list(self.pending)
+            time.sleep(wait_time)
+
+            try:
+                tasks = self._poll(task_uuids)
+                self.last_error = None
+            except Exception as ex:
+                #Keep the tasks pending and try again, they still time out if Prism does not come back
+                self.last_error = ex
+                tasks = {}
+
+            finished = []
+            now = time.monotonic()
+            with self.lock:
+                for task_uuid in task_uuids:
+                    entry = self.pending.get(task_uuid)
+                    if entry is None:
+                        continue
+                    task = tasks.get(task_uuid)
+                    if task:
+                        entry[2] = task
+                    if task and task.get('status') in FINISHED_STATES:
+                        finished.append((task_uuid, entry[0], task))
+                    elif now > entry[1]:
+                        timed_out = dict(entry[2])
+                        timed_out['uuid'] = task_uuid
+                        timed_out['status'] = 'TIMED_OUT'
+                        finished.append((task_uuid, entry[0], timed_out))
+                for task_uuid, future, task in finished:
+                    self.results[task_uuid] = task
+                #Back off while nothing is finishing, go back to quick checks once something does
+                if finished:
+                    self.wait_time = self.first_wait
+                else:
+                    self.wait_time = min(self.wait_time * self.backoff, self.max_wait)
+
+            #Report outside the lock so a callback can add more tasks
+            for task_uuid, future, task in finished:
+                if self.on_complete:
+                    try:
+                        self.on_complete(task_uuid, task)
+                    except Exception as ex:
+                        self.last_error = ex
+                future.set_result(task)
+
+            #A task stays pending until its callbacks are done, so wait() does not return while they still run
+            with self.lock:
+                for task_uuid, future, task in finished:
+                    del self.pending[task_uuid]
+                self.lock.notify_all()
+
+    def _poll(self, task_uuids):
+        '''
+        Function that reads the current state of the tasks, returns task UUID -> task JSON
+        '''
+        tasks = {}
+        if self.use_task_list:
+            for i in range(0, len(task_uuids), self.batch_size):
+                chunk = task_uuids[i:i + self.batch_size]
+                #Filter terms separated by a comma are OR'ed together
+                payload = {'kind': 'task', 'length': len(chunk), 'filter': ','.join('uuid==' + task_uuid for task_uuid in chunk)}
+                resp = self.client.list('tasks', payload)
+                if not resp.ok:
+                    #Such as a 5xx, the tasks not read are checked on their own this time only
+                    break
+                entities = json.loads(resp.content).get('entities', [])
+                found = {}
+                for task in entities:
+                    if task.get('uuid') in chunk:
+                        found[task['uuid']] = task
+                if entities and not found:
+                    #Tasks came back but none of ours, this system does not filter tasks/list by UUID
+                    #Check each task on its own from now on
+                    self.use_task_list = False
+                    break
+                tasks.update(found)
+
+        missing = [task_uuid for task_uuid in task_uuids if task_uuid not in tasks]
+        if missing:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for task_uuid, resp in zip(missing, pool.map(lambda task_uuid: self.client.get('tasks/' + task_uuid), missing)):
+                    if resp.ok:
+                        tasks[task_uuid] = json.loads(resp.content)
+        return tasks
@@ -0,0 +1,142 @@
+#!/user/bin/env python
+
+"""
+Orders VM updates so running VMs are changed a few at a time on each AHV host.
+
+Adding or removing a NIC on a running VM is a hot-add on the host it runs on.  Sending every
+update at once can pile many hot-adds onto one host, while going one VM at a time takes hours.
+The scheduler runs the updates in two phases:
+    1. Powered off VMs, nothing is hot-added, these run at the full limit of each lane.
+    2. Running VMs, in waves.  Each wave takes at most host_limit VMs from every host and
+       the next wave starts when the wave before it has finished.
+After each phase and each wave the failure rate is checked.  When more than max_failure_rate of the
+finished updates failed (once at least min_results have finished) the breaker trips and the
+remaining waves are not sent.  Those VMs are reported as NOT_RUN.
+
+Usage:
+    scheduler = WaveScheduler(client, tracker, max_in_flight=10, host_limit=2)
+    for vm in ...:
+        scheduler.add(cluster_name, 'vms/' + vm_uuid, vm, name=vm_name, host=host_uuid, power_state=power_state)
+    scheduler.run()
+    print (scheduler.summary())
+
+Author: Corey Anson
+Date: 10/18/2026
+"""
+from BulkUpdate import LanedUpdate
+
+
+class WaveScheduler:
+    '''
+    Runs powered off VMs first, then running VMs in waves with a limit per host and a failure breaker
+    '''
+    def __init__(self, client, tracker, max_in_flight=10, host_limit=2, lane_limits=None, max_failure_rate=0.2, min_results=10, on_result=None, on_wave=None):
+        self.updater = LanedUpdate(client, tracker, max_in_flight, on_result, lane_limits)
+        self.host_limit = host_limit
+        self.max_failure_rate = max_failure_rate
+        self.min_results = min_results
+        self.on_wave = on_wave
+        self.powered_off = []
+        #host -> updates for the running VMs on that host, in the order they were added
+        self.powered_on = {}
+        self.not_run = []
+        self.tripped = False
+
+    def add(self, lane, path, data_list, name=None, host=None, power_state='ON'):
+        '''
+        Function that adds an update to the schedule, nothing is sent until run()
+        '''
+        item = (lane, path, data_list, name)
+        if power_state == 'OFF':
+            self.powered_off.append(item)
+        else:
+            #VMs without a host are kept together and get the same limit as one host
+            self.powered_on.setdefault(host or '', []).append(item)
+
+    def waves(self):
+        '''
+        Function that splits the running VMs into waves of at most host_limit VMs per host
+        '''
+        hosts = [list(items) for items in self.powered_on.values()]
+        waves = []
+        while any(hosts):
+            wave = []
+            for items in hosts:
+                wave.extend(items[:self.host_limit])
+                del items[:self.host_limit]
+            waves.append(wave)
+        return waves
+
+    def run(self):
+        '''
+        Function that sends the updates phase by phase and wave by wave, returns when they have all finished
+        '''
+        waves = self.waves()
+        if self.on_wave:
+            self.on_wave("Powered off", len(self.powered_off))
+        for item in self.powered_off:
+            self.updater.submit(*item)
+        self.updater.wait()
+        self._check()
+
+        for number, wave in enumerate(waves, 1):
+            if self.tripped:
+                self.not_run.extend(wave)
+                continue
+            if self.on_wave:
+                self.on_wave("Wave {0} of {1}".format(number, len(waves)), len(wave))
+            for item in wave:
+                self.updater.submit(*item)
+            self.updater.wait()
+            self._check()
+        self.powered_off = []
+        self.powered_on = {}
+
+    def summary(self):
+        '''
+        Function that returns a count of updates by status, including the ones the breaker stopped
+        '''
+        counts = self.updater.summary()
+        if self.not_run:
+            counts['NOT_RUN'] = len(self.not_run)
+        return counts
+
+    def failures(self):
+        '''
+        Function that returns the updates that did not succeed
+        '''
+        return self.updater.failures()
+
+    def lane_summary(self):
+        '''
+        Function that returns the count of updates by status for each lane
+        '''
+        return self.updater.lane_summary()
+
+    def not_run_names(self):
+        '''
+        Function that returns the names of the updates the breaker stopped
+        '''
+        return [name or path for lane, path, data_list, name in self.not_run]
+
+    def write_csv(self, file_name):
+        '''
+        Function that writes the results of every lane to one CSV file
+        '''
+        self.updater.write_csv(file_name)
+
+    def close(self):
+        '''
+        Function that waits for the lanes and stops their worker threads
+        '''
+        self.updater.close()
+
+    def _check(self):
+        '''
+        Function that trips the breaker when too many of the finished updates failed
+        '''
+        counts = self.updater.summary()
+        finished = sum(counts.values())
+        failed = finished - counts.get('SUCCEEDED', 0)
+        if finished >= self.min_results and failed > finished * self.max_failure_rate:
+            self.tripped = True